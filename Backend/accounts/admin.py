@@ -10,7 +10,7 @@ class EmpresaAdmin(admin.ModelAdmin):
     search_fields = ['nombre', 'email', 'telefono']
     readonly_fields = ['created_at', 'updated_at']
     fieldsets = (
-        ('Información Básica', {'fields': ('nombre', 'nicho')}),
+        ('Información Básica', {'fields': ('nombre', 'nicho', 'zona_horaria')}),
         ('Contacto', {'fields': ('email', 'telefono', 'direccion')}),
         ('Estado', {'fields': ('is_active',)}),
         ('Fechas', {'fields': ('created_at', 'updated_at'), 'classes': ('collapse',)}),
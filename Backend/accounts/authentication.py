@@ -11,6 +11,20 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
     username_field = User.USERNAME_FIELD
     
+    @classmethod
+    def get_token(cls, user):
+        """
+        Agrega al token los claims que usa `backends.ClaimsJWTAuthentication`.
+        El access token generado a partir del refresh (también en
+        `/api/auth/token/refresh/`) hereda estos claims.
+        """
+        token = super().get_token(user)
+        token['empresa_id'] = user.empresa_id
+        token['is_superuser'] = user.is_superuser
+        token['is_staff'] = user.is_staff
+        token['roles'] = sorted(user.groups.values_list('name', flat=True))
+        return token
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # Remover el campo username y agregar email
@@ -0,0 +1,90 @@
+"""
+Autenticación JWT basada en los claims del token.
+
+Módulo separado de `authentication.py` porque DRF lo importa al cargar
+`DEFAULT_AUTHENTICATION_CLASSES` y no puede depender de las vistas.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import User
+
+
+class UsuarioToken(TokenUser):
+    """
+    Usuario liviano construido a partir de los claims del access token.
+    
+    Expone `id`, `empresa_id`, `is_superuser`, `is_staff` y `roles` sin
+    consultar la base de datos. `empresa` se carga bajo demanda (una
+    consulta) para las escrituras que necesitan la instancia.
+    """
+    
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+    
+    @cached_property
+    def pk(self):
+        return self.id
+    
+    @cached_property
+    def empresa_id(self):
+        return self.token.get('empresa_id')
+    
+    @cached_property
+    def roles(self):
+        return tuple(self.token.get('roles', ()))
+    
+    @cached_property
+    def empresa(self):
+        from .models import Empresa
+        if self.empresa_id is None:
+            return None
+        return Empresa.objects.filter(pk=self.empresa_id).first()
+    
+    def __str__(self):
+        return f'UsuarioToken {self.id}'
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    Autenticación JWT que no carga la fila del usuario en cada petición.
+    
+    Devuelve un `UsuarioToken` con los datos del token. La revocación se
+    comprueba contra el estado del usuario (`is_active`, empresa y flags de
+    staff/superuser) guardado en caché `INVENTARIO_AUTH_CACHE_TTL` segundos;
+    `User.save()` invalida esa entrada. Si el estado no coincide con los
+    claims el token se rechaza y el cliente debe volver a iniciar sesión.
+    Los tokens emitidos sin claims se autentican contra la base de datos.
+    """
+    
+    def get_user(self, validated_token):
+        if 'empresa_id' not in validated_token:
+            return super().get_user(validated_token)
+        
+        usuario = UsuarioToken(validated_token)
+        estado = cache.get_or_set(
+            User.cache_key_auth(usuario.id),
+            lambda: User.objects.filter(pk=usuario.id).values_list(
+                'is_active', 'empresa_id', 'is_superuser', 'is_staff'
+            ).first() or False,
+            settings.INVENTARIO_AUTH_CACHE_TTL
+        )
+        if not estado:
+            raise AuthenticationFailed('Usuario no encontrado', code='user_not_found')
+        is_active, empresa_id, is_superuser, is_staff = estado
+        if not is_active:
+            raise AuthenticationFailed('Este usuario está desactivado.', code='user_inactive')
+        if (empresa_id, is_superuser, is_staff) != (
+            usuario.empresa_id, usuario.is_superuser, usuario.is_staff
+        ):
+            raise AuthenticationFailed(
+                'Los datos del usuario cambiaron; vuelve a iniciar sesión.',
+                code='token_outdated'
+            )
+        return usuario
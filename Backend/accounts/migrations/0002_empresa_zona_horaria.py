@@ -0,0 +1,19 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:07
+
+import accounts.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empresa',
+            name='zona_horaria',
+            field=models.CharField(blank=True, help_text='Zona IANA para reportes diarios (vacío = TIME_ZONE del servidor)', max_length=64, validators=[accounts.models.validar_zona_horaria], verbose_name='Zona horaria'),
+        ),
+    ]
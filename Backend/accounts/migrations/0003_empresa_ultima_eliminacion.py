@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_empresa_zona_horaria'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empresa',
+            name='ultima_eliminacion',
+            field=models.DateTimeField(blank=True, help_text='Última baja de productos, categorías o movimientos (validadores ETag)', null=True, verbose_name='Última eliminación'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_empresa_ultima_eliminacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empresa',
+            name='ultima_baja_producto',
+            field=models.DateTimeField(blank=True, help_text='Última baja física de productos (índice de autocompletado)', null=True, verbose_name='Última baja de producto'),
+        ),
+    ]
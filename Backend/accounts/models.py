@@ -1,8 +1,24 @@
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
 from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.utils.translation import gettext_lazy as _
 
 
+def validar_zona_horaria(valor):
+    """Valida que el valor sea una zona horaria IANA (ej: America/Bogota)"""
+    if not valor:
+        return
+    try:
+        ZoneInfo(valor)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(_('Zona horaria inválida: %(valor)s'), params={'valor': valor})
+
+
 class CustomUserManager(BaseUserManager):
     """Manager personalizado para el modelo User"""
     
@@ -34,7 +50,26 @@ class Empresa(models.Model):
     direccion = models.CharField(max_length=255, blank=True, verbose_name='Dirección')
     telefono = models.CharField(max_length=20, blank=True, verbose_name='Teléfono')
     email = models.EmailField(blank=True, verbose_name='Email')
+    zona_horaria = models.CharField(
+        max_length=64,
+        blank=True,
+        validators=[validar_zona_horaria],
+        verbose_name='Zona horaria',
+        help_text='Zona IANA para reportes diarios (vacío = TIME_ZONE del servidor)'
+    )
     is_active = models.BooleanField(default=True, verbose_name='Activo')
+    ultima_eliminacion = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Última eliminación',
+        help_text='Última baja de productos, categorías o movimientos (validadores ETag)'
+    )
+    ultima_baja_producto = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Última baja de producto',
+        help_text='Última baja física de productos (índice de autocompletado)'
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Creado el')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Actualizado el')
     
@@ -45,6 +80,61 @@ class Empresa(models.Model):
     
     def __str__(self):
         return self.nombre
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        cache.delete(self.cache_key_zona(self.pk))
+    
+    @staticmethod
+    def cache_key_zona(empresa_id):
+        return f'empresa:{empresa_id}:zona_horaria'
+    
+    @classmethod
+    def zona_de(cls, empresa_id):
+        """Zona horaria (`ZoneInfo`) de la empresa, cacheada unos minutos"""
+        if empresa_id is None:
+            return ZoneInfo(settings.TIME_ZONE)
+        nombre = cache.get_or_set(
+            cls.cache_key_zona(empresa_id),
+            lambda: cls.objects.filter(pk=empresa_id).values_list('zona_horaria', flat=True).first() or '',
+            300
+        )
+        return ZoneInfo(nombre or settings.TIME_ZONE)
+    
+    @classmethod
+    def marcar_eliminacion(cls, empresa_id, producto=False):
+        """Registra una baja de datos de la empresa.
+
+        Las altas y ediciones se detectan por `updated_at`; las bajas no dejan
+        fila, así que se anotan aquí para invalidar los ETag de los listados.
+        Con `producto=True` también se anota en `ultima_baja_producto`.
+        """
+        if empresa_id is not None:
+            ahora = timezone.now()
+            cambios = {'ultima_eliminacion': ahora}
+            if producto:
+                cambios['ultima_baja_producto'] = ahora
+            cls.objects.filter(pk=empresa_id).update(**cambios)
+    
+    @classmethod
+    def version_datos(cls, empresa_id, modelos, campos=('updated_at', 'ultima_eliminacion')):
+        """Marcas de tiempo que cambian con cualquier alta, edición o baja.
+
+        Devuelve en una sola consulta los `campos` de la empresa (por defecto
+        `updated_at` y `ultima_eliminacion`) y el `updated_at` más reciente
+        de cada modelo (con FK `empresa`), o `None` si la empresa no existe.
+        Cada subconsulta lee el extremo de un índice `(empresa, updated_at)`.
+        """
+        ultimos = {
+            f'ultimo_{i}': models.Subquery(
+                modelo._default_manager.filter(empresa_id=models.OuterRef('pk'))
+                .order_by('-updated_at').values('updated_at')[:1]
+            )
+            for i, modelo in enumerate(modelos)
+        }
+        return cls.objects.filter(pk=empresa_id).annotate(**ultimos).values_list(
+            *campos, *ultimos
+        ).first()
 
 
 class User(AbstractUser):
@@ -76,3 +166,18 @@ class User(AbstractUser):
     
     def __str__(self):
         return self.email
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        cache.delete(self.cache_key_auth(self.pk))
+    
+    def delete(self, *args, **kwargs):
+        pk = self.pk
+        resultado = super().delete(*args, **kwargs)
+        cache.delete(self.cache_key_auth(pk))
+        return resultado
+    
+    @staticmethod
+    def cache_key_auth(user_id):
+        """Estado usado por `ClaimsJWTAuthentication` para revocar tokens"""
+        return f'usuario:{user_id}:estado_auth'
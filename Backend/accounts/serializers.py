@@ -12,7 +12,7 @@ class EmpresaSerializer(serializers.ModelSerializer):
         model = Empresa
         fields = [
             'id', 'nombre', 'nicho', 'direccion', 'telefono', 
-            'email', 'is_active', 'created_at', 'updated_at'
+            'email', 'zona_horaria', 'is_active', 'created_at', 'updated_at'
         ]
         read_only_fields = ['created_at', 'updated_at']
 
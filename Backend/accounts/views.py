@@ -5,11 +5,13 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
 
+from utils.mixins import RelacionesPorAccionMixin
+
 from .models import User, Empresa
 from .serializers import UserSerializer, EmpresaSerializer, UserDetailSerializer
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(RelacionesPorAccionMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar usuarios - MVP Simplificado.
     
@@ -31,6 +33,7 @@ class UserViewSet(viewsets.ModelViewSet):
     search_fields = ['email', 'first_name', 'last_name']
     ordering_fields = ['email', 'created_at']
     ordering = ['-created_at']
+    relaciones_por_accion = {'default': ('empresa',)}
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -41,14 +44,16 @@ class UserViewSet(viewsets.ModelViewSet):
         """Filtrar usuarios por empresa si no es superuser"""
         queryset = super().get_queryset()
         if self.request.user.is_authenticated and not self.request.user.is_superuser:
-            if self.request.user.empresa:
-                queryset = queryset.filter(empresa=self.request.user.empresa)
+            if self.request.user.empresa_id:
+                queryset = queryset.filter(empresa_id=self.request.user.empresa_id)
         return queryset
     
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def me(self, request):
         """Obtener mi perfil"""
-        serializer = UserDetailSerializer(request.user)
+        # request.user puede ser el usuario liviano del token: se lee el perfil completo
+        usuario = self.get_queryset().get(pk=request.user.pk)
+        serializer = UserDetailSerializer(usuario)
         return Response(serializer.data)
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
@@ -111,8 +116,8 @@ class EmpresaViewSet(viewsets.ModelViewSet):
         """Filtrar empresas por la del usuario si no es superuser"""
         queryset = super().get_queryset()
         if self.request.user.is_authenticated and not self.request.user.is_superuser:
-            if self.request.user.empresa:
-                queryset = queryset.filter(id=self.request.user.empresa.id)
+            if self.request.user.empresa_id:
+                queryset = queryset.filter(id=self.request.user.empresa_id)
         return queryset
     
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
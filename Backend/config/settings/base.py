@@ -37,6 +37,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.middleware.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -104,12 +105,12 @@ AUTH_USER_MODEL = 'accounts.User'
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'accounts.backends.ClaimsJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'inventario.pagination.PaginaNumerada',
     'PAGE_SIZE': 20,
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -162,6 +163,57 @@ SPECTACULAR_SETTINGS = {
     'SCHEMA_MOUNT_PATH': '/api/schema/',
 }
 
+# Inventario
+# Máximo de líneas aceptadas por POST /api/movements/bulk/
+INVENTARIO_BULK_MAX_LINEAS = int(os.environ.get('INVENTARIO_BULK_MAX_LINEAS', 5000))
+# Cada cuántos movimientos por producto se guarda un checkpoint de stock
+INVENTARIO_CHECKPOINT_CADA = int(os.environ.get('INVENTARIO_CHECKPOINT_CADA', 100))
+# Tiempo durante el que se conserva la respuesta de una cabecera Idempotency-Key
+INVENTARIO_IDEMPOTENCIA_TTL = timedelta(
+    hours=int(os.environ.get('INVENTARIO_IDEMPOTENCIA_TTL_HORAS', 24))
+)
+# Filas leídas por bloque del cursor en las exportaciones CSV/NDJSON
+INVENTARIO_EXPORT_CHUNK = int(os.environ.get('INVENTARIO_EXPORT_CHUNK', 2000))
+# Productos escritos por upsert en POST /api/products/import/
+INVENTARIO_IMPORT_LOTE = int(os.environ.get('INVENTARIO_IMPORT_LOTE', 1000))
+# Máximo de filas por recurso en cada llamada a GET /api/sync/changes/
+INVENTARIO_SYNC_LOTE = int(os.environ.get('INVENTARIO_SYNC_LOTE', 500))
+# Retraso del corte de la sincronización respecto del reloj (cubre transacciones en curso)
+INVENTARIO_SYNC_MARGEN = timedelta(
+    seconds=int(os.environ.get('INVENTARIO_SYNC_MARGEN_SEGUNDOS', 10))
+)
+# Claves de Product.campos_extra con índice propio, por Empresa.nicho
+# (se crean al migrar o con `manage.py indexar_campos_extra`)
+INVENTARIO_CAMPOS_EXTRA_INDEXADOS = {
+    'farmacia': ['principio_activo'],
+    'veterinaria': ['especie'],
+}
+# Claves (nombre y cada palabra) de los índices de autocompletado por worker, sumando empresas
+INVENTARIO_AUTOCOMPLETE_MAX_ENTRADAS = int(os.environ.get('INVENTARIO_AUTOCOMPLETE_MAX_ENTRADAS', 500000))
+# Sugerencias máximas por petición a GET /api/products/autocomplete/
+INVENTARIO_AUTOCOMPLETE_LIMITE = int(os.environ.get('INVENTARIO_AUTOCOMPLETE_LIMITE', 20))
+
+# Métricas (GET /api/metrics/)
+# Directorio compartido por los workers para combinar sus métricas; vacío = solo en proceso
+INVENTARIO_METRICAS_DIR = os.environ.get('INVENTARIO_METRICAS_DIR', '')
+# Segundos mínimos entre volcados del estado de cada worker al directorio
+INVENTARIO_METRICAS_VOLCADO = float(os.environ.get('INVENTARIO_METRICAS_VOLCADO', 5))
+# Token Bearer del scraper; vacío = solo usuarios staff
+INVENTARIO_METRICAS_TOKEN = os.environ.get('INVENTARIO_METRICAS_TOKEN', '')
+
+# Stream de stock (GET /api/stream/stock/, requiere ASGI)
+# Directorio compartido por los workers para repartir eventos (sockets Unix); vacío = solo en proceso
+INVENTARIO_STREAM_DIR = os.environ.get('INVENTARIO_STREAM_DIR', '')
+# Segundos sin eventos tras los que se envía un ping a cada conexión
+INVENTARIO_STREAM_PING = float(os.environ.get('INVENTARIO_STREAM_PING', 15))
+# Eventos pendientes por conexión antes de pedir al cliente que recargue
+INVENTARIO_STREAM_COLA = int(os.environ.get('INVENTARIO_STREAM_COLA', 100))
+# Espera sugerida al navegador antes de reconectar (campo `retry` de SSE)
+INVENTARIO_STREAM_REINTENTO_MS = int(os.environ.get('INVENTARIO_STREAM_REINTENTO_MS', 3000))
+
+# Segundos que se cachea el estado del usuario para validar los claims del JWT
+INVENTARIO_AUTH_CACHE_TTL = int(os.environ.get('INVENTARIO_AUTH_CACHE_TTL', 60))
+
 # Logging
 LOGGING = {
     'version': 1,
@@ -20,7 +20,10 @@ from inventario.views import (
     CategoryViewSet,
     ProductViewSet,
     MovementViewSet,
+    SyncViewSet,
 )
+from inventario.views.stream import vista_stream_stock
+from utils.metrics import vista_metricas
 
 # Configure router
 router = DefaultRouter()
@@ -33,6 +36,7 @@ router.register(r'empresas', EmpresaViewSet, basename='empresa')
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'products', ProductViewSet, basename='product')
 router.register(r'movements', MovementViewSet, basename='movement')
+router.register(r'sync', SyncViewSet, basename='sync')
 
 urlpatterns = [
     # Admin
@@ -42,6 +46,12 @@ urlpatterns = [
     path('api/auth/token/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     
+    # Métricas en formato Prometheus
+    path('api/metrics/', vista_metricas, name='metrics'),
+    
+    # Cambios de stock en tiempo real (Server-Sent Events, requiere ASGI)
+    path('api/stream/stock/', vista_stream_stock, name='stream-stock'),
+    
     # API Endpoints
     path('api/', include(router.urls)),
     
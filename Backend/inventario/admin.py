@@ -18,12 +18,12 @@ class CategoryAdmin(admin.ModelAdmin):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['nombre', 'categoria', 'empresa', 'cantidad', 'precio_venta', 'is_active']
+    list_display = ['nombre', 'codigo', 'categoria', 'empresa', 'cantidad', 'precio_venta', 'is_active']
     list_filter = ['empresa', 'categoria', 'is_active', 'created_at']
-    search_fields = ['nombre', 'proveedor']
+    search_fields = ['nombre', 'codigo', 'proveedor']
     readonly_fields = ['created_at', 'updated_at']
     fieldsets = (
-        ('Información Básica', {'fields': ('empresa', 'nombre', 'categoria')}),
+        ('Información Básica', {'fields': ('empresa', 'nombre', 'codigo', 'categoria')}),
         ('Inventario', {
             'fields': ('cantidad', 'unidad_medida', 'stock_minimo'),
             'description': 'Gestión de stock y unidades'
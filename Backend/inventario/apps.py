@@ -1,5 +1,27 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_migrate
+
+
+def _crear_indices_dinamicos(sender, using, **kwargs):
+    """Índices que no declara ningún modelo: búsqueda y claves de `campos_extra`.
+
+    En SQLite, reconstruir `inventario_product` en una migración borra los
+    triggers de FTS5 y los índices de expresión, así que se recrean aquí.
+    """
+    from inventario.models import Product
+    from inventario.search import crear_indices_busqueda
+    connection = connections[using]
+    aplicadas = MigrationRecorder(connection).applied_migrations()
+    if ('inventario', '0010_product_search') in aplicadas:
+        crear_indices_busqueda(connection)
+    if ('inventario', '0011_campos_extra_indexes') in aplicadas:
+        Product.objects.sincronizar_indices_extra(using=using)
 
 
 class InventarioConfig(AppConfig):
     name = 'inventario'
+
+    def ready(self):
+        post_migrate.connect(_crear_indices_dinamicos, sender=self)
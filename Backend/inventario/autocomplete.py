@@ -0,0 +1,214 @@
+"""
+Sugerencias por prefijo de nombre de producto (`GET /api/products/autocomplete/?q=`).
+
+Cada worker guarda, por empresa, una lista ordenada de claves
+`(nombre normalizado desde el inicio de cada palabra, id)` de sus productos
+activos; una sugerencia es una búsqueda binaria más un recorrido corto, sin
+tocar la tabla de productos. Los índices se construyen al primer uso y
+`autocompletado` los limita a `INVENTARIO_AUTOCOMPLETE_MAX_ENTRADAS` claves
+en total, expulsando la empresa usada hace más tiempo.
+
+Cada petición lee de `Empresa.version_datos` la última baja de productos y
+su `updated_at` más reciente (una consulta sobre índices):
+
+- si cambió el `updated_at` más reciente de los productos, se vuelven a
+  leer solo las filas con `updated_at` posterior a la última vista (altas,
+  renombres, activaciones y desactivaciones). Como en la sincronización,
+  la ventana retrocede `INVENTARIO_SYNC_MARGEN` para no perder filas
+  confirmadas tarde, y aplicar dos veces la misma fila no cambia nada;
+- si hubo bajas físicas de productos desde la última vista, se leen los
+  ids que siguen existiendo y se quitan del índice los que faltan. Las bajas
+  de movimientos o categorías no tocan el índice.
+
+Así todos los workers ven los cambios de los demás sin un bus de eventos.
+"""
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from accounts.models import Empresa
+from inventario.models import Product
+from inventario.search import normalizar
+
+# Por encima de estos cambios se reordena el índice entero en lugar de insertar uno a uno
+CAMBIOS_UNO_A_UNO = 1000
+
+
+def claves_de(nombre):
+    """Nombre normalizado desde el inicio de cada palabra."""
+    normalizado = ' '.join(normalizar(nombre).split())
+    return [
+        normalizado[i:] for i in range(len(normalizado))
+        if i == 0 or normalizado[i - 1] == ' '
+    ]
+
+
+class IndiceNombres:
+    """Nombres de los productos activos de una empresa, ordenados por prefijo."""
+
+    def __init__(self, ultimo_cambio, ultima_baja):
+        self.claves = []
+        self.productos = {}
+        # `updated_at` más reciente aplicado y baja de producto más reciente aplicada
+        self.ultimo_cambio = ultimo_cambio
+        self.ultima_baja = ultima_baja
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.claves)
+
+    def poner(self, pk, nombre, activo):
+        """Alta, renombre o (des)activación de un producto."""
+        anterior = self.productos.get(pk)
+        if activo and anterior is not None and anterior[0] == nombre:
+            # Cambio que no afecta al índice (stock, precio) o fila ya aplicada
+            return
+        self.quitar(pk)
+        if activo:
+            self.productos[pk] = (nombre, claves_de(nombre))
+            for clave in self.productos[pk][1]:
+                insort(self.claves, (clave, pk))
+
+    def poner_muchos(self, filas):
+        """Como `poner` para muchas filas: rehace la lista ordenada una sola vez."""
+        cambiados = 0
+        for pk, nombre, activo in filas:
+            anterior = self.productos.get(pk)
+            if activo and (anterior is None or anterior[0] != nombre):
+                self.productos[pk] = (nombre, claves_de(nombre))
+                cambiados += 1
+            elif not activo and anterior is not None:
+                del self.productos[pk]
+                cambiados += 1
+        if cambiados:
+            self.claves = sorted(
+                (clave, pk) for pk, (_, claves) in self.productos.items() for clave in claves
+            )
+
+    def quitar(self, pk):
+        anterior = self.productos.pop(pk, None)
+        if anterior is not None:
+            for clave in anterior[1]:
+                i = bisect_left(self.claves, (clave, pk))
+                del self.claves[i]
+
+    def buscar(self, prefijo, limite):
+        resultados = []
+        vistos = set()
+        i = bisect_left(self.claves, (prefijo,))
+        while i < len(self.claves) and len(resultados) < limite:
+            clave, pk = self.claves[i]
+            if not clave.startswith(prefijo):
+                break
+            if pk not in vistos:
+                vistos.add(pk)
+                resultados.append({'id': pk, 'nombre': self.productos[pk][0]})
+            i += 1
+        return resultados
+
+
+class CacheAutocompletado:
+    """Índices de nombres por empresa con expulsión LRU."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.indices = OrderedDict()
+
+    def buscar(self, empresa_id, texto, limite):
+        """Hasta `limite` productos activos cuyo nombre o alguna palabra empieza por `texto`."""
+        prefijo = ' '.join(normalizar(texto).split())
+        if not prefijo:
+            return []
+        version = Empresa.version_datos(empresa_id, [Product], campos=('ultima_baja_producto',))
+        if version is None:
+            return []
+        ultima_baja, ultimo_cambio = version
+
+        with self._lock:
+            indice = self.indices.get(empresa_id)
+            if indice is not None:
+                self.indices.move_to_end(empresa_id)
+        if indice is None:
+            indice = self._construir(empresa_id, ultimo_cambio, ultima_baja)
+            with indice.lock:
+                return indice.buscar(prefijo, limite)
+        with indice.lock:
+            if indice.ultima_baja != ultima_baja:
+                self._quitar_eliminados(empresa_id, indice, ultima_baja)
+            if self._desactualizado(indice, ultimo_cambio):
+                self._refrescar(empresa_id, indice, ultimo_cambio)
+            return indice.buscar(prefijo, limite)
+
+    def invalidar(self, empresa_id=None):
+        with self._lock:
+            if empresa_id is None:
+                self.indices.clear()
+            else:
+                self.indices.pop(empresa_id, None)
+
+    def total_entradas(self):
+        with self._lock:
+            return sum(len(indice) for indice in self.indices.values())
+
+    @staticmethod
+    def _desactualizado(indice, ultimo_cambio):
+        if ultimo_cambio is None:
+            return False
+        if ultimo_cambio != indice.ultimo_cambio:
+            return True
+        # Un cambio reciente puede tener filas anteriores aún sin confirmar
+        return timezone.now() - ultimo_cambio < settings.INVENTARIO_SYNC_MARGEN
+
+    def _construir(self, empresa_id, ultimo_cambio, ultima_baja):
+        indice = IndiceNombres(ultimo_cambio, ultima_baja)
+        filas = Product.objects.filter(empresa_id=empresa_id, is_active=True).values_list('id', 'nombre')
+        indice.poner_muchos(
+            (pk, nombre, True)
+            for pk, nombre in filas.iterator(chunk_size=settings.INVENTARIO_EXPORT_CHUNK)
+        )
+
+        with self._lock:
+            self.indices[empresa_id] = indice
+            self.indices.move_to_end(empresa_id)
+            self._expulsar()
+        return indice
+
+    @staticmethod
+    def _quitar_eliminados(empresa_id, indice, ultima_baja):
+        """Quita del índice los productos que ya no existen (solo lee ids)."""
+        existentes = set(
+            Product.objects.filter(empresa_id=empresa_id).values_list('id', flat=True)
+            .iterator(chunk_size=settings.INVENTARIO_EXPORT_CHUNK)
+        )
+        for pk in [pk for pk in indice.productos if pk not in existentes]:
+            indice.quitar(pk)
+        indice.ultima_baja = ultima_baja
+
+    def _refrescar(self, empresa_id, indice, ultimo_cambio):
+        cambios = Product.objects.filter(empresa_id=empresa_id)
+        if indice.ultimo_cambio is not None:
+            cambios = cambios.filter(
+                updated_at__gte=indice.ultimo_cambio - settings.INVENTARIO_SYNC_MARGEN
+            )
+        filas = list(cambios.values_list('id', 'nombre', 'is_active'))
+        if len(filas) > CAMBIOS_UNO_A_UNO:
+            indice.poner_muchos(filas)
+        else:
+            for pk, nombre, activo in filas:
+                indice.poner(pk, nombre, activo)
+        indice.ultimo_cambio = ultimo_cambio
+        with self._lock:
+            self._expulsar()
+
+    def _expulsar(self):
+        """Descarta las empresas menos usadas hasta volver al límite (con `_lock` tomado)."""
+        total = sum(len(indice) for indice in self.indices.values())
+        while total > settings.INVENTARIO_AUTOCOMPLETE_MAX_ENTRADAS and len(self.indices) > 1:
+            _, expulsado = self.indices.popitem(last=False)
+            total -= len(expulsado)
+
+
+autocompletado = CacheAutocompletado()
@@ -0,0 +1,100 @@
+"""
+Exportación en streaming de querysets a CSV o NDJSON.
+
+Las filas se leen con `QuerySet.iterator()` (cursor del lado del servidor
+en PostgreSQL) y se escriben a medida que se generan, de modo que la
+memoria del worker no crece con el tamaño de la exportación.
+"""
+import csv
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+COLUMNAS_MOVIMIENTOS = [
+    ('id', 'id'),
+    ('fecha', 'created_at'),
+    ('producto', 'product_id'),
+    ('producto_nombre', 'product__nombre'),
+    ('tipo_movimiento', 'movement_type'),
+    ('cantidad', 'quantity'),
+    ('referencia', 'referencia'),
+    ('motivo', 'motivo'),
+    ('notas', 'notes'),
+    ('creado_por_email', 'created_by__email'),
+]
+
+COLUMNAS_PRODUCTOS = [
+    ('id', 'id'),
+    ('nombre', 'nombre'),
+    ('codigo', 'codigo'),
+    ('categoria', 'categoria_id'),
+    ('categoria_nombre', 'categoria__nombre'),
+    ('cantidad', 'cantidad'),
+    ('unidad_medida', 'unidad_medida'),
+    ('stock_minimo', 'stock_minimo'),
+    ('costo', 'costo'),
+    ('precio_venta', 'precio_venta'),
+    ('descuento', 'descuento'),
+    ('proveedor', 'proveedor'),
+    ('fecha_vencimiento', 'fecha_vencimiento'),
+    ('lote', 'lote'),
+    ('is_active', 'is_active'),
+    ('updated_at', 'updated_at'),
+]
+
+
+class _Eco:
+    """Pseudo-archivo para `csv.writer`: devuelve la línea en vez de guardarla."""
+
+    def write(self, valor):
+        return valor
+
+
+def _lineas_csv(columnas, filas):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(columnas)
+    for fila in filas:
+        yield escritor.writerow([
+            valor.isoformat() if hasattr(valor, 'isoformat') else valor
+            for valor in fila
+        ])
+
+
+def _lineas_ndjson(columnas, filas):
+    codificador = DjangoJSONEncoder(ensure_ascii=False)
+    for fila in filas:
+        yield codificador.encode(dict(zip(columnas, fila))) + '\n'
+
+
+def _en_bloques(lineas, tamano):
+    """Agrupa líneas para no emitir un fragmento HTTP por fila."""
+    bloque = []
+    for linea in lineas:
+        bloque.append(linea)
+        if len(bloque) >= tamano:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+def respuesta_exportacion(queryset, columnas, formato, nombre):
+    """Devuelve un `StreamingHttpResponse` con el queryset exportado.
+
+    `columnas` es una lista de pares `(nombre_en_archivo, campo_orm)`;
+    `formato` debe ser una clave de `FORMATOS`.
+    """
+    tamano = settings.INVENTARIO_EXPORT_CHUNK
+    filas = queryset.values_list(*[campo for _, campo in columnas]).iterator(chunk_size=tamano)
+    nombres = [nombre_columna for nombre_columna, _ in columnas]
+    lineas = _lineas_csv(nombres, filas) if formato == 'csv' else _lineas_ndjson(nombres, filas)
+
+    response = StreamingHttpResponse(_en_bloques(lineas, tamano), content_type=FORMATOS[formato])
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.{formato}"'
+    return response
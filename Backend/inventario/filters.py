@@ -0,0 +1,146 @@
+"""
+Filtros de la API de inventario.
+"""
+from datetime import datetime, time
+
+import django_filters
+from django import forms
+from django.db import connections
+from django.db.models.fields.json import KeyTransform
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django_filters.constants import EMPTY_VALUES
+
+from inventario.models import Movement, Product
+from inventario.models.product import CLAVE_EXTRA, ValorCampoExtra
+
+
+def parse_fecha(valor, fin_de_dia=False):
+    """Convierte un parámetro de fecha (fecha o fecha-hora ISO) en un datetime aware.
+
+    Una fecha sin hora se interpreta como el inicio del día, o como su
+    cierre si `fin_de_dia=True`. Devuelve `None` si el valor es inválido.
+    """
+    if not valor:
+        return None
+    try:
+        # Primero la fecha sola: `parse_datetime` también la acepta (como medianoche)
+        dia = parse_date(valor)
+        fecha = parse_datetime(valor) if dia is None else None
+    except ValueError:
+        return None
+    if fecha is None:
+        if dia is None:
+            return None
+        fecha = datetime.combine(dia, time.max if fin_de_dia else time.min)
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha
+
+
+def parse_entero(valor):
+    """Convierte un parámetro de id en un entero positivo; `None` si es inválido."""
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        return None
+    # Fuera del rango de BIGINT la base de datos rechaza el parámetro
+    return numero if 0 < numero < 2 ** 63 else None
+
+
+class MovementFilter(django_filters.FilterSet):
+    """Filtros de movimientos con los nombres de parámetros de la API"""
+    producto = django_filters.NumberFilter(field_name='product')
+    tipo_movimiento = django_filters.ChoiceFilter(
+        field_name='movement_type',
+        choices=Movement.MOVEMENT_TYPES
+    )
+
+    class Meta:
+        model = Movement
+        fields = ['empresa', 'producto', 'tipo_movimiento']
+
+
+PREFIJO_EXTRA = 'extra__'
+
+
+class ObjetoJSONField(forms.JSONField):
+    def to_python(self, value):
+        valor = super().to_python(value)
+        if valor is not None and not isinstance(valor, dict):
+            raise forms.ValidationError('Debe ser un objeto JSON')
+        return valor
+
+
+class CampoExtraFilter(django_filters.CharFilter):
+    """`?extra__<clave>=<valor>`: igualdad sobre el valor de texto de la clave"""
+
+    def __init__(self, clave, **kwargs):
+        self.clave = clave
+        super().__init__(field_name='campos_extra', **kwargs)
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        alias = f'extra_{self.clave}'
+        return qs.alias(**{alias: ValorCampoExtra(self.clave)}).filter(**{alias: value})
+
+
+class CampoExtraExisteFilter(django_filters.BooleanFilter):
+    """`?extra__<clave>__exists=true|false`: la clave está (o no) en `campos_extra`"""
+
+    def __init__(self, clave, **kwargs):
+        self.clave = clave
+        super().__init__(field_name='campos_extra', **kwargs)
+
+    def filter(self, qs, value):
+        if value is None:
+            return qs
+        if value:
+            return qs.filter(campos_extra__has_key=self.clave)
+        return qs.exclude(campos_extra__has_key=self.clave)
+
+
+class CampoExtraContieneFilter(django_filters.Filter):
+    """`?extra__contains={"clave": valor, ...}`: `campos_extra` contiene el objeto"""
+    field_class = ObjetoJSONField
+
+    def filter(self, qs, value):
+        if not value:
+            return qs
+        if connections[qs.db].features.supports_json_field_contains:
+            # `@>` en PostgreSQL, servido por el índice GIN de campos_extra
+            return qs.filter(campos_extra__contains=value)
+        # SQLite no soporta contains: igualdad JSON clave por clave
+        for i, (clave, valor) in enumerate(value.items()):
+            alias = f'extra_contiene_{i}'
+            qs = qs.alias(**{alias: KeyTransform(clave, 'campos_extra')}).filter(**{alias: valor})
+        return qs
+
+
+class ProductFilter(django_filters.FilterSet):
+    """Filtros de productos; `vence_antes` lista los que vencen hasta una fecha.
+
+    Además acepta filtros sobre `campos_extra`: `?extra__<clave>=<valor>`,
+    `?extra__<clave>__exists=true|false` y `?extra__contains=<objeto JSON>`.
+    """
+    vence_antes = django_filters.DateFilter(field_name='fecha_vencimiento', lookup_expr='lte')
+    extra__contains = CampoExtraContieneFilter(field_name='campos_extra')
+
+    class Meta:
+        model = Product
+        fields = ['empresa', 'categoria', 'is_active', 'vence_antes']
+
+    def __init__(self, data=None, *args, **kwargs):
+        super().__init__(data, *args, **kwargs)
+        # Un filtro por cada parámetro `extra__<clave>[__exists]` de la petición
+        for parametro in data or ():
+            if not parametro.startswith(PREFIJO_EXTRA) or parametro in self.filters:
+                continue
+            clave, _, operador = parametro[len(PREFIJO_EXTRA):].partition('__')
+            if not CLAVE_EXTRA.fullmatch(clave):
+                continue
+            if operador == '':
+                self.filters[parametro] = CampoExtraFilter(clave)
+            elif operador == 'exists':
+                self.filters[parametro] = CampoExtraExisteFilter(clave)
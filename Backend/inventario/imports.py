@@ -0,0 +1,123 @@
+"""
+Importación masiva de productos desde CSV.
+
+El archivo se lee fila a fila con `csv.DictReader` (no se carga entero en
+memoria), las categorías se resuelven con un diccionario cargado en una
+consulta y los productos válidos se escriben por lotes con un upsert.
+En los productos existentes solo se sobrescriben las celdas con valor de
+cada fila; un nombre repetido en el archivo se informa como fila fallida.
+"""
+import csv
+import io
+from collections import defaultdict
+
+from django.conf import settings
+from rest_framework import serializers
+
+from inventario.models import Category, Product
+from inventario.serializers import ProductImportRowSerializer
+
+COLUMNAS_OBLIGATORIAS = {'nombre', 'categoria', 'costo', 'precio_venta'}
+
+
+class ImportacionProductos:
+    """Importa un CSV de productos para una empresa y arma el reporte por fila."""
+
+    def __init__(self, empresa, crear_categorias=False, tamano_lote=None):
+        self.empresa = empresa
+        self.crear_categorias = crear_categorias
+        self.tamano_lote = tamano_lote or settings.INVENTARIO_IMPORT_LOTE
+        self.categorias = dict(
+            Category.objects.filter(empresa=empresa).values_list('nombre', 'id')
+        )
+        self.validador = ProductImportRowSerializer()
+        # Primera fila válida de cada nombre del archivo
+        self.filas_por_nombre = {}
+        self.total_filas = 0
+        self.creados = 0
+        self.actualizados = 0
+        self.errores = []
+
+    def importar(self, archivo):
+        """Procesa el archivo subido y devuelve el reporte de la importación."""
+        lector = csv.DictReader(io.TextIOWrapper(archivo, encoding='utf-8-sig', newline=''))
+        columnas = set(lector.fieldnames or [])
+        faltantes = COLUMNAS_OBLIGATORIAS - columnas
+        if faltantes:
+            raise serializers.ValidationError({
+                'archivo': f"Faltan columnas obligatorias: {', '.join(sorted(faltantes))}"
+            })
+
+        lote = {}
+        # La fila 1 es la cabecera
+        for numero, fila in enumerate(lector, start=2):
+            self.total_filas += 1
+            datos = self._validar(numero, fila)
+            if datos is not None:
+                lote[datos['nombre']] = datos
+            if len(lote) >= self.tamano_lote:
+                self._guardar(lote)
+                lote = {}
+        if lote:
+            self._guardar(lote)
+
+        return {
+            'total_filas': self.total_filas,
+            'creados': self.creados,
+            'actualizados': self.actualizados,
+            'fallidos': len(self.errores),
+            'errores': sorted(self.errores, key=lambda error: error['fila']),
+        }
+
+    def _validar(self, numero, fila):
+        # Las celdas vacías cuentan como columna ausente: el valor por defecto
+        # en un alta y el valor actual en un producto existente
+        fila = {
+            clave: valor.strip() for clave, valor in fila.items()
+            if clave and valor is not None and valor.strip() != ''
+        }
+        try:
+            datos = self.validador.run_validation(fila)
+        except serializers.ValidationError as exc:
+            self.errores.append({'fila': numero, 'errores': exc.detail})
+            return None
+        primera = self.filas_por_nombre.setdefault(datos['nombre'], numero)
+        if primera != numero:
+            self.errores.append({
+                'fila': numero,
+                'errores': {'nombre': [f'Nombre repetido en el archivo (fila {primera})']}
+            })
+            return None
+        datos['fila'] = numero
+        datos['columnas'] = frozenset(fila).intersection(self.validador.fields)
+        return datos
+
+    def _guardar(self, lote):
+        pendientes = {d['categoria'] for d in lote.values()} - set(self.categorias)
+        if pendientes and self.crear_categorias:
+            Category.objects.bulk_create(
+                [Category(empresa=self.empresa, nombre=nombre) for nombre in sorted(pendientes)],
+                ignore_conflicts=True
+            )
+            self.categorias.update(Category.objects.filter(
+                empresa=self.empresa, nombre__in=pendientes
+            ).values_list('nombre', 'id'))
+
+        # Un upsert por combinación de celdas con valor (normalmente una o pocas)
+        grupos = defaultdict(dict)
+        for nombre, datos in lote.items():
+            numero = datos.pop('fila')
+            columnas = datos.pop('columnas')
+            categoria_id = self.categorias.get(datos.pop('categoria'))
+            if categoria_id is None:
+                self.errores.append({
+                    'fila': numero,
+                    'errores': {'categoria': ['La categoría no existe en la empresa']}
+                })
+                continue
+            grupos[columnas][nombre] = dict(datos, categoria_id=categoria_id)
+
+        for columnas, filas in grupos.items():
+            creados, actualizados = Product.objects.importar_lote(self.empresa, filas, columnas)
+            self.creados += creados
+            self.actualizados += actualizados
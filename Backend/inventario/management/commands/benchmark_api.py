@@ -0,0 +1,215 @@
+import json
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib import error, request as urllib_request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+
+from accounts.authentication import CustomTokenObtainPairSerializer
+from accounts.models import Empresa, User
+from inventario.models import Category, Product
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentil(ordenados, p):
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not ordenados:
+        return None
+    return ordenados[max(0, math.ceil(p / 100 * len(ordenados)) - 1)]
+
+
+class ClienteLocal:
+    """Peticiones en proceso con el cliente de pruebas de Django (sin red)."""
+
+    def __init__(self, token):
+        hosts = [host for host in settings.ALLOWED_HOSTS if host not in ('*', '')]
+        self.cabeceras = {
+            'HTTP_AUTHORIZATION': f'Bearer {token}',
+            'HTTP_HOST': hosts[0].lstrip('.') if hosts else 'localhost',
+        }
+        self.local = threading.local()
+
+    def __call__(self, metodo, ruta, cuerpo=None):
+        if not hasattr(self.local, 'cliente'):
+            self.local.cliente = Client()
+        if metodo == 'POST':
+            response = self.local.cliente.post(
+                ruta, json.dumps(cuerpo), content_type='application/json', **self.cabeceras
+            )
+        else:
+            response = self.local.cliente.get(ruta, **self.cabeceras)
+        if response.streaming:
+            # Consumir el cuerpo completo, como haría un cliente real
+            b''.join(response.streaming_content)
+        return response.status_code
+
+
+class ClienteHTTP:
+    """Peticiones contra un servidor en marcha (`--url`)."""
+
+    def __init__(self, token, url):
+        self.url = url.rstrip('/')
+        self.token = token
+
+    def __call__(self, metodo, ruta, cuerpo=None):
+        datos = json.dumps(cuerpo).encode() if cuerpo is not None else None
+        peticion = urllib_request.Request(
+            self.url + ruta, data=datos, method=metodo,
+            headers={'Authorization': f'Bearer {self.token}', 'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib_request.urlopen(peticion, timeout=60) as response:
+                response.read()
+                return response.status
+        except error.HTTPError as exc:
+            return exc.code
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide throughput y percentiles de latencia de los endpoints principales '
+        '(listados, detalle, resumen y alta de movimientos)'
+    )
+
+    ESCENARIOS = (
+        'productos_lista', 'producto_detalle', 'movimientos_lista',
+        'categoria_resumen', 'movimiento_crear',
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help='Empresa a usar (por defecto, la de más productos)')
+        parser.add_argument('--usuario', help='Email del usuario (por defecto, el primero de la empresa)')
+        parser.add_argument('--url', help='URL base de un servidor en marcha; sin ella se usa el cliente en proceso')
+        parser.add_argument('--peticiones', type=int, default=200, help='Peticiones medidas por escenario')
+        parser.add_argument('--calentamiento', type=int, default=10, help='Peticiones previas no medidas')
+        parser.add_argument('--concurrencia', type=int, default=1)
+        parser.add_argument('--escenarios', nargs='+', choices=self.ESCENARIOS, default=list(self.ESCENARIOS))
+        parser.add_argument('--solo-lectura', action='store_true', help='Omite movimiento_crear')
+        parser.add_argument('--semilla', type=int, default=None)
+        parser.add_argument('--json', action='store_true', help='Imprime los resultados como JSON')
+
+    def handle(self, *args, **options):
+        if options['peticiones'] < 1:
+            raise CommandError('--peticiones debe ser al menos 1')
+        self.random = random.Random(options['semilla'])
+        empresa = self.elegir_empresa(options['empresa'])
+        usuario = User.objects.filter(empresa=empresa, is_active=True)
+        if options['usuario']:
+            usuario = usuario.filter(email=options['usuario'])
+        usuario = usuario.order_by('pk').first()
+        if usuario is None:
+            raise CommandError(f'La empresa {empresa.pk} no tiene un usuario activo que coincida')
+
+        token = str(CustomTokenObtainPairSerializer.get_token(usuario).access_token)
+        cliente = ClienteHTTP(token, options['url']) if options['url'] else ClienteLocal(token)
+        self.productos = list(
+            Product.objects.filter(empresa=empresa).order_by('?').values_list('pk', flat=True)[:1000]
+        )
+        self.categorias = list(Category.objects.filter(empresa=empresa).values_list('pk', flat=True))
+        if not self.productos or not self.categorias:
+            raise CommandError(f'La empresa {empresa.pk} no tiene productos o categorías')
+
+        escenarios = [
+            nombre for nombre in options['escenarios']
+            if not (options['solo_lectura'] and nombre == 'movimiento_crear')
+        ]
+        resultados = [
+            self.medir(nombre, cliente, options['peticiones'], options['calentamiento'],
+                       options['concurrencia'])
+            for nombre in escenarios
+        ]
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'empresa': empresa.pk,
+                'modo': options['url'] or 'en_proceso',
+                'concurrencia': options['concurrencia'],
+                'escenarios': resultados,
+            }, indent=2))
+            return
+        self.stdout.write(
+            f'Empresa {empresa.pk} ({empresa.nombre}), '
+            f"{'servidor ' + options['url'] if options['url'] else 'cliente en proceso'}, "
+            f"concurrencia {options['concurrencia']}"
+        )
+        encabezado = ['escenario', 'n', 'errores', 'req/s'] + [f'p{p} ms' for p in PERCENTILES] + ['max ms']
+        self.stdout.write(' '.join(f'{columna:>18}' if i == 0 else f'{columna:>9}'
+                                   for i, columna in enumerate(encabezado)))
+        for fila in resultados:
+            valores = [fila['escenario'], fila['peticiones'], fila['errores'], fila['rps']]
+            valores += [fila[f'p{p}_ms'] for p in PERCENTILES] + [fila['max_ms']]
+            self.stdout.write(' '.join(f'{valor:>18}' if i == 0 else f'{valor:>9}'
+                                       for i, valor in enumerate(valores)))
+
+    def elegir_empresa(self, empresa_id):
+        if empresa_id is None:
+            # La empresa con más productos: la más exigente para los listados
+            empresa_id = Product.objects.order_by().values('empresa').annotate(
+                total=Count('id')
+            ).order_by('-total').values_list('empresa', flat=True).first()
+        empresa = Empresa.objects.filter(pk=empresa_id).first()
+        if empresa is None:
+            raise CommandError('No hay empresa con productos; ejecuta generar_datos_sinteticos')
+        return empresa
+
+    def peticion(self, nombre):
+        """Método, ruta y cuerpo de una petición del escenario."""
+        if nombre == 'productos_lista':
+            return 'GET', '/api/products/', None
+        if nombre == 'producto_detalle':
+            return 'GET', f'/api/products/{self.random.choice(self.productos)}/', None
+        if nombre == 'movimientos_lista':
+            return 'GET', '/api/movements/', None
+        if nombre == 'categoria_resumen':
+            return 'GET', f'/api/categories/{self.random.choice(self.categorias)}/resumen/', None
+        return 'POST', '/api/movements/', {
+            'producto': self.random.choice(self.productos),
+            'tipo_movimiento': 'ENTRADA',
+            'cantidad': 1,
+            'notas': 'benchmark_api',
+        }
+
+    def medir(self, nombre, cliente, total, calentamiento, concurrencia):
+        peticiones = [self.peticion(nombre) for _ in range(calentamiento + total)]
+
+        def ejecutar(peticion):
+            inicio = time.perf_counter()
+            try:
+                estado = cliente(*peticion)
+            except Exception:
+                estado = None
+            return time.perf_counter() - inicio, estado
+
+        for peticion in peticiones[:calentamiento]:
+            ejecutar(peticion)
+
+        inicio = time.perf_counter()
+        if concurrencia > 1:
+            with ThreadPoolExecutor(concurrencia) as pool:
+                medidas = list(pool.map(ejecutar, peticiones[calentamiento:]))
+            # Cada hilo del pool abrió su propia conexión
+            connections.close_all()
+        else:
+            medidas = [ejecutar(peticion) for peticion in peticiones[calentamiento:]]
+        duracion = time.perf_counter() - inicio
+
+        latencias = sorted(segundos * 1000 for segundos, _ in medidas)
+        errores = sum(1 for _, estado in medidas if estado is None or estado >= 400)
+        fila = {
+            'escenario': nombre,
+            'peticiones': len(medidas),
+            'errores': errores,
+            'rps': round(len(medidas) / duracion, 1) if duracion else None,
+        }
+        for p in PERCENTILES:
+            fila[f'p{p}_ms'] = round(percentil(latencias, p), 2)
+        fila['max_ms'] = round(latencias[-1], 2)
+        return fila
@@ -0,0 +1,297 @@
+import json
+import queue
+import random
+import re
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Case, F, Sum, When
+from django.utils import timezone
+
+from accounts.models import Empresa, User
+from inventario.management.commands.benchmark_api import PERCENTILES, percentil
+from inventario.models import Category, CategoryStats, Movement, Product
+
+
+def _crear_con_save(empresa, usuario, producto_id, tipo, cantidad):
+    """Camino de `POST /api/movements/`: UPDATE condicional dentro de `Movement.save()`."""
+    Movement.objects.create(
+        empresa=empresa, product_id=producto_id, movement_type=tipo,
+        quantity=cantidad, created_by=usuario,
+    )
+
+
+def _crear_con_lote(empresa, usuario, producto_id, tipo, cantidad):
+    """Camino de `POST /api/movements/bulk/` con una sola línea (SELECT ... FOR UPDATE)."""
+    _, errores = Movement.objects.registrar_lote(
+        [(0, {'producto': producto_id, 'tipo_movimiento': tipo, 'cantidad': cantidad})],
+        empresa=empresa, usuario=usuario,
+    )
+    if errores:
+        raise ValidationError(errores[0])
+
+
+def _crear_con_bloqueo_previo(empresa, usuario, producto_id, tipo, cantidad):
+    """Referencia: bloquea el producto antes de validar, leer, guardar e insertar.
+
+    Reproduce el patrón anterior en el que el bloqueo de la fila duraba toda
+    la secuencia `full_clean()` + lectura + `save()` + INSERT.
+    """
+    with transaction.atomic():
+        Product.objects.select_for_update().only('id').get(pk=producto_id)
+        _crear_con_save(empresa, usuario, producto_id, tipo, cantidad)
+
+
+ESTRATEGIAS = {
+    'save': _crear_con_save,
+    'lote': _crear_con_lote,
+    'bloqueo_previo': _crear_con_bloqueo_previo,
+}
+
+
+_ESCRITURA = re.compile(r'^(?:INSERT INTO|UPDATE|DELETE FROM)\s+"?(\w+)"?', re.IGNORECASE)
+_FROM = re.compile(r'\sFROM\s+"?(\w+)"?', re.IGNORECASE)
+
+
+class _MedidorBloqueo:
+    """`execute_wrapper` que mide cada sentencia de escritura, por tabla.
+
+    Cuenta los INSERT, UPDATE, DELETE y SELECT ... FOR UPDATE de la
+    transacción del movimiento y también los que corren tras el COMMIT
+    (estadísticas por categoría, acumulados diarios, checkpoints), porque
+    todos compiten por filas calientes.
+    """
+
+    def __init__(self):
+        self.segundos = 0.0
+        self.por_tabla = Counter()
+
+    @staticmethod
+    def tabla(sql):
+        coincidencia = _ESCRITURA.match(sql)
+        if coincidencia:
+            return coincidencia.group(1)
+        if 'FOR UPDATE' in sql:
+            coincidencia = _FROM.search(sql)
+            return coincidencia.group(1) if coincidencia else None
+        return None
+
+    def __call__(self, execute, sql, params, many, context):
+        tabla = self.tabla(sql.lstrip())
+        if tabla is None:
+            return execute(sql, params, many, context)
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            transcurrido = time.perf_counter() - inicio
+            self.segundos += transcurrido
+            self.por_tabla[tabla] += transcurrido
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark de contención: salidas concurrentes sobre pocos productos '
+        'calientes. Mide throughput, espera en escrituras por tabla y latencia p99 por '
+        'estrategia de escritura y verifica los invariantes de stock'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estrategias', nargs='+', choices=list(ESTRATEGIAS), default=list(ESTRATEGIAS))
+        parser.add_argument('--hilos', type=int, default=16, help='Cajeros concurrentes')
+        parser.add_argument('--operaciones', type=int, default=2000, help='Movimientos por estrategia')
+        parser.add_argument('--productos', type=int, default=3, help='Productos calientes')
+        parser.add_argument('--stock', type=int, default=1000,
+                            help='Stock inicial por producto (bajo = se ejercita el rechazo por stock)')
+        parser.add_argument('--entradas', type=float, default=0.1, help='Fracción de reposiciones')
+        parser.add_argument('--semilla', type=int, default=None)
+        parser.add_argument('--conservar', action='store_true', help='No borrar los datos del benchmark')
+        parser.add_argument('--json', action='store_true', help='Imprime los resultados como JSON')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            self.stderr.write(self.style.WARNING(
+                f'Base de datos {connection.vendor}: la contención solo es representativa en PostgreSQL'
+            ))
+        if options['hilos'] < 1 or options['operaciones'] < 1 or options['productos'] < 1:
+            raise CommandError('--hilos, --operaciones y --productos deben ser al menos 1')
+        self.random = random.Random(options['semilla'])
+
+        empresa = Empresa.objects.create(
+            nombre=f'Benchmark concurrencia {timezone.now():%Y%m%d%H%M%S%f}', nicho='farmacia'
+        )
+        usuario = User.objects.create(
+            email=f'benchmark{empresa.pk}@concurrencia.test',
+            username=f'benchmark_concurrencia_{empresa.pk}',
+            empresa=empresa,
+        )
+        categoria = Category.objects.create(empresa=empresa, nombre='Productos calientes')
+        try:
+            resultados = [
+                self.ejecutar(nombre, empresa, usuario, categoria, options)
+                for nombre in options['estrategias']
+            ]
+        finally:
+            if not options['conservar']:
+                self.limpiar(empresa)
+
+        if options['json']:
+            self.stdout.write(json.dumps(resultados, indent=2))
+        else:
+            self.imprimir(resultados, options)
+        fallidas = [fila['estrategia'] for fila in resultados if fila['violaciones']]
+        if fallidas:
+            raise CommandError(f"Invariantes violados en: {', '.join(fallidas)}")
+
+    def ejecutar(self, nombre, empresa, usuario, categoria, options):
+        productos = [
+            Product.objects.create(
+                empresa=empresa, categoria=categoria, nombre=f'{nombre} {i + 1}',
+                cantidad=options['stock'], stock_minimo=10,
+                costo=Decimal('1.00'), precio_venta=Decimal('2.00'),
+            ).pk
+            for i in range(options['productos'])
+        ]
+        tareas = queue.SimpleQueue()
+        for _ in range(options['operaciones']):
+            es_entrada = self.random.random() < options['entradas']
+            tareas.put((
+                self.random.choice(productos),
+                Movement.TIPO_ENTRADA if es_entrada else Movement.TIPO_SALIDA,
+                self.random.randint(5, 20) if es_entrada else self.random.randint(1, 3),
+            ))
+
+        operacion = ESTRATEGIAS[nombre]
+        medidas = []
+        resultados = Counter()
+        errores = Counter()
+        por_tabla = Counter()
+        candado = threading.Lock()
+
+        def trabajador():
+            medidor = _MedidorBloqueo()
+            propias = []
+            try:
+                with connection.execute_wrapper(medidor):
+                    while True:
+                        try:
+                            tarea = tareas.get_nowait()
+                        except queue.Empty:
+                            break
+                        antes = medidor.segundos
+                        inicio = time.perf_counter()
+                        try:
+                            operacion(empresa, usuario, *tarea)
+                            resultado = 'ok'
+                        except ValidationError:
+                            resultado = 'rechazada'
+                        except DatabaseError as exc:
+                            resultado = type(exc).__name__
+                        propias.append((
+                            time.perf_counter() - inicio, medidor.segundos - antes, resultado
+                        ))
+            finally:
+                if threading.current_thread() is not threading.main_thread():
+                    connection.close()
+            with candado:
+                medidas.extend(propias)
+                por_tabla.update(medidor.por_tabla)
+
+        inicio = time.perf_counter()
+        if options['hilos'] == 1:
+            trabajador()
+        else:
+            hilos = [threading.Thread(target=trabajador) for _ in range(options['hilos'])]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        for _, _, resultado in medidas:
+            if resultado in ('ok', 'rechazada'):
+                resultados[resultado] += 1
+            else:
+                errores[resultado] += 1
+        latencias = sorted(segundos * 1000 for segundos, _, _ in medidas)
+        esperas = sorted(segundos * 1000 for _, segundos, _ in medidas)
+        fila = {
+            'estrategia': nombre,
+            'hilos': options['hilos'],
+            'operaciones': len(medidas),
+            'ok': resultados['ok'],
+            'rechazadas': resultados['rechazada'],
+            'errores': dict(errores),
+            'ops_s': round(len(medidas) / duracion, 1),
+            'espera_bloqueo_media_ms': round(sum(esperas) / len(esperas), 2),
+            'espera_bloqueo_p99_ms': round(percentil(esperas, 99), 2),
+            # Tiempo medio por operación en las escrituras de cada tabla
+            'espera_por_tabla_ms': {
+                tabla: round(segundos * 1000 / len(medidas), 3)
+                for tabla, segundos in por_tabla.most_common()
+            },
+        }
+        for p in PERCENTILES:
+            fila[f'p{p}_ms'] = round(percentil(latencias, p), 2)
+        fila['violaciones'] = self.verificar(productos, categoria, options['stock'], resultados['ok'])
+        return fila
+
+    def verificar(self, productos, categoria, stock_inicial, aceptadas):
+        """Stock no negativo, stock = inicial + libro de movimientos, tablas derivadas al día."""
+        violaciones = []
+        libro = dict(
+            Movement.objects.filter(product_id__in=productos).order_by().values('product_id')
+            .annotate(delta=Sum(Case(
+                When(movement_type=Movement.TIPO_SALIDA, then=-F('quantity')),
+                default=F('quantity'),
+            ))).values_list('product_id', 'delta')
+        )
+        for pk, cantidad in Product.objects.filter(pk__in=productos).values_list('pk', 'cantidad'):
+            if cantidad < 0:
+                violaciones.append(f'producto {pk}: cantidad negativa ({cantidad})')
+            esperado = stock_inicial + libro.get(pk, 0)
+            if cantidad != esperado:
+                violaciones.append(f'producto {pk}: cantidad {cantidad} != libro {esperado}')
+
+        registrados = Movement.objects.filter(product_id__in=productos).count()
+        if registrados != aceptadas:
+            violaciones.append(f'{registrados} movimientos registrados para {aceptadas} aceptados')
+        stock_total = Product.objects.filter(categoria=categoria).aggregate(total=Sum('cantidad'))['total']
+        if CategoryStats.objects.get(category=categoria).stock_total != stock_total:
+            violaciones.append('CategoryStats.stock_total no coincide con los productos')
+        return violaciones
+
+    def limpiar(self, empresa):
+        with transaction.atomic():
+            Movement.objects.filter(empresa=empresa).delete()
+            Product.objects.filter(empresa=empresa).delete()
+            Category.objects.filter(empresa=empresa).delete()
+            empresa.usuarios.all().delete()
+            empresa.delete()
+
+    def imprimir(self, resultados, options):
+        self.stdout.write(
+            f"{options['hilos']} hilos, {options['productos']} productos calientes, "
+            f"stock inicial {options['stock']}"
+        )
+        columnas = ['estrategia', 'ops/s', 'ok', 'rechaz.', 'errores', 'escrit. ms', 'escr. p99']
+        columnas += [f'p{p} ms' for p in PERCENTILES]
+        self.stdout.write(' '.join(f'{c:>15}' if i == 0 else f'{c:>10}' for i, c in enumerate(columnas)))
+        for fila in resultados:
+            valores = [
+                fila['estrategia'], fila['ops_s'], fila['ok'], fila['rechazadas'],
+                sum(fila['errores'].values()), fila['espera_bloqueo_media_ms'],
+                fila['espera_bloqueo_p99_ms'],
+            ] + [fila[f'p{p}_ms'] for p in PERCENTILES]
+            self.stdout.write(' '.join(f'{v:>15}' if i == 0 else f'{v:>10}' for i, v in enumerate(valores)))
+            if fila['espera_por_tabla_ms']:
+                self.stdout.write(' ' * 16 + 'escrituras ms/op: ' + ', '.join(
+                    f'{tabla} {ms}' for tabla, ms in fila['espera_por_tabla_ms'].items()
+                ))
+            for violacion in fila['violaciones']:
+                self.stdout.write(self.style.ERROR(f"  {fila['estrategia']}: {violacion}"))
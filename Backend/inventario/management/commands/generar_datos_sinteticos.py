@@ -0,0 +1,294 @@
+import csv
+import io
+import random
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.text import slugify
+
+from accounts.models import Empresa, User
+from inventario.models import (
+    Category,
+    CategoryStats,
+    DailyMovementRollup,
+    Movement,
+    Product,
+    StockCheckpoint,
+)
+
+CATEGORIAS = {
+    'farmacia': ['Analgésicos', 'Antibióticos', 'Vitaminas', 'Dermatología', 'Cuidado personal'],
+    'veterinaria': ['Alimentos', 'Antiparasitarios', 'Vacunas', 'Accesorios', 'Higiene'],
+}
+CAMPOS_EXTRA = {
+    'farmacia': ('principio_activo', ['paracetamol', 'ibuprofeno', 'amoxicilina', 'loratadina']),
+    'veterinaria': ('especie', ['perro', 'gato', 'ave', 'equino']),
+}
+COLUMNAS_MOVIMIENTO = [
+    'id', 'empresa', 'product', 'movement_type', 'quantity', 'referencia', 'motivo', 'notes',
+    'created_by', 'created_at', 'updated_at',
+]
+COLUMNAS_ROLLUP = [
+    'empresa', 'product', 'fecha', 'movement_type', 'total_movimientos', 'cantidad_total',
+]
+
+
+def pesos_zipf(n, exponente):
+    """Pesos `1 / rango^s`: unos pocos elementos concentran la mayor parte."""
+    return [1 / (rango ** exponente) for rango in range(1, n + 1)]
+
+
+def repartir(total, pesos, minimo=1):
+    """Reparte `total` proporcionalmente a `pesos` (al menos `minimo` cada uno)."""
+    suma = sum(pesos)
+    return [max(minimo, round(total * peso / suma)) for peso in pesos]
+
+
+@contextmanager
+def fechas_explicitas(*campos):
+    """Desactiva `auto_now`/`auto_now_add` para insertar fechas históricas."""
+    originales = [(campo, campo.auto_now, campo.auto_now_add) for campo in campos]
+    for campo, _, _ in originales:
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in originales:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
+def insertar_filas(modelo, campos, filas):
+    """Inserta tuplas ya adaptadas a la base de datos sin pasar por el ORM.
+
+    En PostgreSQL usa `COPY ... FROM STDIN`; en el resto, `executemany`.
+    No ejecuta `save()` ni rellena `auto_now`: las filas deben estar completas.
+    """
+    if not filas:
+        return
+    tabla = connection.ops.quote_name(modelo._meta.db_table)
+    columnas = ', '.join(
+        connection.ops.quote_name(modelo._meta.get_field(campo).column) for campo in campos
+    )
+    with connection.cursor() as cursor:
+        if connection.vendor != 'postgresql':
+            marcas = ', '.join(['%s'] * len(campos))
+            cursor.executemany(f'INSERT INTO {tabla} ({columnas}) VALUES ({marcas})', filas)
+            return
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(filas)
+        sql = f'COPY {tabla} ({columnas}) FROM STDIN WITH (FORMAT csv)'
+        if hasattr(cursor.cursor, 'copy_expert'):
+            buffer.seek(0)
+            cursor.cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with cursor.cursor.copy(sql) as copia:
+                copia.write(buffer.getvalue())
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera empresas, categorías, productos y movimientos sintéticos con '
+        'distribución sesgada (Zipf) mediante inserciones en bloque. Asigna los ids '
+        'de los movimientos: ejecutar sin otras escrituras concurrentes'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresas', type=int, default=5)
+        parser.add_argument('--categorias', type=int, default=10, help='Categorías por empresa')
+        parser.add_argument('--productos', type=int, default=1000,
+                            help='Productos por empresa (promedio; el reparto es sesgado)')
+        parser.add_argument('--movimientos', type=int, default=20000,
+                            help='Movimientos por empresa (promedio; el reparto es sesgado)')
+        parser.add_argument('--dias', type=int, default=365, help='Días de historial')
+        parser.add_argument('--sesgo', type=float, default=1.1,
+                            help='Exponente Zipf para empresas, categorías y productos')
+        parser.add_argument('--semilla', type=int, default=None)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefijo', default='Sintética', help='Prefijo del nombre de las empresas')
+        parser.add_argument('--password', default='sintetico123',
+                            help='Contraseña de los usuarios generados')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['semilla'])
+        self.batch_size = options['batch_size']
+        self.sesgo = options['sesgo']
+        self.cada = settings.INVENTARIO_CHECKPOINT_CADA
+
+        n = options['empresas']
+        nombres = [f"{options['prefijo']} {i:04d}" for i in range(1, n + 1)]
+        if Empresa.objects.filter(nombre__in=nombres).exists():
+            raise CommandError(
+                f"Ya existen empresas con el prefijo '{options['prefijo']}'; usa otro --prefijo"
+            )
+
+        pesos = pesos_zipf(n, self.sesgo)
+        productos = repartir(options['productos'] * n, pesos)
+        movimientos = repartir(options['movimientos'] * n, pesos, minimo=0)
+        self.fin = timezone.now()
+        self.inicio = self.fin - timedelta(days=options['dias'])
+        clave = make_password(options['password'])
+        dominio = slugify(options['prefijo']) or 'sintetica'
+
+        inicio = time.perf_counter()
+        filas = 0
+        for i, nombre in enumerate(nombres):
+            t0 = time.perf_counter()
+            with transaction.atomic():
+                empresa = Empresa.objects.create(
+                    nombre=nombre, nicho='farmacia' if i % 2 == 0 else 'veterinaria'
+                )
+                usuario = User.objects.bulk_create([User(
+                    email=f'usuario{i + 1:04d}@{dominio}.test',
+                    username=f'{dominio}_{i + 1:04d}',
+                    password=clave,
+                    empresa=empresa,
+                )])[0]
+                escritas = self.generar_empresa(
+                    empresa, usuario, options['categorias'], productos[i], movimientos[i]
+                )
+            filas += escritas
+            self.stdout.write(
+                f'{nombre}: {productos[i]} productos, {movimientos[i]} movimientos '
+                f'({escritas / (time.perf_counter() - t0):.0f} filas/s)'
+            )
+
+        total = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'Filas generadas: {filas} en {total:.1f}s. '
+            f'Usuarios: usuario0001@{dominio}.test ... usuario{n:04d}@{dominio}.test'
+        ))
+
+    def generar_empresa(self, empresa, usuario, n_categorias, n_productos, n_movimientos):
+        """Genera los datos de una empresa y devuelve la cantidad de filas escritas."""
+        nombres = CATEGORIAS[empresa.nicho]
+        categorias = Category.objects.bulk_create([
+            Category(empresa=empresa, nombre=f'{nombres[j % len(nombres)]} {j + 1}')
+            for j in range(n_categorias)
+        ])
+        productos = self.crear_productos(empresa, categorias, n_productos)
+        movimientos, derivadas = self.crear_movimientos(empresa, usuario, productos, n_movimientos)
+
+        CategoryStats.objects.recalcular([categoria.pk for categoria in categorias])
+        # Productos más su checkpoint inicial
+        return len(categorias) + 2 * len(productos) + movimientos + derivadas
+
+    def crear_productos(self, empresa, categorias, n):
+        acumulados = list(accumulate(pesos_zipf(len(categorias), self.sesgo)))
+        clave, valores = CAMPOS_EXTRA[empresa.nicho]
+        hoy = self.fin.date()
+        productos = []
+        for k in range(n):
+            costo = Decimal(self.random.randint(100, 50000)) / 100
+            productos.append(Product(
+                empresa=empresa,
+                nombre=f'Producto {k + 1:06d}',
+                categoria=self.random.choices(categorias, cum_weights=acumulados)[0],
+                cantidad=0,
+                unidad_medida=self.random.choice(['unidades', 'caja', 'ml']),
+                stock_minimo=self.random.randint(0, 30),
+                costo=costo,
+                precio_venta=(costo * Decimal('1.35')).quantize(Decimal('0.01')),
+                proveedor=f'Proveedor {self.random.randint(1, 20)}',
+                fecha_vencimiento=(
+                    hoy + timedelta(days=self.random.randint(1, 720))
+                    if self.random.random() < 0.5 else None
+                ),
+                campos_extra={clave: self.random.choice(valores)},
+                created_at=self.inicio,
+                updated_at=self.inicio,
+            ))
+        with fechas_explicitas(Product._meta.get_field('created_at'), Product._meta.get_field('updated_at')):
+            productos = Product.objects.bulk_create(productos, batch_size=self.batch_size)
+        # Checkpoint inicial, como en el alta por la API
+        StockCheckpoint.objects.bulk_create([
+            StockCheckpoint(empresa=empresa, product=producto, cantidad=0, fecha=self.inicio)
+            for producto in productos
+        ], batch_size=self.batch_size)
+        return productos
+
+    def crear_movimientos(self, empresa, usuario, productos, n):
+        """Inserta `n` movimientos en orden cronológico sin dejar stock negativo.
+
+        Los productos calientes se eligen al azar (no por nombre) y reciben
+        la mayor parte de los movimientos. Los movimientos y los acumulados
+        diarios se escriben con `insertar_filas` con ids asignados aquí,
+        para poder enlazar los checkpoints sin releer la tabla.
+        Devuelve `(movimientos, filas_derivadas)`.
+        """
+        orden = productos[:]
+        self.random.shuffle(orden)
+        acumulados = list(accumulate(pesos_zipf(len(orden), self.sesgo)))
+        rango = (self.fin - self.inicio).total_seconds()
+        instantes = sorted(self.random.random() * rango for _ in range(n))
+        zona = Empresa.zona_de(empresa.pk)
+        fecha_bd = connection.ops.adapt_datetimefield_value
+
+        stock = {producto.pk: 0 for producto in productos}
+        pendientes = {producto.pk: 0 for producto in productos}
+        diarios = defaultdict(lambda: [0, 0])
+        siguiente_id = (Movement.objects.aggregate(maximo=Max('id'))['maximo'] or 0) + 1
+        derivadas = 0
+        for desde in range(0, n, self.batch_size):
+            lote, checkpoints = [], []
+            for segundos in instantes[desde:desde + self.batch_size]:
+                producto = self.random.choices(orden, cum_weights=acumulados)[0].pk
+                # Salidas pequeñas y reposiciones ocasionales: el stock oscila sin crecer sin límite
+                cantidad = self.random.randint(1, 10)
+                tipo = Movement.TIPO_SALIDA
+                if self.random.random() < 0.15 or stock[producto] < cantidad:
+                    tipo, cantidad = Movement.TIPO_ENTRADA, self.random.randint(10, 50)
+                stock[producto] += cantidad if tipo == Movement.TIPO_ENTRADA else -cantidad
+                fecha = self.inicio + timedelta(seconds=segundos)
+                referencia = (
+                    f'FAC-{self.random.randint(1, 999999):06d}' if tipo == Movement.TIPO_ENTRADA else ''
+                )
+                lote.append((
+                    siguiente_id, empresa.pk, producto, tipo, cantidad, referencia, '', '',
+                    usuario.pk, fecha_bd(fecha), fecha_bd(fecha),
+                ))
+                diario = diarios[(producto, fecha.astimezone(zona).date(), tipo)]
+                diario[0] += 1
+                diario[1] += cantidad
+
+                pendientes[producto] += 1
+                if pendientes[producto] >= self.cada:
+                    pendientes[producto] = 0
+                    checkpoints.append(StockCheckpoint(
+                        empresa=empresa, product_id=producto, movement_id=siguiente_id,
+                        cantidad=stock[producto], fecha=fecha,
+                    ))
+                siguiente_id += 1
+
+            insertar_filas(Movement, COLUMNAS_MOVIMIENTO, lote)
+            derivadas += len(StockCheckpoint.objects.bulk_create(checkpoints))
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Movement]):
+                cursor.execute(sql)
+            tabla = connection.ops.quote_name(Product._meta.db_table)
+            cursor.executemany(
+                f'UPDATE {tabla} SET cantidad = %s, movimientos_sin_checkpoint = %s, '
+                f'updated_at = %s WHERE id = %s',
+                [(stock[pk], pendientes[pk], fecha_bd(self.fin), pk) for pk in stock]
+            )
+
+        filas = [
+            (empresa.pk, producto, connection.ops.adapt_datefield_value(dia), tipo, total, cantidad)
+            for (producto, dia, tipo), (total, cantidad) in diarios.items()
+        ]
+        for desde in range(0, len(filas), self.batch_size):
+            insertar_filas(DailyMovementRollup, COLUMNAS_ROLLUP, filas[desde:desde + self.batch_size])
+        return n, derivadas + len(filas)
+
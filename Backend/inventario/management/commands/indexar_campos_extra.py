@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from inventario.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Crea los índices de las claves de campos_extra declaradas en '
+        'INVENTARIO_CAMPOS_EXTRA_INDEXADOS y borra los de claves que ya no se declaran'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--concurrente', action='store_true',
+                            help='CREATE/DROP INDEX CONCURRENTLY en PostgreSQL (no bloquea escrituras)')
+        parser.add_argument('--simular', action='store_true', help='Solo muestra los cambios')
+
+    def handle(self, *args, **options):
+        try:
+            creados, borrados = Product.objects.sincronizar_indices_extra(
+                using=options['database'],
+                concurrente=options['concurrente'],
+                aplicar=not options['simular'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        for nombre in creados:
+            self.stdout.write(f'+ {nombre}')
+        for nombre in borrados:
+            self.stdout.write(f'- {nombre}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Índices creados: {len(creados)}, borrados: {len(borrados)}'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from inventario.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Elimina las claves de idempotencia expiradas'
+
+    def handle(self, *args, **options):
+        eliminadas = IdempotencyKey.objects.purgar_expiradas()
+        self.stdout.write(self.style.SUCCESS(f'Claves expiradas eliminadas: {eliminadas}'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from inventario.models import DailyMovementRollup
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los acumulados diarios de movimientos desde el historial'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresa', type=int, help='Reconstruir solo esta empresa')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        escritas = DailyMovementRollup.objects.reconstruir(
+            empresa_id=options['empresa'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Acumulados diarios escritos: {escritas}'))
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:03
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('inventario', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=255, verbose_name='Clave')),
+                ('ruta', models.CharField(max_length=255, verbose_name='Ruta')),
+                ('huella', models.CharField(help_text='SHA-256 del cuerpo de la petición original', max_length=64, verbose_name='Huella')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Código de estado')),
+                ('respuesta', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Respuesta')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado el')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Expira el')),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to='accounts.empresa', verbose_name='Empresa')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to=settings.AUTH_USER_MODEL, verbose_name='Usuario')),
+            ],
+            options={
+                'verbose_name': 'Clave de idempotencia',
+                'verbose_name_plural': 'Claves de idempotencia',
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'clave'), name='idempotency_key_usuario_clave_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def crear_checkpoints_iniciales(apps, schema_editor):
+    """Checkpoint con el stock actual de cada producto existente.
+
+    Sin él, `stock_en` reconstruye el historial de estos productos hacia
+    atrás desde el primer ajuste manual posterior y no puede descontarlo.
+    """
+    Product = apps.get_model('inventario', 'Product')
+    StockCheckpoint = apps.get_model('inventario', 'StockCheckpoint')
+
+    ahora = timezone.now()
+    StockCheckpoint.objects.bulk_create((
+        StockCheckpoint(empresa_id=empresa_id, product_id=pk, cantidad=cantidad, fecha=ahora)
+        for pk, empresa_id, cantidad in Product.objects.filter(checkpoints__isnull=True)
+        .values_list('id', 'empresa_id', 'cantidad').iterator()
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('inventario', '0002_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='movimientos_sin_checkpoint',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Movimientos aplicados desde el último checkpoint de stock', verbose_name='Movimientos sin checkpoint'),
+        ),
+        migrations.CreateModel(
+            name='StockCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.IntegerField(verbose_name='Cantidad')),
+                ('fecha', models.DateTimeField(verbose_name='Fecha')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Creado el')),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stock_checkpoints', to='accounts.empresa', verbose_name='Empresa')),
+                ('movement', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventario.movement', verbose_name='Último movimiento incluido')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='inventario.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Checkpoint de stock',
+                'verbose_name_plural': 'Checkpoints de stock',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['product', 'fecha'], name='checkpoint_producto_fecha_idx')],
+            },
+        ),
+        migrations.RunPython(crear_checkpoints_iniciales, migrations.RunPython.noop),
+    ]
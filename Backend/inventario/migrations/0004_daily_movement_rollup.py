@@ -0,0 +1,34 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_empresa_zona_horaria'),
+        ('inventario', '0003_stock_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMovementRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha')),
+                ('movement_type', models.CharField(max_length=20, verbose_name='Tipo de movimiento')),
+                ('total_movimientos', models.IntegerField(default=0, verbose_name='Total de movimientos')),
+                ('cantidad_total', models.IntegerField(default=0, verbose_name='Cantidad total')),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='movement_rollups', to='accounts.empresa', verbose_name='Empresa')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='inventario.product', verbose_name='Producto')),
+            ],
+            options={
+                'verbose_name': 'Acumulado diario de movimientos',
+                'verbose_name_plural': 'Acumulados diarios de movimientos',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['empresa', 'fecha'], name='rollup_empresa_fecha_idx')],
+                'constraints': [models.UniqueConstraint(fields=('empresa', 'product', 'fecha', 'movement_type'), name='rollup_empresa_producto_fecha_tipo_uniq')],
+            },
+        ),
+    ]
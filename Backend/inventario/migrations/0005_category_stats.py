@@ -0,0 +1,63 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:09
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+
+
+def poblar_estadisticas(apps, schema_editor):
+    Category = apps.get_model('inventario', 'Category')
+    Product = apps.get_model('inventario', 'Product')
+    CategoryStats = apps.get_model('inventario', 'CategoryStats')
+
+    agregados = {
+        fila.pop('categoria_id'): fila
+        for fila in Product.objects.order_by().values('categoria_id').annotate(
+            total_productos=Count('id'),
+            stock_total=Sum('cantidad'),
+            valor_inventario=Sum(
+                F('cantidad') * F('costo'),
+                output_field=models.DecimalField(max_digits=20, decimal_places=2)
+            ),
+            productos_bajo_stock=Count('id', filter=Q(cantidad__lt=F('stock_minimo'))),
+        )
+    }
+    CategoryStats.objects.bulk_create([
+        CategoryStats(category_id=pk, empresa_id=empresa_id, **agregados.get(pk, {
+            'total_productos': 0,
+            'stock_total': 0,
+            'valor_inventario': Decimal('0'),
+            'productos_bajo_stock': 0,
+        }))
+        for pk, empresa_id in Category.objects.values_list('id', 'empresa_id').iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_empresa_zona_horaria'),
+        ('inventario', '0004_daily_movement_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStats',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='inventario.category', verbose_name='Categoría')),
+                ('total_productos', models.IntegerField(default=0, verbose_name='Total de productos')),
+                ('stock_total', models.BigIntegerField(default=0, verbose_name='Stock total')),
+                ('valor_inventario', models.DecimalField(decimal_places=2, default=0, help_text='Suma de cantidad × costo', max_digits=20, verbose_name='Valor de inventario')),
+                ('productos_bajo_stock', models.IntegerField(default=0, verbose_name='Productos bajo stock')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Actualizado el')),
+                ('empresa', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='category_stats', to='accounts.empresa', verbose_name='Empresa')),
+            ],
+            options={
+                'verbose_name': 'Estadísticas de categoría',
+                'verbose_name_plural': 'Estadísticas de categorías',
+            },
+        ),
+        migrations.RunPython(poblar_estadisticas, migrations.RunPython.noop),
+    ]
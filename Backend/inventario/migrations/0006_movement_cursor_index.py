@@ -0,0 +1,20 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_empresa_zona_horaria'),
+        ('inventario', '0005_category_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movement',
+            index=models.Index(fields=['empresa', '-created_at', '-id'], name='movimiento_empresa_fecha_idx'),
+        ),
+    ]
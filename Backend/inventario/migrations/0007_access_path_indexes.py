@@ -0,0 +1,36 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_empresa_zona_horaria'),
+        ('inventario', '0006_movement_cursor_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movement',
+            index=models.Index(fields=['empresa', 'product', '-created_at', '-id'], name='movimiento_emp_prod_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movement',
+            index=models.Index(fields=['empresa', 'movement_type', '-created_at', '-id'], name='movimiento_emp_tipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['categoria', 'nombre', 'id'], name='producto_categoria_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('cantidad__lt', models.F('stock_minimo'))), fields=['empresa', 'nombre'], name='producto_bajo_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('fecha_vencimiento__isnull', False)), fields=['empresa', 'fecha_vencimiento'], name='producto_vencimiento_idx'),
+        ),
+    ]
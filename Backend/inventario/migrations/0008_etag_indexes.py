@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_empresa_ultima_eliminacion'),
+        ('inventario', '0007_access_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movement',
+            index=models.Index(fields=['empresa', 'updated_at', 'id'], name='movimiento_empresa_cambio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['empresa', 'updated_at', 'id'], name='producto_empresa_cambio_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_empresa_ultima_eliminacion'),
+        ('inventario', '0008_etag_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['empresa', 'updated_at', 'id'], name='categoria_empresa_cambio_idx'),
+        ),
+    ]
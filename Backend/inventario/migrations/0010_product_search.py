@@ -0,0 +1,24 @@
+# Generated by Django 6.0.2 on 2026-10-17 21:30
+
+from django.db import migrations
+
+from inventario.search import crear_indices_busqueda, eliminar_indices_busqueda
+
+
+def crear(apps, schema_editor):
+    crear_indices_busqueda(schema_editor.connection)
+
+
+def eliminar(apps, schema_editor):
+    eliminar_indices_busqueda(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0009_sync_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear, eliminar),
+    ]
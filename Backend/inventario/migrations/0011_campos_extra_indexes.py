@@ -0,0 +1,31 @@
+# Generated by Django 6.0.2 on 2026-10-17 22:10
+
+from django.db import migrations
+
+# jsonb_ops (opclass por defecto) sirve `@>` (extra__contains) y `?` (extra__<clave>__exists)
+CREAR_GIN = (
+    'CREATE INDEX IF NOT EXISTS producto_campos_extra_gin_idx '
+    'ON inventario_product USING gin (campos_extra)'
+)
+BORRAR_GIN = 'DROP INDEX IF EXISTS producto_campos_extra_gin_idx'
+
+
+def crear(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREAR_GIN)
+
+
+def eliminar(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(BORRAR_GIN)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0010_product_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear, eliminar),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-17 21:02
+
+from django.db import migrations, models
+
+CUBRIENTE = """
+    ALTER TABLE inventario_product
+    DROP CONSTRAINT producto_empresa_codigo_uniq,
+    ADD CONSTRAINT producto_empresa_codigo_uniq UNIQUE (empresa_id, codigo) INCLUDE (id, nombre)
+"""
+
+
+def constraint_cubriente(apps, schema_editor):
+    # Django no crea UniqueConstraint con `include` en SQLite (ni la unicidad):
+    # se declara sin columnas extra y en PostgreSQL se recrea con INCLUDE, mismo nombre
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CUBRIENTE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_empresa_ultima_eliminacion'),
+        ('inventario', '0011_campos_extra_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='codigo',
+            field=models.CharField(blank=True, help_text='Código de barras o SKU, único por empresa', max_length=64, null=True, verbose_name='Código'),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.UniqueConstraint(fields=('empresa', 'codigo'), name='producto_empresa_codigo_uniq'),
+        ),
+        migrations.RunPython(constraint_cubriente, migrations.RunPython.noop),
+    ]
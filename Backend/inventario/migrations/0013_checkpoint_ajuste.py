@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-17 21:46
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def crear_checkpoints_iniciales(apps, schema_editor):
+    """Como en 0003, para las bases que la aplicaron antes de que creara checkpoints."""
+    Product = apps.get_model('inventario', 'Product')
+    StockCheckpoint = apps.get_model('inventario', 'StockCheckpoint')
+
+    ahora = timezone.now()
+    StockCheckpoint.objects.bulk_create((
+        StockCheckpoint(empresa_id=empresa_id, product_id=pk, cantidad=cantidad, fecha=ahora)
+        for pk, empresa_id, cantidad in Product.objects.filter(checkpoints__isnull=True)
+        .values_list('id', 'empresa_id', 'cantidad').iterator()
+    ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0012_product_codigo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockcheckpoint',
+            name='ajuste',
+            field=models.IntegerField(default=0, help_text='Cambio de stock fuera de movimientos (alta o edición manual)', verbose_name='Ajuste'),
+        ),
+        migrations.RunPython(crear_checkpoints_iniciales, migrations.RunPython.noop),
+    ]
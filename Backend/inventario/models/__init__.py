@@ -1,5 +1,17 @@
 from .category import Category
 from .product import Product
 from .movement import Movement
+from .checkpoint import StockCheckpoint
+from .rollup import DailyMovementRollup
+from .idempotency import IdempotencyKey
+from .category_stats import CategoryStats
 
-__all__ = ['Category', 'Product', 'Movement']
+__all__ = [
+    'Category',
+    'Product',
+    'Movement',
+    'StockCheckpoint',
+    'DailyMovementRollup',
+    'IdempotencyKey',
+    'CategoryStats',
+]
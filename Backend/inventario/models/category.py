@@ -1,5 +1,7 @@
 from django.db import models
 
+from accounts.models import Empresa
+
 
 class Category(models.Model):
     """Categoría de productos.
@@ -45,6 +47,15 @@ class Category(models.Model):
         verbose_name = 'Categoría'
         verbose_name_plural = 'Categorías'
         ordering = ['nombre']
+        indexes = [
+            # Cambios de la empresa en orden (sincronización y validadores ETag)
+            models.Index(fields=['empresa', 'updated_at', 'id'], name='categoria_empresa_cambio_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        Empresa.marcar_eliminacion(self.empresa_id)
+        return resultado
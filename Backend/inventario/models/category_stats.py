@@ -0,0 +1,178 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+class CategoryStatsManager(models.Manager):
+    """Manager de estadísticas materializadas por categoría."""
+
+    def recalcular(self, categoria_ids):
+        """Recalcula desde los productos las filas de las categorías indicadas.
+
+        Una consulta agrupada para todas las categorías y un upsert. Se usa
+        cuando cambia un producto (alta, edición, baja).
+        """
+        from .category import Category
+        from .product import Product
+
+        categoria_ids = {pk for pk in categoria_ids if pk is not None}
+        if not categoria_ids:
+            return
+        agregados = {
+            fila.pop('categoria_id'): fila
+            for fila in Product.objects.filter(categoria_id__in=categoria_ids).order_by()
+            .values('categoria_id').annotate(
+                total_productos=Count('id'),
+                stock_total=Coalesce(Sum('cantidad'), 0),
+                valor_inventario=Coalesce(
+                    Sum(F('cantidad') * F('costo'),
+                        output_field=models.DecimalField(max_digits=20, decimal_places=2)),
+                    Decimal('0'),
+                    output_field=models.DecimalField(max_digits=20, decimal_places=2),
+                ),
+                productos_bajo_stock=Count('id', filter=Q(cantidad__lt=F('stock_minimo'))),
+            )
+        }
+        vacio = {
+            'total_productos': 0,
+            'stock_total': 0,
+            'valor_inventario': Decimal('0'),
+            'productos_bajo_stock': 0,
+        }
+        filas = [
+            self.model(category_id=pk, empresa_id=empresa_id, **agregados.get(pk, vacio))
+            for pk, empresa_id in Category.objects.filter(pk__in=categoria_ids)
+            .values_list('id', 'empresa_id').order_by('id')
+        ]
+        self.bulk_create(
+            filas,
+            update_conflicts=True,
+            unique_fields=['category'],
+            update_fields=[
+                'empresa', 'total_productos', 'stock_total',
+                'valor_inventario', 'productos_bajo_stock', 'updated_at',
+            ],
+        )
+
+    def aplicar_delta_stock(self, cambios):
+        """Aplica tras el COMMIT los cambios de stock de los movimientos.
+
+        `cambios` son tuplas `(categoria_id, delta, costo, bajo_antes,
+        bajo_despues)`, una por producto; `bajo_antes`/`bajo_despues`
+        indican si estaba por debajo de su stock mínimo antes y después.
+        Se suman por categoría y cada fila recibe un único UPDATE, en orden
+        de id, fuera de la transacción del movimiento: dentro de ella la
+        fila de la categoría quedaría bloqueada hasta el COMMIT y todas las
+        ventas de la categoría esperarían unas a otras. Si el proceso cae
+        entre el COMMIT y el UPDATE, `recalcular` repara la fila.
+        """
+        acumulado = defaultdict(lambda: [0, Decimal('0'), 0])
+        for categoria_id, delta, costo, bajo_antes, bajo_despues in cambios:
+            if categoria_id is None:
+                continue
+            fila = acumulado[categoria_id]
+            fila[0] += delta
+            fila[1] += Decimal(delta) * costo
+            fila[2] += int(bajo_despues) - int(bajo_antes)
+        if acumulado:
+            transaction.on_commit(lambda: self._aplicar_acumulado(acumulado))
+
+    def _aplicar_acumulado(self, acumulado):
+        for categoria_id in sorted(acumulado):
+            stock, valor, bajo_stock = acumulado[categoria_id]
+            self._aplicar(categoria_id, stock=stock, valor=valor, bajo_stock=bajo_stock)
+
+    def aplicar_cambio_producto(self, anterior, nuevo):
+        """Aplica el alta o la edición de un producto como deltas.
+
+        `anterior` y `nuevo` son diccionarios con `categoria_id`, `cantidad`,
+        `costo` y `stock_minimo` (`anterior` es `None` en un alta). Un cambio
+        de categoría resta el producto de una fila y lo suma a la otra.
+        """
+        deltas = {}
+        for valores, signo in ((anterior, -1), (nuevo, 1)):
+            if valores is None or valores['categoria_id'] is None:
+                continue
+            delta = deltas.setdefault(valores['categoria_id'], [0, 0, Decimal('0'), 0])
+            delta[0] += signo
+            delta[1] += signo * valores['cantidad']
+            delta[2] += signo * valores['cantidad'] * Decimal(valores['costo'])
+            delta[3] += signo * int(valores['cantidad'] < valores['stock_minimo'])
+        for categoria_id in sorted(deltas):
+            productos, stock, valor, bajo_stock = deltas[categoria_id]
+            self._aplicar(categoria_id, productos, stock, valor, bajo_stock)
+
+    def _aplicar(self, categoria_id, productos=0, stock=0, valor=0, bajo_stock=0):
+        """Suma los deltas a la fila de la categoría; si no existe, la recalcula."""
+        from django.utils import timezone
+
+        cambios = {}
+        if productos:
+            cambios['total_productos'] = F('total_productos') + productos
+        if stock:
+            cambios['stock_total'] = F('stock_total') + stock
+        if valor:
+            cambios['valor_inventario'] = F('valor_inventario') + valor
+        if bajo_stock:
+            cambios['productos_bajo_stock'] = F('productos_bajo_stock') + bajo_stock
+        if not cambios:
+            return
+        if not self.filter(category_id=categoria_id).update(updated_at=timezone.now(), **cambios):
+            self.recalcular([categoria_id])
+
+    def para(self, categoria):
+        """Fila de estadísticas de `categoria`, calculándola si no existe."""
+        stats = self.filter(category=categoria).first()
+        if stats is None:
+            self.recalcular([categoria.pk])
+            stats = self.get(category=categoria)
+        return stats
+
+
+class CategoryStats(models.Model):
+    """Estadísticas de inventario materializadas por categoría.
+
+    Se mantienen de forma incremental: los movimientos aplican su delta con
+    un UPDATE tras el COMMIT, las altas y ediciones de productos dentro de
+    su transacción; las bajas y las cargas masivas recalculan la fila de su
+    categoría.
+    `CategoryViewSet.resumen` lee una sola fila.
+    """
+    category = models.OneToOneField(
+        'Category',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Categoría'
+    )
+    empresa = models.ForeignKey(
+        'accounts.Empresa',
+        on_delete=models.CASCADE,
+        related_name='category_stats',
+        null=True,
+        blank=True,
+        verbose_name='Empresa'
+    )
+    total_productos = models.IntegerField(default=0, verbose_name='Total de productos')
+    stock_total = models.BigIntegerField(default=0, verbose_name='Stock total')
+    valor_inventario = models.DecimalField(
+        max_digits=20,
+        decimal_places=2,
+        default=0,
+        verbose_name='Valor de inventario',
+        help_text='Suma de cantidad × costo'
+    )
+    productos_bajo_stock = models.IntegerField(default=0, verbose_name='Productos bajo stock')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Actualizado el')
+
+    objects = CategoryStatsManager()
+
+    class Meta:
+        verbose_name = 'Estadísticas de categoría'
+        verbose_name_plural = 'Estadísticas de categorías'
+
+    def __str__(self):
+        return f"Estadísticas de {self.category_id}"
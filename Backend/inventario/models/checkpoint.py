@@ -0,0 +1,218 @@
+from django.db import models
+from django.conf import settings
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+
+def _suma_con_signo():
+    """Expresión `SUM(+quantity | -quantity)` según el tipo de movimiento."""
+    from .movement import Movement
+
+    return Coalesce(
+        Sum(Case(
+            When(movement_type=Movement.TIPO_SALIDA, then=-F('quantity')),
+            default=F('quantity'),
+        )),
+        Value(0),
+    )
+
+
+class StockCheckpointManager(models.Manager):
+    """Manager de checkpoints con las consultas de stock histórico."""
+
+    def crear(self, product_id, empresa_id, cantidad, fecha, movimiento=None, ajuste=0):
+        """Guarda un checkpoint y reinicia el contador del producto."""
+        from .product import Product
+
+        Product.objects.filter(pk=product_id).update(movimientos_sin_checkpoint=0)
+        return self.create(
+            empresa_id=empresa_id,
+            product_id=product_id,
+            movement=movimiento,
+            cantidad=cantidad,
+            ajuste=ajuste,
+            fecha=fecha,
+        )
+
+    def registrar_movimiento(self, movimiento, cantidad, pendientes):
+        """Crea un checkpoint si el producto acumuló suficientes movimientos.
+
+        Se llama desde `Movement.save()` dentro de la misma transacción, con
+        la fila del producto ya bloqueada por el UPDATE de stock y su
+        `cantidad` y `movimientos_sin_checkpoint` ya releídos.
+        """
+        if pendientes >= settings.INVENTARIO_CHECKPOINT_CADA:
+            self.crear(
+                movimiento.product_id,
+                movimiento.empresa_id,
+                cantidad,
+                movimiento.created_at,
+                movimiento=movimiento,
+            )
+
+    def invalidar_desde(self, deltas, fecha):
+        """Corrige los checkpoints posteriores a `fecha` tras modificar el historial.
+
+        `deltas` es `{product_id: cambio de stock}`. Los checkpoints derivados
+        de movimientos se eliminan (se regeneran con los siguientes); los de
+        ajustes manuales y altas (`movement=None`) son el único registro de
+        esos cambios de stock, así que se conservan desplazados por el delta.
+        """
+        posteriores = self.filter(product_id__in=deltas.keys(), fecha__gte=fecha)
+        posteriores.filter(movement__isnull=False).delete()
+        for product_id, delta in deltas.items():
+            if delta:
+                posteriores.filter(product_id=product_id).update(cantidad=F('cantidad') + delta)
+
+    def stock_en(self, product, fecha):
+        """Stock de `product` en `fecha`.
+
+        Parte del checkpoint más cercano anterior a `fecha` y suma los
+        movimientos posteriores; si no existe, parte del siguiente
+        checkpoint (o del stock actual) y resta hacia atrás, descontando
+        también el `ajuste` manual que registró ese checkpoint. El costo es
+        O(movimientos entre el checkpoint y la fecha).
+
+        Devuelve `(cantidad, checkpoint_usado, movimientos_reproducidos)`.
+        """
+        from .movement import Movement
+
+        if fecha < product.created_at:
+            return 0, None, 0
+
+        movimientos = Movement.objects.filter(product=product).order_by()
+        anterior = self.filter(product=product, fecha__lte=fecha).order_by('-fecha', '-id').first()
+        if anterior is not None:
+            tramo = movimientos.filter(created_at__lte=fecha).filter(
+                Q(created_at__gt=anterior.fecha)
+                | Q(created_at=anterior.fecha, id__gt=anterior.movement_id or 0)
+            )
+            resultado = tramo.aggregate(delta=_suma_con_signo(), total=models.Count('id'))
+            return anterior.cantidad + resultado['delta'], anterior, resultado['total']
+
+        siguiente = self.filter(product=product, fecha__gt=fecha).order_by('fecha', 'id').first()
+        tramo = movimientos.filter(created_at__gt=fecha)
+        if siguiente is not None:
+            tramo = tramo.filter(
+                Q(created_at__lt=siguiente.fecha)
+                | Q(created_at=siguiente.fecha, id__lte=siguiente.movement_id or 0)
+            )
+            # Stock justo antes del checkpoint: sin el ajuste manual que registró
+            referencia = siguiente.cantidad - siguiente.ajuste
+        else:
+            referencia = product.cantidad
+        resultado = tramo.aggregate(delta=_suma_con_signo(), total=models.Count('id'))
+        return referencia - resultado['delta'], siguiente, resultado['total']
+
+    def anotar_stock_en(self, productos, fecha):
+        """Anota `stock_en_fecha` en un queryset de productos con una consulta.
+
+        Usa subconsultas correlacionadas sobre el checkpoint anterior a
+        `fecha` de cada producto; los productos sin checkpoint anterior se
+        calculan hacia atrás desde el siguiente (sin su `ajuste`) o, si no
+        hay ninguno, desde el stock actual. Mismo resultado que `stock_en`.
+        """
+        from .movement import Movement
+
+        checkpoint = self.filter(product=OuterRef('pk'), fecha__lte=fecha).order_by('-fecha', '-id')
+        siguiente = self.filter(product=OuterRef('pk'), fecha__gt=fecha).order_by('fecha', 'id')
+
+        def suma(filtro):
+            return Coalesce(Subquery(
+                Movement.objects.filter(filtro, product=OuterRef('pk'))
+                .order_by().values('product')
+                .annotate(delta=_suma_con_signo()).values('delta')[:1]
+            ), Value(0))
+
+        return productos.annotate(
+            cp_cantidad=Subquery(checkpoint.values('cantidad')[:1]),
+            cp_fecha=Subquery(checkpoint.values('fecha')[:1]),
+            cp_movimiento=Subquery(checkpoint.values('movement_id')[:1]),
+            sig_cantidad=Subquery(siguiente.values('cantidad')[:1]),
+            sig_ajuste=Subquery(siguiente.values('ajuste')[:1]),
+            sig_fecha=Subquery(siguiente.values('fecha')[:1]),
+            sig_movimiento=Coalesce(
+                Subquery(siguiente.values('movement_id')[:1]), Value(0),
+                output_field=models.BigIntegerField(),
+            ),
+        ).annotate(
+            delta_desde_checkpoint=suma(
+                Q(created_at__lte=fecha) & (
+                    Q(created_at__gt=OuterRef('cp_fecha'))
+                    | Q(created_at=OuterRef('cp_fecha'), id__gt=OuterRef('cp_movimiento'))
+                )
+            ),
+            delta_hasta_siguiente=suma(
+                Q(created_at__gt=fecha) & (
+                    Q(created_at__lt=OuterRef('sig_fecha'))
+                    | Q(created_at=OuterRef('sig_fecha'), id__lte=OuterRef('sig_movimiento'))
+                )
+            ),
+            delta_hasta_hoy=suma(Q(created_at__gt=fecha)),
+        ).annotate(
+            stock_en_fecha=Case(
+                When(created_at__gt=fecha, then=Value(0)),
+                When(cp_cantidad__isnull=False, then=F('cp_cantidad') + F('delta_desde_checkpoint')),
+                When(
+                    sig_cantidad__isnull=False,
+                    then=F('sig_cantidad') - F('sig_ajuste') - F('delta_hasta_siguiente'),
+                ),
+                default=F('cantidad') - F('delta_hasta_hoy'),
+            )
+        )
+
+
+class StockCheckpoint(models.Model):
+    """Foto del stock de un producto en un instante.
+
+    Se escribe al crear el producto, al ajustar manualmente su cantidad y
+    cada `INVENTARIO_CHECKPOINT_CADA` movimientos. Permite responder "cuál
+    era el stock en la fecha D" sin reproducir todo el historial.
+
+    `ajuste` es el cambio de stock ajeno a movimientos que registra el
+    checkpoint (alta o edición manual de `cantidad`); hace falta para
+    reconstruir el stock hacia atrás a través de él.
+    """
+    empresa = models.ForeignKey(
+        'accounts.Empresa',
+        on_delete=models.CASCADE,
+        related_name='stock_checkpoints',
+        null=True,
+        blank=True,
+        verbose_name='Empresa'
+    )
+    product = models.ForeignKey(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='checkpoints',
+        verbose_name='Producto'
+    )
+    movement = models.ForeignKey(
+        'Movement',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Último movimiento incluido'
+    )
+    cantidad = models.IntegerField(verbose_name='Cantidad')
+    ajuste = models.IntegerField(
+        default=0,
+        verbose_name='Ajuste',
+        help_text='Cambio de stock fuera de movimientos (alta o edición manual)'
+    )
+    fecha = models.DateTimeField(verbose_name='Fecha')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Creado el')
+
+    objects = StockCheckpointManager()
+
+    class Meta:
+        verbose_name = 'Checkpoint de stock'
+        verbose_name_plural = 'Checkpoints de stock'
+        ordering = ['-fecha']
+        indexes = [
+            models.Index(fields=['product', 'fecha'], name='checkpoint_producto_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} @ {self.fecha}: {self.cantidad}"
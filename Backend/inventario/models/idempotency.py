@@ -0,0 +1,74 @@
+from django.db import models
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+
+class IdempotencyKeyManager(models.Manager):
+    """Manager de claves de idempotencia."""
+
+    def buscar(self, usuario, clave):
+        """Devuelve la clave vigente de `usuario` o `None`.
+
+        Usa el índice único `(usuario, clave)`. Si la clave existe pero ya
+        expiró, se elimina para que pueda reutilizarse.
+        """
+        registro = self.filter(usuario_id=usuario.pk, clave=clave).first()
+        if registro is not None and registro.expires_at <= timezone.now():
+            registro.delete()
+            return None
+        return registro
+
+    def purgar_expiradas(self):
+        """Elimina las claves expiradas. Devuelve la cantidad eliminada."""
+        eliminadas, _ = self.filter(expires_at__lte=timezone.now()).delete()
+        return eliminadas
+
+
+class IdempotencyKey(models.Model):
+    """Respuesta almacenada para una cabecera `Idempotency-Key`.
+
+    Permite que un cliente reintente un POST (por ejemplo tras perder la
+    conexión) sin registrar dos veces el mismo movimiento: el reintento
+    devuelve la respuesta original sin volver a ejecutar la creación.
+    """
+    empresa = models.ForeignKey(
+        'accounts.Empresa',
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+        null=True,
+        blank=True,
+        verbose_name='Empresa'
+    )
+    usuario = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+        verbose_name='Usuario'
+    )
+    clave = models.CharField(max_length=255, verbose_name='Clave')
+    ruta = models.CharField(max_length=255, verbose_name='Ruta')
+    huella = models.CharField(
+        max_length=64,
+        verbose_name='Huella',
+        help_text='SHA-256 del cuerpo de la petición original'
+    )
+    status_code = models.PositiveSmallIntegerField(verbose_name='Código de estado')
+    respuesta = models.JSONField(encoder=DjangoJSONEncoder, verbose_name='Respuesta')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Creado el')
+    expires_at = models.DateTimeField(db_index=True, verbose_name='Expira el')
+
+    objects = IdempotencyKeyManager()
+
+    class Meta:
+        verbose_name = 'Clave de idempotencia'
+        verbose_name_plural = 'Claves de idempotencia'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['usuario', 'clave'],
+                name='idempotency_key_usuario_clave_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.clave} ({self.ruta})"
@@ -1,9 +1,189 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
 from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Sum, When
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
 from django.conf import settings
 from django.utils import timezone
 
+from accounts.models import Empresa
+from inventario.stream import evento_stock, publicar_al_confirmar
+
+
+class MovementQuerySet(models.QuerySet):
+    """QuerySet de movimientos con agregaciones de reporte."""
+
+    def resumen(self):
+        """Conteos, cantidades y valorización por tipo en una sola consulta.
+
+        Agrupa por `movement_type` en la base de datos; las entradas se
+        valorizan a costo y las salidas a precio de venta del producto.
+        Devuelve un diccionario `{tipo: {...}}` con los tipos presentes.
+        """
+        hace_7_dias = timezone.now() - timedelta(days=7)
+        valor = Case(
+            When(movement_type=Movement.TIPO_ENTRADA, then=F('quantity') * F('product__costo')),
+            default=F('quantity') * F('product__precio_venta'),
+            output_field=models.DecimalField(max_digits=20, decimal_places=2),
+        )
+        filas = self.order_by().values('movement_type').annotate(
+            total_movimientos=Count('id'),
+            cantidad_total=Sum('quantity'),
+            valor_total=Sum(valor),
+            ultimos_7_dias=Count('id', filter=Q(created_at__gte=hace_7_dias)),
+        )
+        return {fila.pop('movement_type'): fila for fila in filas}
+
+
+class MovementManager(models.Manager.from_queryset(MovementQuerySet)):
+    """Manager de movimientos con operaciones de escritura en bloque."""
+
+    def registrar_lote(self, lineas, empresa=None, usuario=None, atomico=True):
+        """Registra un lote de movimientos con una sola ronda de bloqueos.
+
+        `lineas` es una lista de tuplas `(indice, datos)` donde `datos` trae
+        `producto`, `tipo_movimiento`, `cantidad` y opcionalmente
+        `referencia`, `motivo` y `notas` (ver `MovementLineSerializer`).
+        `empresa` puede ser la instancia o su id; de `usuario` solo se usa `pk`.
+
+        Los productos afectados se bloquean una sola vez en orden ascendente
+        de id (orden determinista, evita interbloqueos entre lotes
+        concurrentes), se aplica el delta neto por producto y los movimientos
+        se insertan con `bulk_create`.
+
+        - `atomico=True`: el stock se valida por producto sobre el delta neto
+          del lote; si alguna línea falla no se escribe nada.
+        - `atomico=False`: las líneas se evalúan en orden y solo se
+          registran las que mantienen el stock no negativo.
+
+        Devuelve `(creados, errores)`: `creados` es una lista de tuplas
+        `(indice, movimiento)` y `errores` un diccionario
+        `{indice: {campo: mensaje}}`.
+        """
+        from .category_stats import CategoryStats
+        from .checkpoint import StockCheckpoint
+        from .product import Product
+        from .rollup import DailyMovementRollup
+
+        errores = {}
+        if not lineas:
+            return [], errores
+
+        with transaction.atomic():
+            ids = sorted({datos['producto'] for _, datos in lineas})
+            productos = Product.objects.select_for_update().filter(pk__in=ids)
+            if empresa is not None:
+                productos = productos.filter(empresa=empresa)
+            productos = {
+                p.pk: p for p in productos.only(
+                    'id', 'empresa_id', 'categoria_id', 'cantidad', 'stock_minimo',
+                    'costo', 'movimientos_sin_checkpoint'
+                ).order_by('pk')
+            }
+
+            stock = {pk: p.cantidad for pk, p in productos.items()}
+            aceptadas = []
+            for indice, datos in lineas:
+                producto = productos.get(datos['producto'])
+                if producto is None:
+                    errores[indice] = {'producto': 'Producto no encontrado'}
+                    continue
+
+                delta = datos['cantidad']
+                if datos['tipo_movimiento'] == Movement.TIPO_SALIDA:
+                    delta = -delta
+
+                if not atomico and stock[producto.pk] + delta < 0:
+                    errores[indice] = {
+                        'cantidad': f"Stock insuficiente. Disponible: {stock[producto.pk]}"
+                    }
+                    continue
+
+                stock[producto.pk] += delta
+                aceptadas.append((indice, producto, datos))
+
+            if atomico:
+                for indice, producto, datos in aceptadas:
+                    es_salida = datos['tipo_movimiento'] == Movement.TIPO_SALIDA
+                    if es_salida and stock[producto.pk] < 0:
+                        disponible = productos[producto.pk].cantidad
+                        errores[indice] = {
+                            'cantidad': f"Stock insuficiente para el lote. Disponible: {disponible}"
+                        }
+                if errores:
+                    return [], errores
+                # Las entradas se insertan primero para que el historial,
+                # ordenado por id, nunca muestre stock negativo.
+                aceptadas.sort(key=lambda item: item[2]['tipo_movimiento'] != Movement.TIPO_ENTRADA)
+
+            ahora = timezone.now()
+            cada = settings.INVENTARIO_CHECKPOINT_CADA
+            con_checkpoint = set()
+            modificados = []
+            cambios_stats = []
+            for pk, total in Counter(producto.pk for _, producto, _ in aceptadas).items():
+                producto = productos[pk]
+                cambios_stats.append((
+                    producto.categoria_id,
+                    stock[pk] - producto.cantidad,
+                    producto.costo,
+                    producto.cantidad < producto.stock_minimo,
+                    stock[pk] < producto.stock_minimo,
+                ))
+                producto.cantidad = stock[pk]
+                producto.updated_at = ahora
+                producto.movimientos_sin_checkpoint += total
+                if producto.movimientos_sin_checkpoint >= cada:
+                    producto.movimientos_sin_checkpoint = 0
+                    con_checkpoint.add(pk)
+                modificados.append(producto)
+            Product.objects.bulk_update(
+                modificados, ['cantidad', 'movimientos_sin_checkpoint', 'updated_at']
+            )
+            CategoryStats.objects.aplicar_delta_stock(cambios_stats)
+            eventos = defaultdict(list)
+            for producto in modificados:
+                eventos[producto.empresa_id].append(
+                    evento_stock(producto.pk, producto.cantidad, producto.stock_minimo)
+                )
+            for empresa_id, eventos_empresa in eventos.items():
+                publicar_al_confirmar(empresa_id, eventos_empresa)
+
+            movimientos = self.bulk_create([
+                Movement(
+                    empresa_id=producto.empresa_id,
+                    # La instancia bloqueada queda en caché con el stock resultante
+                    product=producto,
+                    movement_type=datos['tipo_movimiento'],
+                    quantity=datos['cantidad'],
+                    referencia=datos.get('referencia', ''),
+                    motivo=datos.get('motivo', ''),
+                    notes=datos.get('notas', ''),
+                    created_by_id=usuario.pk if usuario is not None else None,
+                )
+                for _, producto, datos in aceptadas
+            ])
+
+            ultimos = {}
+            for (_, producto, _), movimiento in zip(aceptadas, movimientos):
+                ultimos[producto.pk] = movimiento
+            StockCheckpoint.objects.bulk_create([
+                StockCheckpoint(
+                    empresa_id=productos[pk].empresa_id,
+                    product_id=pk,
+                    movement=ultimos[pk],
+                    cantidad=stock[pk],
+                    fecha=ultimos[pk].created_at,
+                )
+                for pk in sorted(con_checkpoint)
+            ])
+            DailyMovementRollup.objects.registrar(movimientos)
+
+        creados = [(indice, movimiento) for (indice, _, _), movimiento in zip(aceptadas, movimientos)]
+        return creados, errores
+
 
 class Movement(models.Model):
     """Movimiento de inventario (ENTRADA / SALIDA).
@@ -59,10 +239,27 @@ class Movement(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Creado el')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Actualizado el')
 
+    objects = MovementManager()
+
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Movimiento'
         verbose_name_plural = 'Movimientos'
+        indexes = [
+            # Paginación por cursor de los listados de la empresa
+            models.Index(fields=['empresa', '-created_at', '-id'], name='movimiento_empresa_fecha_idx'),
+            # Historial de un producto y listados por tipo (por_tipo, auditoría)
+            models.Index(
+                fields=['empresa', 'product', '-created_at', '-id'],
+                name='movimiento_emp_prod_fecha_idx'
+            ),
+            models.Index(
+                fields=['empresa', 'movement_type', '-created_at', '-id'],
+                name='movimiento_emp_tipo_fecha_idx'
+            ),
+            # Cambios de la empresa en orden (sincronización y validadores ETag)
+            models.Index(fields=['empresa', 'updated_at', 'id'], name='movimiento_empresa_cambio_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_movement_type_display()} - {self.product.nombre} ({self.quantity})"
@@ -73,56 +270,92 @@ class Movement(models.Model):
             if self.product.empresa_id != self.empresa_id:
                 raise ValidationError('El producto debe pertenecer a la misma empresa')
 
+    @property
+    def delta_stock(self):
+        """Efecto del movimiento sobre `Product.cantidad` (+ entrada, - salida)."""
+        if self.movement_type == self.TIPO_SALIDA:
+            return -self.quantity
+        return self.quantity
+
     def save(self, *args, **kwargs):
         """Al guardar, aplicar cambio de stock en `Product.cantidad`.
 
-        - En creación: aplica directamente.
+        - En creación: aplica el delta con un UPDATE condicional.
         - En actualización: revierte el efecto anterior y aplica el nuevo.
-        Se asegura con `transaction.atomic` y `select_for_update` para evitar
-        condiciones de carrera.
+        El stock se modifica con `Product.objects.ajustar_stock`, un único
+        `UPDATE ... WHERE cantidad >= q`; el stock insuficiente se detecta
+        porque la sentencia no afecta ninguna fila. La validación se hace
+        antes de abrir la transacción. Tras el COMMIT se publica el nuevo
+        stock en `GET /api/stream/stock/`.
         """
+        from .category_stats import CategoryStats
+        from .checkpoint import StockCheckpoint
+        from .product import Product
+        from .rollup import DailyMovementRollup
+
+        if self.empresa_id is None and self.product_id is not None:
+            self.empresa_id = self.product.empresa_id
         self.full_clean()
 
         with transaction.atomic():
-            product = self.product.__class__.objects.select_for_update().get(pk=self.product.pk)
-
             if not self.pk:
                 # Creación
-                if self.movement_type == self.TIPO_SALIDA and self.quantity > product.cantidad:
+                if not Product.objects.ajustar_stock(self.product_id, self.delta_stock):
                     raise ValidationError('Stock insuficiente para realizar la salida')
-
-                if self.movement_type == self.TIPO_ENTRADA:
-                    product.cantidad = product.cantidad + self.quantity
-                else:
-                    product.cantidad = product.cantidad - self.quantity
-
-                if product.cantidad < 0:
-                    raise ValidationError('Resultado de stock inválido (negativo)')
-
-                product.save()
                 super().save(*args, **kwargs)
+
+                # Una lectura de la fila ya bloqueada alimenta las tablas derivadas
+                estado = Product.objects.filter(pk=self.product_id).values(
+                    'cantidad', 'movimientos_sin_checkpoint', 'stock_minimo',
+                    'costo', 'categoria_id'
+                ).get()
+                cantidad_anterior = estado['cantidad'] - self.delta_stock
+                StockCheckpoint.objects.registrar_movimiento(
+                    self, estado['cantidad'], estado['movimientos_sin_checkpoint']
+                )
+                CategoryStats.objects.aplicar_delta_stock([(
+                    estado['categoria_id'],
+                    self.delta_stock,
+                    estado['costo'],
+                    cantidad_anterior < estado['stock_minimo'],
+                    estado['cantidad'] < estado['stock_minimo'],
+                )])
+                DailyMovementRollup.objects.registrar([self])
+                publicar_al_confirmar(self.empresa_id, [
+                    evento_stock(self.product_id, estado['cantidad'], estado['stock_minimo'])
+                ])
                 return
 
             # Actualización de movimiento existente: revertir efecto previo y aplicar nuevo
             prev = Movement.objects.select_for_update().get(pk=self.pk)
 
-            # Revertir efecto del previo
-            if prev.movement_type == self.TIPO_ENTRADA:
-                product.cantidad = product.cantidad - prev.quantity
-            else:
-                product.cantidad = product.cantidad + prev.quantity
+            deltas = {prev.product_id: -prev.delta_stock}
+            deltas[self.product_id] = deltas.get(self.product_id, 0) + self.delta_stock
 
-            # Aplicar nuevo efecto
-            if self.movement_type == self.TIPO_SALIDA and self.quantity > product.cantidad:
-                raise ValidationError('Stock insuficiente para la actualización del movimiento')
+            # Orden ascendente de id para no interbloquear con otras transacciones
+            for product_id in sorted(deltas):
+                delta = deltas[product_id]
+                if delta and not Product.objects.ajustar_stock(product_id, delta):
+                    raise ValidationError('Stock insuficiente para la actualización del movimiento')
 
-            if self.movement_type == self.TIPO_ENTRADA:
-                product.cantidad = product.cantidad + self.quantity
-            else:
-                product.cantidad = product.cantidad - self.quantity
+            super().save(*args, **kwargs)
+            # El historial cambió: los checkpoints posteriores ya no son válidos
+            StockCheckpoint.objects.invalidar_desde(deltas, prev.created_at)
+            estados = list(Product.objects.filter(pk__in=deltas.keys()).values_list(
+                'pk', 'categoria_id', 'cantidad', 'stock_minimo'
+            ))
+            CategoryStats.objects.recalcular([categoria_id for _, categoria_id, _, _ in estados])
+            DailyMovementRollup.objects.registrar([prev], signo=-1)
+            DailyMovementRollup.objects.registrar([self])
+            publicar_al_confirmar(self.empresa_id, [
+                evento_stock(pk, cantidad, stock_minimo) for pk, _, cantidad, stock_minimo in estados
+            ])
 
-            if product.cantidad < 0:
-                raise ValidationError('Resultado de stock inválido (negativo)')
+    def delete(self, *args, **kwargs):
+        from .rollup import DailyMovementRollup
 
-            product.save()
-            super().save(*args, **kwargs)
+        with transaction.atomic():
+            resultado = super().delete(*args, **kwargs)
+            DailyMovementRollup.objects.registrar([self], signo=-1)
+            Empresa.marcar_eliminacion(self.empresa_id)
+        return resultado
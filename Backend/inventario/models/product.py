@@ -1,8 +1,171 @@
-from django.db import models
+import re
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.db import connections, models, transaction
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from accounts.models import Empresa
+
+
+# Claves de `campos_extra` filtrables: identificadores sin `__` (separador de operadores)
+CLAVE_EXTRA = re.compile(r'[A-Za-z0-9]+(?:_[A-Za-z0-9]+)*')
+
+# Campos de los que dependen el historial de stock y `CategoryStats`
+CAMPOS_ESTADISTICAS = ('categoria_id', 'cantidad', 'costo', 'stock_minimo')
+
+
+class ValorCampoExtra(models.Func):
+    """Valor de texto de `campos_extra[clave]`.
+
+    Es la misma expresión que los índices de `sincronizar_indices_extra`,
+    para que las consultas por clave los usen. La clave se valida con
+    `CLAVE_EXTRA` y va literal en el SQL: un parámetro no coincidiría con
+    la expresión del índice en SQLite.
+    """
+    output_field = models.TextField()
+
+    def __init__(self, clave, **extra):
+        if not CLAVE_EXTRA.fullmatch(clave):
+            raise ValueError(f'Clave de campos_extra inválida: {clave!r}')
+        self.clave = clave
+        super().__init__(models.F('campos_extra'), **extra)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection, template=f"(%(expressions)s ->> '{self.clave}')", **extra_context
+        )
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return super().as_sql(
+            compiler, connection,
+            template=f"CAST(JSON_EXTRACT(%(expressions)s, '$.{self.clave}') AS TEXT)",
+            **extra_context
+        )
+
+
+class ProductManager(models.Manager):
+    """Manager de productos con actualizaciones atómicas de stock."""
+
+    def ajustar_stock(self, pk, delta):
+        """Aplica `delta` a `cantidad` con un único UPDATE condicional.
+
+        Ejecuta `UPDATE ... SET cantidad = cantidad + delta WHERE id = pk`
+        y, si el delta es negativo, añade `AND cantidad >= -delta`. No lee
+        el producto ni ejecuta `full_clean()`, por lo que el bloqueo de la
+        fila dura solo lo que tarda la sentencia.
+
+        Devuelve `False` si no se actualizó ninguna fila (producto
+        inexistente o stock insuficiente).
+        """
+        filas = self.filter(pk=pk)
+        if delta < 0:
+            filas = filas.filter(cantidad__gte=-delta)
+        actualizadas = filas.update(
+            cantidad=models.F('cantidad') + delta,
+            movimientos_sin_checkpoint=models.F('movimientos_sin_checkpoint') + 1,
+            updated_at=timezone.now()
+        )
+        return actualizadas == 1
+
+    def importar_lote(self, empresa, filas, campos):
+        """Crea o actualiza productos por `(empresa, nombre)` con un solo upsert.
+
+        `filas` es un dict `{nombre: datos}` con `categoria_id` ya resuelto;
+        `campos` son las columnas con valor en esas filas, las únicas que se
+        sobrescriben en los productos que ya existen (`cantidad` nunca). Los productos nuevos
+        reciben su checkpoint inicial de stock.
+
+        Devuelve `(creados, actualizados)`.
+        """
+        from .category_stats import CategoryStats
+        from .checkpoint import StockCheckpoint
+
+        with transaction.atomic():
+            existentes = dict(self.filter(empresa=empresa, nombre__in=filas).values_list(
+                'nombre', 'categoria_id'
+            ))
+            self.bulk_create(
+                [self.model(empresa=empresa, **datos) for datos in filas.values()],
+                update_conflicts=True,
+                unique_fields=['empresa', 'nombre'],
+                update_fields=sorted(set(campos) - {'empresa', 'nombre', 'cantidad'} | {'updated_at'}),
+            )
+
+            nuevos = [nombre for nombre in filas if nombre not in existentes]
+            ahora = timezone.now()
+            StockCheckpoint.objects.bulk_create([
+                StockCheckpoint(
+                    empresa=empresa, product_id=pk, cantidad=cantidad, ajuste=cantidad, fecha=ahora
+                )
+                for pk, cantidad in self.filter(empresa=empresa, nombre__in=nuevos).values_list(
+                    'id', 'cantidad'
+                )
+            ])
+            CategoryStats.objects.recalcular(
+                {datos['categoria_id'] for datos in filas.values()} | set(existentes.values())
+            )
+        return len(nuevos), len(existentes)
+
+    @staticmethod
+    def nombre_indice_extra(clave):
+        return f'producto_extra_{clave}_idx'
+
+    def claves_extra_indexadas(self):
+        """Claves de `campos_extra` declaradas en `INVENTARIO_CAMPOS_EXTRA_INDEXADOS`.
+
+        La configuración agrupa las claves por `Empresa.nicho`; los índices
+        son de la tabla completa, así que se indexa la unión de todas.
+        """
+        claves = set()
+        for nicho, claves_nicho in settings.INVENTARIO_CAMPOS_EXTRA_INDEXADOS.items():
+            for clave in claves_nicho:
+                if not CLAVE_EXTRA.fullmatch(clave) or len(self.nombre_indice_extra(clave)) > 63:
+                    raise ValueError(f'Clave de campos_extra inválida para {nicho}: {clave!r}')
+                claves.add(clave)
+        return claves
+
+    def sincronizar_indices_extra(self, using='default', concurrente=False, aplicar=True):
+        """Crea un índice `(empresa, campos_extra ->> clave)` por clave declarada.
+
+        Borra los índices de claves que ya no se declaran. Con
+        `concurrente=True` usa `CREATE/DROP INDEX CONCURRENTLY` en
+        PostgreSQL (sin bloquear escrituras; no puede ir en una transacción).
+        Devuelve `(creados, borrados)` con los nombres de los índices.
+        """
+        connection = connections[using]
+        tabla = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            existentes = {
+                nombre for nombre in connection.introspection.get_constraints(cursor, tabla)
+                if nombre.startswith('producto_extra_') and nombre.endswith('_idx')
+            }
+        deseados = {self.nombre_indice_extra(clave): clave for clave in self.claves_extra_indexadas()}
+        creados = sorted(set(deseados) - existentes)
+        borrados = sorted(existentes - set(deseados))
+        if not aplicar:
+            return creados, borrados
+
+        opciones = {'concurrently': True} if concurrente and connection.vendor == 'postgresql' else {}
+        schema_editor = connection.schema_editor()
+        sentencias = [
+            f"DROP INDEX {'CONCURRENTLY ' if opciones else ''}{connection.ops.quote_name(nombre)}"
+            for nombre in borrados
+        ] + [
+            models.Index(
+                models.F('empresa'), ValorCampoExtra(deseados[nombre]), name=nombre
+            ).create_sql(self.model, schema_editor, **opciones)
+            for nombre in creados
+        ]
+        # CONCURRENTLY no admite transacción; sin él, todo o nada
+        with nullcontext() if opciones else transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                for sentencia in sentencias:
+                    cursor.execute(str(sentencia))
+        return creados, borrados
+
 
 class Product(models.Model):
     """Producto genérico del inventario adaptable por nicho.
@@ -20,6 +183,13 @@ class Product(models.Model):
         help_text='Empresa propietaria del producto'
     )
     nombre = models.CharField(max_length=255, verbose_name='Nombre')
+    codigo = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        verbose_name='Código',
+        help_text='Código de barras o SKU, único por empresa'
+    )
     categoria = models.ForeignKey(
         'Category',
         on_delete=models.PROTECT,
@@ -85,19 +255,51 @@ class Product(models.Model):
         help_text='Ej farmacia: {"principio_activo":"paracetamol"}; veterinaria: {"especie":"gato"}'
     )
     is_active = models.BooleanField(default=True, verbose_name='Activo')
+    movimientos_sin_checkpoint = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Movimientos sin checkpoint',
+        help_text='Movimientos aplicados desde el último checkpoint de stock'
+    )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Creado el')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Actualizado el')
 
+    objects = ProductManager()
+
     class Meta:
         unique_together = ('empresa', 'nombre')
+        constraints = [
+            # Lectura del escáner (POST /api/movements/scan/); en PostgreSQL la
+            # migración añade INCLUDE (id, nombre) para resolver el código sin leer la tabla
+            models.UniqueConstraint(fields=['empresa', 'codigo'], name='producto_empresa_codigo_uniq'),
+        ]
         verbose_name = 'Producto'
         verbose_name_plural = 'Productos'
         ordering = ['nombre']
+        indexes = [
+            # Productos de una categoría ordenados por nombre
+            models.Index(fields=['categoria', 'nombre', 'id'], name='producto_categoria_nombre_idx'),
+            # Cambios de la empresa en orden (sincronización y validadores ETag)
+            models.Index(fields=['empresa', 'updated_at', 'id'], name='producto_empresa_cambio_idx'),
+            # Solo las filas bajo stock mínimo: el índice crece con las alertas, no con el catálogo
+            models.Index(
+                fields=['empresa', 'nombre'],
+                condition=models.Q(cantidad__lt=models.F('stock_minimo')),
+                name='producto_bajo_stock_idx'
+            ),
+            models.Index(
+                fields=['empresa', 'fecha_vencimiento'],
+                condition=models.Q(fecha_vencimiento__isnull=False),
+                name='producto_vencimiento_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.nombre
 
     def clean(self):
+        # Sin código se guarda NULL: varios productos pueden no tenerlo
+        self.codigo = (self.codigo or '').strip() or None
         # Validación: la categoría debe pertenecer a la misma empresa
         if self.categoria and hasattr(self.categoria, 'empresa'):
             if self.categoria.empresa_id != self.empresa_id:
@@ -107,7 +309,49 @@ class Product(models.Model):
             raise ValidationError('La fecha de vencimiento no puede ser anterior a hoy')
 
     def save(self, *args, **kwargs):
+        from .category_stats import CategoryStats
+        from .checkpoint import StockCheckpoint
+
         self.full_clean()
         if self.cantidad < 0:
             raise ValidationError('La cantidad no puede ser negativa')
-        super().save(*args, **kwargs)
+
+        guardados = kwargs.get('update_fields')
+        if guardados is not None:
+            guardados = {campo.removesuffix('_id') for campo in guardados}
+            if guardados.isdisjoint(campo.removesuffix('_id') for campo in CAMPOS_ESTADISTICAS):
+                # Cambio que no afecta al stock ni a las estadísticas (nombre, precio...)
+                super().save(*args, **kwargs)
+                return
+
+        with transaction.atomic():
+            anterior = None
+            if not self._state.adding:
+                anterior = Product.objects.filter(pk=self.pk).values(*CAMPOS_ESTADISTICAS).first()
+            super().save(*args, **kwargs)
+
+            nuevo = {campo: getattr(self, campo) for campo in CAMPOS_ESTADISTICAS}
+            if anterior is not None and guardados is not None:
+                # Los campos fuera de `update_fields` conservan el valor guardado
+                for campo in CAMPOS_ESTADISTICAS:
+                    if campo.removesuffix('_id') not in guardados:
+                        nuevo[campo] = anterior[campo]
+
+            # Alta o ajuste manual de cantidad: punto de partida del historial
+            if anterior is None or anterior['cantidad'] != nuevo['cantidad']:
+                StockCheckpoint.objects.crear(
+                    self.pk, self.empresa_id, self.cantidad, self.updated_at,
+                    ajuste=nuevo['cantidad'] - (anterior['cantidad'] if anterior else 0)
+                )
+                self.movimientos_sin_checkpoint = 0
+            if nuevo != anterior:
+                CategoryStats.objects.aplicar_cambio_producto(anterior, nuevo)
+
+    def delete(self, *args, **kwargs):
+        from .category_stats import CategoryStats
+
+        with transaction.atomic():
+            resultado = super().delete(*args, **kwargs)
+            CategoryStats.objects.recalcular([self.categoria_id])
+            Empresa.marcar_eliminacion(self.empresa_id, producto=True)
+        return resultado
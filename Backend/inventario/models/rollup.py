@@ -0,0 +1,216 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+
+class DailyMovementRollupManager(models.Manager):
+    """Manager de acumulados diarios de movimientos."""
+
+    GRANULARIDADES = {
+        'day': None,
+        'week': TruncWeek,
+        'month': TruncMonth,
+    }
+    # Filas por INSERT: 6 parámetros por fila, por debajo del límite de SQLite
+    LOTE_UPSERT = 150
+
+    def incrementar(self, empresa_id, product_id, fecha, tipo, movimientos, cantidad):
+        """Suma a la fila `(empresa, producto, fecha, tipo)`, creándola si no existe."""
+        filtro = {
+            'empresa_id': empresa_id,
+            'product_id': product_id,
+            'fecha': fecha,
+            'movement_type': tipo,
+        }
+        cambios = {
+            'total_movimientos': F('total_movimientos') + movimientos,
+            'cantidad_total': F('cantidad_total') + cantidad,
+        }
+        if self.filter(**filtro).update(**cambios):
+            if movimientos < 0:
+                # Descuento de ediciones y bajas: la fila vacía no existiría al reconstruir
+                self.filter(**filtro, total_movimientos__lte=0).delete()
+            return
+        try:
+            with transaction.atomic():
+                self.create(total_movimientos=movimientos, cantidad_total=cantidad, **filtro)
+        except IntegrityError:
+            # Otra transacción creó la fila entre el UPDATE y el INSERT
+            self.filter(**filtro).update(**cambios)
+
+    def registrar(self, movimientos, signo=1):
+        """Acumula una lista de movimientos ya guardados.
+
+        El día se calcula en la zona horaria de la empresa. Usar `signo=-1`
+        para descontar el efecto anterior de un movimiento editado. Todas las
+        claves se escriben con un único upsert, sin importar cuántas sean.
+        """
+        from accounts.models import Empresa
+
+        acumulado = defaultdict(lambda: [0, 0])
+        zonas = {}
+        for movimiento in movimientos:
+            if movimiento.empresa_id not in zonas:
+                zonas[movimiento.empresa_id] = Empresa.zona_de(movimiento.empresa_id)
+            fecha = timezone.localtime(movimiento.created_at, zonas[movimiento.empresa_id]).date()
+            clave = (movimiento.empresa_id, movimiento.product_id, fecha, movimiento.movement_type)
+            acumulado[clave][0] += signo
+            acumulado[clave][1] += signo * movimiento.quantity
+
+        claves = sorted(acumulado, key=lambda c: (c[1], c[2], c[3]))
+        conexion = connections[self.db]
+        if conexion.vendor not in ('postgresql', 'sqlite'):
+            for clave in claves:
+                self.incrementar(*clave, *acumulado[clave])
+            return
+        # Sin empresa el índice único no detecta el conflicto (NULL distinto de NULL)
+        for clave in [c for c in claves if c[0] is None]:
+            self.incrementar(*clave, *acumulado[clave])
+        claves = [c for c in claves if c[0] is not None]
+        for inicio in range(0, len(claves), self.LOTE_UPSERT):
+            lote = claves[inicio:inicio + self.LOTE_UPSERT]
+            self._sumar(conexion, [(*clave, *acumulado[clave]) for clave in lote])
+        if signo < 0 and claves:
+            # Descuento de ediciones y bajas: la fila vacía no existiría al reconstruir
+            self.filter(
+                empresa_id__in={c[0] for c in claves},
+                product_id__in={c[1] for c in claves},
+                fecha__in={c[2] for c in claves},
+                total_movimientos__lte=0,
+            ).delete()
+
+    def _sumar(self, conexion, filas):
+        """Un solo `INSERT ... ON CONFLICT DO UPDATE` que suma sobre las filas existentes.
+
+        `bulk_create(update_conflicts=True)` reemplaza los valores con los de
+        `EXCLUDED`; aquí se necesita acumularlos.
+        """
+        qn = conexion.ops.quote_name
+        tabla = qn(self.model._meta.db_table)
+        unicas = ['empresa_id', 'product_id', 'fecha', 'movement_type']
+        sumadas = ['total_movimientos', 'cantidad_total']
+        parametros = []
+        for empresa_id, product_id, fecha, tipo, movimientos, cantidad in filas:
+            parametros += [
+                empresa_id, product_id, conexion.ops.adapt_datefield_value(fecha),
+                tipo, movimientos, cantidad,
+            ]
+        valores = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(filas))
+        asignaciones = ', '.join(
+            f'{qn(c)} = {tabla}.{qn(c)} + EXCLUDED.{qn(c)}' for c in sumadas
+        )
+        sql = (
+            f"INSERT INTO {tabla} ({', '.join(qn(c) for c in unicas + sumadas)}) "
+            f"VALUES {valores} "
+            f"ON CONFLICT ({', '.join(qn(c) for c in unicas)}) DO UPDATE SET {asignaciones}"
+        )
+        with conexion.cursor() as cursor:
+            cursor.execute(sql, parametros)
+
+    def reconstruir(self, empresa_id=None, batch_size=1000):
+        """Recalcula los acumulados desde la tabla de movimientos.
+
+        Si se indica `empresa_id` solo se reconstruye esa empresa. Devuelve
+        la cantidad de filas escritas.
+        """
+        from accounts.models import Empresa
+        from .movement import Movement
+
+        movimientos = Movement.objects.order_by()
+        if empresa_id is not None:
+            movimientos = movimientos.filter(empresa_id=empresa_id)
+        empresas = movimientos.values_list('empresa_id', flat=True).distinct()
+
+        escritas = 0
+        with transaction.atomic():
+            if empresa_id is None:
+                self.all().delete()
+            else:
+                self.filter(empresa_id=empresa_id).delete()
+
+            for empresa in list(empresas):
+                filas = movimientos.filter(empresa_id=empresa).annotate(
+                    dia=TruncDate('created_at', tzinfo=Empresa.zona_de(empresa))
+                ).values('product_id', 'dia', 'movement_type').annotate(
+                    movimientos=Count('id'),
+                    cantidad=Sum('quantity'),
+                )
+                lote = []
+                for fila in filas.iterator(chunk_size=batch_size):
+                    lote.append(self.model(
+                        empresa_id=empresa,
+                        product_id=fila['product_id'],
+                        fecha=fila['dia'],
+                        movement_type=fila['movement_type'],
+                        total_movimientos=fila['movimientos'],
+                        cantidad_total=fila['cantidad'],
+                    ))
+                    if len(lote) >= batch_size:
+                        escritas += len(self.bulk_create(lote))
+                        lote = []
+                escritas += len(self.bulk_create(lote))
+        return escritas
+
+    def serie(self, queryset, granularidad='day'):
+        """Agrupa acumulados por período con entradas y salidas en columnas."""
+        from .movement import Movement
+
+        truncar = self.GRANULARIDADES[granularidad]
+        periodo = truncar('fecha') if truncar else F('fecha')
+        entrada = Q(movement_type=Movement.TIPO_ENTRADA)
+        salida = Q(movement_type=Movement.TIPO_SALIDA)
+        return queryset.order_by().annotate(periodo=periodo).values('periodo').annotate(
+            entradas=Sum('cantidad_total', filter=entrada, default=0),
+            salidas=Sum('cantidad_total', filter=salida, default=0),
+            movimientos_entrada=Sum('total_movimientos', filter=entrada, default=0),
+            movimientos_salida=Sum('total_movimientos', filter=salida, default=0),
+        ).order_by('periodo')
+
+
+class DailyMovementRollup(models.Model):
+    """Acumulado diario de movimientos por empresa, producto y tipo.
+
+    Se mantiene en la misma transacción que `Movement.save()` y la carga
+    masiva; el día se calcula en la zona horaria de la empresa. Alimenta
+    `GET /api/movements/series/` sin recorrer la tabla de movimientos.
+    """
+    empresa = models.ForeignKey(
+        'accounts.Empresa',
+        on_delete=models.CASCADE,
+        related_name='movement_rollups',
+        null=True,
+        blank=True,
+        verbose_name='Empresa'
+    )
+    product = models.ForeignKey(
+        'Product',
+        on_delete=models.CASCADE,
+        related_name='daily_rollups',
+        verbose_name='Producto'
+    )
+    fecha = models.DateField(verbose_name='Fecha')
+    movement_type = models.CharField(max_length=20, verbose_name='Tipo de movimiento')
+    total_movimientos = models.IntegerField(default=0, verbose_name='Total de movimientos')
+    cantidad_total = models.IntegerField(default=0, verbose_name='Cantidad total')
+
+    objects = DailyMovementRollupManager()
+
+    class Meta:
+        verbose_name = 'Acumulado diario de movimientos'
+        verbose_name_plural = 'Acumulados diarios de movimientos'
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['empresa', 'product', 'fecha', 'movement_type'],
+                name='rollup_empresa_producto_fecha_tipo_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['empresa', 'fecha'], name='rollup_empresa_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} {self.fecha} {self.movement_type}: {self.cantidad_total}"
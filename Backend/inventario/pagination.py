@@ -0,0 +1,292 @@
+"""
+Paginación de los listados de inventario.
+
+Por defecto los listados usan paginación por cursor (keyset): cada página
+filtra `WHERE (campo, id) < (último_valor, último_id)` sobre un índice
+compuesto, por lo que la página N cuesta lo mismo que la primera y no se
+ejecuta `COUNT(*)`. Con `?page=` (o con un `?ordering=` distinto del orden
+del cursor) se usa la paginación por número de página, que incluye `count`.
+
+Cuando hace falta el total se obtiene con `COUNT(*) OVER ()` en la misma
+consulta que trae la página, en lugar de un `COUNT(*)` aparte.
+"""
+import base64
+import json
+from urllib import parse
+
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, Q, Window
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+CAMPO_TOTAL = 'total_filas'
+
+
+def anotar_total(queryset):
+    """Anota en cada fila el total del queryset filtrado (`COUNT(*) OVER ()`)."""
+    return queryset.annotate(**{CAMPO_TOTAL: Window(Count('pk'))})
+
+
+def total_de(fila):
+    return fila[CAMPO_TOTAL] if isinstance(fila, dict) else getattr(fila, CAMPO_TOTAL)
+
+
+class ConteoVentanaPaginator(Paginator):
+    """`Paginator` que lee `count` de la propia consulta de la página.
+
+    Solo si la página llega vacía (número fuera de rango) recurre a un
+    `COUNT(*)` aparte para distinguir una lista vacía de una página
+    inexistente.
+    """
+
+    def page(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('El número de página no es un entero')
+        if number < 1:
+            raise EmptyPage('El número de página es menor que 1')
+
+        inicio = (number - 1) * self.per_page
+        filas = list(anotar_total(self.object_list)[inicio:inicio + self.per_page])
+        if filas:
+            self.count = total_de(filas[0])
+        elif number > 1 or not self.allow_empty_first_page:
+            raise EmptyPage('Esa página no contiene resultados')
+        else:
+            self.count = 0
+        return self._get_page(filas, number, self)
+
+
+class PaginaNumerada(PageNumberPagination):
+    """Paginación por número de página (opt-in para el panel de administración)."""
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    django_paginator_class = ConteoVentanaPaginator
+
+    def get_total(self):
+        return self.page.paginator.count
+
+
+class KeysetPagination(BasePagination):
+    """Paginación por cursor sobre un orden compuesto.
+
+    `ordering` es una tupla de campos cuyo último elemento debe ser único
+    (normalmente `id`). El cursor guarda los valores de la última fila
+    devuelta y la dirección de lectura.
+    """
+    ordering = ('-id',)
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+    pagina_numerada_class = PaginaNumerada
+
+    def paginate_queryset(self, queryset, request, view=None, contar=False):
+        """Devuelve la página pedida.
+
+        Con `contar=True` la primera página (sin cursor) anota el total en
+        la misma consulta; en las siguientes `get_total()` devuelve `None`.
+        """
+        self.request = request
+        self.pagina_numerada = None
+        self.total = None
+        self.ordering = self.get_ordering(request, queryset)
+        if self.usa_pagina_numerada(request):
+            if api_settings.ORDERING_PARAM not in request.query_params:
+                # Mismo orden total que el cursor para que las páginas sean estables
+                queryset = queryset.order_by(*self.ordering)
+            self.pagina_numerada = self.pagina_numerada_class()
+            return self.pagina_numerada.paginate_queryset(queryset, request, view)
+
+        self.tamano = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverso = bool(cursor and cursor['r'])
+        ordering = [self._invertir(campo) for campo in self.ordering] if reverso else list(self.ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self._posterior_a(cursor['p'], ordering))
+        elif contar:
+            queryset = anotar_total(queryset)
+        resultados = list(queryset[:self.tamano + 1])
+        if contar and cursor is None:
+            self.total = total_de(resultados[0]) if resultados else 0
+        hay_mas = len(resultados) > self.tamano
+        resultados = resultados[:self.tamano]
+
+        if reverso:
+            resultados.reverse()
+            self.hay_siguiente, self.hay_anterior = True, hay_mas
+        else:
+            self.hay_siguiente, self.hay_anterior = hay_mas, cursor is not None
+        self.pagina = resultados
+        return resultados
+
+    def get_ordering(self, request, queryset):
+        """Orden compuesto del cursor para esta petición."""
+        return self.ordering
+
+    def usa_pagina_numerada(self, request):
+        if self.pagina_numerada_class.page_query_param in request.query_params:
+            return True
+        # `?ordering=` con los mismos campos que el cursor no necesita páginas numeradas
+        orden = request.query_params.get(api_settings.ORDERING_PARAM)
+        return orden is not None and orden != ','.join(self.ordering[:-1])
+
+    def get_total(self):
+        if self.pagina_numerada is not None:
+            return self.pagina_numerada.get_total()
+        return self.total
+
+    def get_page_size(self, request):
+        try:
+            tamano = int(request.query_params[self.page_size_query_param])
+            if tamano > 0:
+                return min(tamano, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_paginated_response(self, data):
+        if self.pagina_numerada is not None:
+            return self.pagina_numerada.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Cursor de la página (enlaces `next`/`previous`)',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Resultados por página',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.pagina_numerada_class.page_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Número de página (activa la paginación numerada con `count`)',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+    def get_next_link(self):
+        if self.pagina_numerada is not None:
+            return self.pagina_numerada.get_next_link()
+        if not self.hay_siguiente or not self.pagina:
+            return None
+        return self.encode_cursor(self._valores(self.pagina[-1]), reverso=False)
+
+    def get_previous_link(self):
+        if self.pagina_numerada is not None:
+            return self.pagina_numerada.get_previous_link()
+        if not self.hay_anterior:
+            return None
+        if not self.pagina:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self._valores(self.pagina[0]), reverso=True)
+
+    def encode_cursor(self, valores, reverso):
+        # isoformat() conserva los microsegundos (DjangoJSONEncoder los recorta)
+        valores = [valor.isoformat() if hasattr(valor, 'isoformat') else valor for valor in valores]
+        contenido = json.dumps({'p': valores, 'r': int(reverso)}, cls=DjangoJSONEncoder)
+        cursor = base64.urlsafe_b64encode(contenido.encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            datos = json.loads(base64.urlsafe_b64decode(parse.unquote(cursor).encode()))
+            if not isinstance(datos['p'], list) or len(datos['p']) != len(self.ordering):
+                raise ValueError
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        return datos
+
+    def _valores(self, fila):
+        campos = [campo.lstrip('-') for campo in self.ordering]
+        if isinstance(fila, dict):
+            return [fila[campo] for campo in campos]
+        return [getattr(fila, campo) for campo in campos]
+
+    @staticmethod
+    def _invertir(campo):
+        return campo[1:] if campo.startswith('-') else f'-{campo}'
+
+    @staticmethod
+    def _posterior_a(valores, ordering):
+        """`(c1, c2, ...) > (v1, v2, ...)` según el sentido de cada campo.
+
+        La cadena de OR por sí sola no acota el recorrido del índice: se
+        añade `c1 >= v1` (`<=` si es descendente) para que el primer campo
+        del cursor forme parte del rango y la página N no filtre fila a fila
+        todas las anteriores.
+        """
+        condicion = Q()
+        iguales = {}
+        for campo, valor in zip(ordering, valores):
+            nombre = campo.lstrip('-')
+            operador = 'lt' if campo.startswith('-') else 'gt'
+            condicion |= Q(**iguales, **{f'{nombre}__{operador}': valor})
+            iguales[nombre] = valor
+        if len(ordering) > 1:
+            campo = ordering[0]
+            operador = 'lte' if campo.startswith('-') else 'gte'
+            condicion = Q(**{f'{campo.lstrip("-")}__{operador}': valores[0]}) & condicion
+        return condicion
+
+
+class MovementPagination(KeysetPagination):
+    """Movimientos del más reciente al más antiguo: `(created_at, id)` descendente."""
+    ordering = ('-created_at', '-id')
+
+
+class ProductPagination(KeysetPagination):
+    """Productos por nombre: `(nombre, id)` ascendente.
+
+    Con `?search=` el cursor recorre `(relevancia, id)`, de la más relevante
+    a la menos, sobre la anotación de `ProductSearchFilter`.
+    """
+    ordering = ('nombre', 'id')
+    ordering_busqueda = ('-relevancia', 'id')
+
+    def get_ordering(self, request, queryset):
+        if (
+            request.query_params.get(api_settings.SEARCH_PARAM)
+            and 'relevancia' in queryset.query.annotations
+        ):
+            return self.ordering_busqueda
+        return self.ordering
@@ -0,0 +1,195 @@
+"""
+Búsqueda indexada de productos por nombre y proveedor (`?search=`).
+
+`SearchFilter` de DRF traduce cada término a `ILIKE '%término%'`, que no
+puede usar índices y recorre todo el catálogo de la empresa. Este backend
+usa índices propios de cada base de datos:
+
+- PostgreSQL: documento `unaccent(lower(nombre || ' ' || proveedor))`
+  indexado con GIN de trigramas (coincidencias parciales mientras se
+  escribe) y con GIN de `to_tsvector('spanish', ...)` (palabras completas,
+  con raíces del español). La relevancia combina `ts_rank` y `similarity`.
+- SQLite (desarrollo): tabla FTS5 `inventario_product_fts` con
+  `remove_diacritics`, sincronizada por triggers; cada término se busca
+  como prefijo y la relevancia es `bm25`.
+- Otras bases: el `SearchFilter` de DRF sobre `search_fields`.
+
+Los resultados se anotan con `relevancia` y, salvo otro `?ordering=`, se
+devuelven de la más relevante a la menos con paginación por cursor sobre
+`(relevancia, id)` (ver `ProductPagination`).
+"""
+import unicodedata
+
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVectorField,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import F, FloatField, Func, Q, TextField, Value
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+from rest_framework.settings import api_settings
+
+TABLA_FTS = 'inventario_product_fts'
+
+SQL_POSTGRESQL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE EXTENSION IF NOT EXISTS unaccent',
+    # unaccent() es STABLE; el envoltorio IMMUTABLE permite indexar el documento
+    """
+    CREATE OR REPLACE FUNCTION inventario_producto_documento(nombre text, proveedor text)
+    RETURNS text LANGUAGE sql IMMUTABLE PARALLEL SAFE AS $$
+        SELECT public.unaccent(
+            'public.unaccent'::regdictionary,
+            lower(coalesce(nombre, '') || ' ' || coalesce(proveedor, ''))
+        )
+    $$
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS producto_busqueda_trgm_idx ON inventario_product
+    USING gin (inventario_producto_documento(nombre, proveedor) gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS producto_busqueda_fts_idx ON inventario_product
+    USING gin (to_tsvector('spanish'::regconfig, inventario_producto_documento(nombre, proveedor)))
+    """,
+]
+
+SQL_POSTGRESQL_REVERSO = [
+    'DROP INDEX IF EXISTS producto_busqueda_fts_idx',
+    'DROP INDEX IF EXISTS producto_busqueda_trgm_idx',
+    'DROP FUNCTION IF EXISTS inventario_producto_documento(text, text)',
+]
+
+_FILA_NUEVA = f"INSERT INTO {TABLA_FTS}(rowid, nombre, proveedor) VALUES (new.id, new.nombre, new.proveedor);"
+_FILA_VIEJA = (
+    f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, nombre, proveedor) "
+    "VALUES ('delete', old.id, old.nombre, old.proveedor);"
+)
+
+SQL_SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON inventario_product
+    BEGIN {_FILA_NUEVA} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON inventario_product
+    BEGIN {_FILA_VIEJA} END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF nombre, proveedor ON inventario_product
+    BEGIN {_FILA_VIEJA} {_FILA_NUEVA} END
+    """,
+]
+
+
+def crear_indices_busqueda(connection):
+    """Crea (si faltan) los índices de búsqueda de la base de datos.
+
+    Es idempotente: además de la migración lo ejecuta `post_migrate`,
+    porque en SQLite las migraciones que reconstruyen `inventario_product`
+    eliminan sus triggers.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in SQL_POSTGRESQL:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+                [f'{TABLA_FTS}_%'],
+            )
+            triggers = cursor.fetchone()[0]
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5("
+                "nombre, proveedor, content='inventario_product', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+            for sql in SQL_SQLITE_TRIGGERS:
+                cursor.execute(sql)
+            if triggers < len(SQL_SQLITE_TRIGGERS):
+                # Cambios hechos sin triggers: se reconstruye desde la tabla de productos
+                cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def eliminar_indices_busqueda(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in SQL_POSTGRESQL_REVERSO:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            for sufijo in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {TABLA_FTS}_{sufijo}')
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLA_FTS}')
+
+
+def normalizar(texto):
+    """Minúsculas y sin acentos, como el documento indexado (`unaccent`)."""
+    descompuesto = unicodedata.normalize('NFKD', texto.lower())
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c))
+
+
+class DocumentoBusqueda(Func):
+    function = 'inventario_producto_documento'
+    output_field = TextField()
+
+
+class VectorBusqueda(Func):
+    # Misma expresión que `producto_busqueda_fts_idx` para que el planner use el índice
+    template = "to_tsvector('spanish'::regconfig, %(expressions)s)"
+    output_field = SearchVectorField()
+
+
+class ProductSearchFilter(SearchFilter):
+    """`SearchFilter` de productos sobre índices de texto completo y trigramas."""
+
+    def filter_queryset(self, request, queryset, view):
+        terminos = [normalizar(termino) for termino in self.get_search_terms(request)]
+        terminos = [termino for termino in terminos if termino]
+        if not terminos:
+            if 'relevancia' in request.query_params.get(api_settings.ORDERING_PARAM, ''):
+                queryset = queryset.annotate(relevancia=Value(0.0, output_field=FloatField()))
+            return queryset
+
+        vendor = connections[queryset.db].vendor
+        if vendor == 'postgresql':
+            return self.buscar_postgresql(queryset, terminos)
+        if vendor == 'sqlite':
+            return self.buscar_sqlite(queryset, terminos)
+        return super().filter_queryset(request, queryset, view).annotate(
+            relevancia=Value(0.0, output_field=FloatField())
+        )
+
+    @staticmethod
+    def buscar_postgresql(queryset, terminos):
+        texto = ' '.join(terminos)
+        consulta = SearchQuery(texto, config='spanish', search_type='websearch')
+        queryset = queryset.alias(
+            documento_busqueda=DocumentoBusqueda(F('nombre'), F('proveedor')),
+        ).alias(
+            vector_busqueda=VectorBusqueda(F('documento_busqueda')),
+        )
+        # Palabras completas (FTS) o todos los términos como subcadena (trigramas)
+        coincide = Q(vector_busqueda=consulta) | Q(
+            *[Q(documento_busqueda__contains=termino) for termino in terminos]
+        )
+        return queryset.filter(coincide).annotate(
+            relevancia=SearchRank(F('vector_busqueda'), consulta)
+            + TrigramSimilarity('documento_busqueda', texto)
+        )
+
+    @staticmethod
+    def buscar_sqlite(queryset, terminos):
+        # Cada término como prefijo entre comillas (sin operadores de FTS5)
+        consulta = ' '.join('"%s"*' % termino.replace('"', '""') for termino in terminos)
+        tabla = queryset.model._meta.db_table
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s', [consulta])
+        ).annotate(relevancia=RawSQL(
+            f'SELECT -bm25({TABLA_FTS}) FROM {TABLA_FTS} '
+            f'WHERE {TABLA_FTS} MATCH %s AND {TABLA_FTS}.rowid = {tabla}.id',
+            [consulta],
+            output_field=FloatField(),
+        ))
@@ -1,3 +1,7 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from inventario.models import Category, Product, Movement
 
@@ -29,7 +33,7 @@ class ProductSerializer(serializers.ModelSerializer):
         model = Product
         fields = [
             'id', 'empresa', 'empresa_nombre', 'categoria', 'categoria_nombre',
-            'nombre', 'cantidad', 'unidad_medida', 'stock_minimo',
+            'nombre', 'codigo', 'cantidad', 'unidad_medida', 'stock_minimo',
             'costo', 'precio_venta', 'descuento', 'proveedor',
             'fecha_vencimiento', 'lote', 'campos_extra',
             'is_active', 'created_at', 'updated_at'
@@ -63,21 +67,36 @@ class ProductDetailSerializer(ProductSerializer):
 
 
 class MovementSerializer(serializers.ModelSerializer):
-    """Serializador de movimientos de inventario"""
+    """Serializador de movimientos de inventario.
+
+    Expone los campos del modelo con los nombres en español que usa la API
+    (`producto`, `tipo_movimiento`, `cantidad`, `notas`, `creado_por`).
+    """
+    producto = serializers.PrimaryKeyRelatedField(
+        source='product',
+        queryset=Product.objects.all()
+    )
     producto_nombre = serializers.CharField(
-        source='producto.nombre',
+        source='product.nombre',
         read_only=True
     )
     empresa_nombre = serializers.CharField(
         source='empresa.nombre',
         read_only=True
     )
-    creado_por_email = serializers.CharField(
-        source='creado_por.email',
-        read_only=True
+    tipo_movimiento = serializers.ChoiceField(
+        source='movement_type',
+        choices=Movement.MOVEMENT_TYPES
     )
     tipo_movimiento_display = serializers.CharField(
-        source='get_tipo_movimiento_display',
+        source='get_movement_type_display',
+        read_only=True
+    )
+    cantidad = serializers.IntegerField(source='quantity', min_value=1)
+    notas = serializers.CharField(source='notes', required=False, allow_blank=True)
+    creado_por = serializers.PrimaryKeyRelatedField(source='created_by', read_only=True)
+    creado_por_email = serializers.CharField(
+        source='created_by.email',
         read_only=True
     )
     
@@ -94,6 +113,16 @@ class MovementSerializer(serializers.ModelSerializer):
 
 class MovementCreateSerializer(serializers.ModelSerializer):
     """Serializador para crear movimientos de inventario"""
+    producto = serializers.PrimaryKeyRelatedField(
+        source='product',
+        queryset=Product.objects.all()
+    )
+    tipo_movimiento = serializers.ChoiceField(
+        source='movement_type',
+        choices=Movement.MOVEMENT_TYPES
+    )
+    cantidad = serializers.IntegerField(source='quantity')
+    notas = serializers.CharField(source='notes', required=False, allow_blank=True)
     
     class Meta:
         model = Movement
@@ -112,11 +141,11 @@ class MovementCreateSerializer(serializers.ModelSerializer):
     
     def validate(self, data):
         """Valida la salida de inventario"""
-        producto = data.get('producto')
-        tipo_movimiento = data.get('tipo_movimiento')
-        cantidad = data.get('cantidad')
+        producto = data.get('product')
+        tipo_movimiento = data.get('movement_type')
+        cantidad = data.get('quantity')
         
-        if tipo_movimiento == 'SALIDA' and producto:
+        if tipo_movimiento == Movement.TIPO_SALIDA and producto:
             if producto.cantidad < cantidad:
                 raise serializers.ValidationError({
                     'cantidad': f"Stock insuficiente. Disponible: {producto.cantidad}"
@@ -125,5 +154,143 @@ class MovementCreateSerializer(serializers.ModelSerializer):
         return data
 
 
+class MovementLineSerializer(serializers.Serializer):
+    """Línea individual de una carga masiva de movimientos.
+
+    No consulta la base de datos: la existencia del producto y el stock se
+    validan en bloque al registrar el lote.
+    """
+    producto = serializers.IntegerField(min_value=1)
+    tipo_movimiento = serializers.ChoiceField(choices=Movement.MOVEMENT_TYPES)
+    cantidad = serializers.IntegerField(min_value=1)
+    referencia = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    motivo = serializers.CharField(required=False, allow_blank=True, default='')
+    notas = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class MovementScanSerializer(serializers.Serializer):
+    """Lectura de un escáner (`POST /api/movements/scan/`).
+
+    El producto se identifica por `codigo`; por defecto registra la salida
+    de una unidad.
+    """
+    codigo = serializers.CharField(max_length=64)
+    tipo_movimiento = serializers.ChoiceField(
+        choices=Movement.MOVEMENT_TYPES,
+        default=Movement.TIPO_SALIDA
+    )
+    cantidad = serializers.IntegerField(min_value=1, default=1)
+    referencia = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    motivo = serializers.CharField(required=False, allow_blank=True, default='')
+    notas = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class CheckoutLineSerializer(serializers.Serializer):
+    """Línea de una venta: producto por `producto` (id) o por `codigo`.
+
+    No consulta la base de datos; los códigos se resuelven en bloque.
+    """
+    producto = serializers.IntegerField(min_value=1, required=False)
+    codigo = serializers.CharField(max_length=64, required=False)
+    cantidad = serializers.IntegerField(min_value=1, default=1)
+
+    def validate(self, data):
+        if ('producto' in data) == ('codigo' in data):
+            raise serializers.ValidationError('Indica `producto` o `codigo` (solo uno)')
+        return data
+
+
+class MovementCheckoutSerializer(serializers.Serializer):
+    """Venta de varias líneas (`POST /api/movements/checkout/`).
+
+    Todas las líneas se registran como SALIDA con la misma `referencia`;
+    si no se indica se genera una.
+    """
+    referencia = serializers.CharField(max_length=100, required=False, allow_blank=True, default='')
+    motivo = serializers.CharField(required=False, allow_blank=True, default='')
+    notas = serializers.CharField(required=False, allow_blank=True, default='')
+    lineas = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False
+    )
+
+    def validate_lineas(self, value):
+        maximo = settings.INVENTARIO_BULK_MAX_LINEAS
+        if len(value) > maximo:
+            raise serializers.ValidationError(
+                f"Máximo {maximo} líneas por venta"
+            )
+        return value
+
+
+class MovementBulkSerializer(serializers.Serializer):
+    """Carga masiva de movimientos (`POST /api/movements/bulk/`).
+
+    - `atomico`: si alguna línea falla no se registra ninguna.
+    - `parcial`: se registran las líneas válidas y se reportan las fallidas.
+    """
+    MODO_ATOMICO = 'atomico'
+    MODO_PARCIAL = 'parcial'
+
+    modo = serializers.ChoiceField(
+        choices=[MODO_ATOMICO, MODO_PARCIAL],
+        default=MODO_ATOMICO
+    )
+    movimientos = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False
+    )
+
+    def validate_movimientos(self, value):
+        maximo = settings.INVENTARIO_BULK_MAX_LINEAS
+        if len(value) > maximo:
+            raise serializers.ValidationError(
+                f"Máximo {maximo} movimientos por lote"
+            )
+        return value
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    """Fila del CSV de `POST /api/products/import/`.
+
+    La categoría se indica por nombre y se resuelve en bloque; la fila no
+    consulta la base de datos para que pueda validarse miles de veces por
+    segundo.
+    """
+    nombre = serializers.CharField(max_length=255)
+    categoria = serializers.CharField(max_length=100)
+    cantidad = serializers.IntegerField(min_value=0, default=0)
+    unidad_medida = serializers.CharField(max_length=50, required=False, allow_blank=True)
+    stock_minimo = serializers.IntegerField(min_value=0, required=False)
+    costo = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0'))
+    precio_venta = serializers.DecimalField(max_digits=12, decimal_places=2, min_value=Decimal('0'))
+    descuento = serializers.DecimalField(
+        max_digits=5, decimal_places=2, min_value=Decimal('0'), required=False
+    )
+    proveedor = serializers.CharField(max_length=255, required=False, allow_blank=True)
+    fecha_vencimiento = serializers.DateField(required=False, allow_null=True)
+    lote = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    campos_extra = serializers.JSONField(binary=True, required=False)
+
+    def validate_fecha_vencimiento(self, value):
+        if value and value < timezone.now().date():
+            raise serializers.ValidationError('La fecha de vencimiento no puede ser anterior a hoy')
+        return value
+
+
+class ProductImportSerializer(serializers.Serializer):
+    """Carga masiva de productos desde CSV (`POST /api/products/import/`).
+
+    Los productos se identifican por `(empresa, nombre)`: los existentes se
+    actualizan con las celdas con valor de su fila, salvo `cantidad`, que
+    solo cambia mediante movimientos.
+    """
+    archivo = serializers.FileField()
+    crear_categorias = serializers.BooleanField(default=False)
+
+
 __all__ = ['CategorySerializer', 'ProductSerializer', 'ProductDetailSerializer', 
-           'MovementSerializer', 'MovementCreateSerializer']
+           'MovementSerializer', 'MovementCreateSerializer',
+           'MovementLineSerializer', 'MovementScanSerializer', 'MovementBulkSerializer',
+           'CheckoutLineSerializer', 'MovementCheckoutSerializer',
+           'ProductImportRowSerializer', 'ProductImportSerializer']
@@ -0,0 +1,178 @@
+"""
+Difusión en tiempo real de los cambios de stock (`GET /api/stream/stock/`).
+
+Cada movimiento confirmado publica, con `transaction.on_commit`, un evento
+compacto por producto afectado: `{"producto", "cantidad", "bajo_stock"}`.
+Los datos salen de las filas que el propio movimiento ya leyó o bloqueó,
+así que publicar no cuesta consultas y las conexiones abiertas no tocan la
+base de datos entre cambios.
+
+`broker` reparte los eventos entre las suscripciones del proceso (una cola
+`asyncio` por conexión, agrupadas por empresa). Con varios workers, si
+`INVENTARIO_STREAM_DIR` está definido, cada worker con suscriptores abre un
+socket Unix de datagramas en ese directorio y quien publica envía el evento
+a todos los sockets: un sustituto local de un pub/sub externo, como
+`INVENTARIO_METRICAS_DIR` lo es para las métricas.
+"""
+import asyncio
+import glob
+import json
+import os
+import socket
+import threading
+import uuid
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+# Eventos por datagrama: mantiene cada envío por debajo del búfer del socket
+EVENTOS_POR_DATAGRAMA = 500
+
+
+def evento_stock(producto_id, cantidad, stock_minimo):
+    """Evento compacto de cambio de stock de un producto."""
+    return {'producto': producto_id, 'cantidad': cantidad, 'bajo_stock': cantidad < stock_minimo}
+
+
+def publicar_al_confirmar(empresa_id, eventos):
+    """Publica los eventos cuando se confirme la transacción en curso."""
+    if empresa_id is None or not eventos:
+        return
+    transaction.on_commit(lambda: broker.publicar(empresa_id, eventos))
+
+
+class Suscripcion:
+    """Cola de eventos de una conexión, consumida desde su event loop."""
+
+    def __init__(self, empresa_id, loop):
+        self.empresa_id = empresa_id
+        self.loop = loop
+        self.cola = asyncio.Queue(maxsize=settings.INVENTARIO_STREAM_COLA)
+        # El cliente no consume a tiempo: se le pide recargar en lugar de acumular
+        self.desbordada = False
+
+    def entregar(self, eventos):
+        """Encola los eventos desde cualquier hilo."""
+        try:
+            self.loop.call_soon_threadsafe(self._encolar, eventos)
+        except RuntimeError:
+            # Event loop cerrado: la conexión ya terminó
+            pass
+
+    def _encolar(self, eventos):
+        try:
+            self.cola.put_nowait(eventos)
+        except asyncio.QueueFull:
+            self.desbordada = True
+
+
+class BrokerStock:
+    """Reparte eventos de stock entre las suscripciones por empresa."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.pid = os.getpid()
+        self.suscripciones = defaultdict(set)
+        self.socket = None
+        self.ruta_socket = None
+
+    def suscribir(self, empresa_id):
+        """Nueva suscripción atada al event loop en curso."""
+        suscripcion = Suscripcion(empresa_id, asyncio.get_running_loop())
+        with self._lock:
+            if os.getpid() != self.pid:
+                # Proceso hijo tras un fork: no heredar suscriptores ni socket
+                self._reiniciar()
+            self.suscripciones[empresa_id].add(suscripcion)
+            if self.socket is None and getattr(settings, 'INVENTARIO_STREAM_DIR', ''):
+                self._escuchar(settings.INVENTARIO_STREAM_DIR)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._lock:
+            suscritas = self.suscripciones.get(suscripcion.empresa_id)
+            if suscritas is not None:
+                suscritas.discard(suscripcion)
+                if not suscritas:
+                    del self.suscripciones[suscripcion.empresa_id]
+
+    def total_suscripciones(self):
+        with self._lock:
+            return sum(len(suscritas) for suscritas in self.suscripciones.values())
+
+    def publicar(self, empresa_id, eventos):
+        """Entrega a las suscripciones locales y reenvía a los demás workers."""
+        self._entregar_local(empresa_id, eventos)
+        directorio = getattr(settings, 'INVENTARIO_STREAM_DIR', '')
+        if directorio:
+            for inicio in range(0, len(eventos), EVENTOS_POR_DATAGRAMA):
+                self._reenviar(directorio, empresa_id, eventos[inicio:inicio + EVENTOS_POR_DATAGRAMA])
+
+    def _entregar_local(self, empresa_id, eventos):
+        with self._lock:
+            suscritas = list(self.suscripciones.get(empresa_id, ()))
+        for suscripcion in suscritas:
+            suscripcion.entregar(eventos)
+
+    def _reenviar(self, directorio, empresa_id, eventos):
+        datos = json.dumps({'empresa': empresa_id, 'eventos': eventos}).encode()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as emisor:
+            emisor.setblocking(False)
+            for ruta in glob.glob(os.path.join(directorio, 'stream_*.sock')):
+                if ruta == self.ruta_socket:
+                    continue
+                try:
+                    emisor.sendto(datos, ruta)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Worker terminado sin borrar su socket
+                    self._borrar(ruta)
+                except OSError:
+                    # Receptor saturado: el evento se pierde para ese worker, pero
+                    # el movimiento ya está confirmado y la petición no debe fallar
+                    continue
+
+    def _escuchar(self, directorio):
+        os.makedirs(directorio, exist_ok=True)
+        ruta = os.path.join(directorio, f'stream_{os.getpid()}_{uuid.uuid4().hex[:8]}.sock')
+        receptor = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        receptor.bind(ruta)
+        self.socket, self.ruta_socket = receptor, ruta
+        threading.Thread(target=self._recibir, args=(receptor,), daemon=True).start()
+
+    def _recibir(self, receptor):
+        with receptor:
+            while True:
+                datos = receptor.recv(1 << 20)
+                if self.socket is not receptor:
+                    # `cerrar()` despierta al hilo con un datagrama vacío
+                    return
+                try:
+                    mensaje = json.loads(datos)
+                    self._entregar_local(mensaje['empresa'], mensaje['eventos'])
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+    def cerrar(self):
+        """Deja de escuchar y borra el socket del worker (apagado ordenado y tests)."""
+        with self._lock:
+            receptor, ruta = self.socket, self.ruta_socket
+            self.socket = self.ruta_socket = None
+        if receptor is None:
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as emisor:
+            emisor.sendto(b'', ruta)
+        self._borrar(ruta)
+
+    @staticmethod
+    def _borrar(ruta):
+        try:
+            os.unlink(ruta)
+        except FileNotFoundError:
+            pass
+
+
+broker = BrokerStock()
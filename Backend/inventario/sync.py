@@ -0,0 +1,115 @@
+"""
+Sincronización incremental para clientes offline (`GET /api/sync/changes/`).
+
+Cada recurso se recorre por `(updated_at, id)` ascendente sobre el índice
+`(empresa, updated_at, id)`, así que el costo depende de lo que cambió y no
+del tamaño del catálogo. El cursor guarda la última posición de cada
+recurso y el instante de corte.
+
+Solo se devuelven filas con `updated_at <= corte`, donde el corte va
+`INVENTARIO_SYNC_MARGEN` por detrás del reloj: `updated_at` se fija antes
+del COMMIT, y el margen evita saltarse una fila que se confirme después de
+que el cursor ya la haya pasado. Así el cursor solo avanza.
+
+Las bajas físicas no dejan fila; si hubo alguna después del corte del
+cursor recibido, la respuesta trae `resincronizar: true` y el cliente debe
+descartar sus datos y sincronizar desde cero.
+"""
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from accounts.models import Empresa
+from inventario.models import Category, Movement, Product
+from inventario.serializers import CategorySerializer, MovementSerializer, ProductSerializer
+
+# nombre: (modelo, serializador, relaciones que lee el serializador)
+RECURSOS = {
+    'categorias': (Category, CategorySerializer, ('empresa',)),
+    'productos': (Product, ProductSerializer, ('categoria', 'empresa')),
+    'movimientos': (Movement, MovementSerializer, ('product', 'empresa', 'created_by')),
+}
+
+
+def codificar_cursor(datos):
+    contenido = json.dumps(datos, separators=(',', ':'))
+    return base64.urlsafe_b64encode(contenido.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """Posición `(updated_at, id)` por recurso y corte del cursor recibido."""
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        corte = parse_datetime(datos['corte'])
+        posiciones = {}
+        for nombre, posicion in datos['posiciones'].items():
+            if nombre not in RECURSOS:
+                raise ValueError
+            fecha, pk = posicion
+            posiciones[nombre] = (parse_datetime(fecha), int(pk))
+        if corte is None or any(fecha is None for fecha, _ in posiciones.values()):
+            raise ValueError
+    except (TypeError, ValueError, KeyError, AttributeError, binascii.Error):
+        raise serializers.ValidationError({'since': 'Cursor inválido'})
+    return corte, posiciones
+
+
+class SincronizacionCambios:
+    """Cambios de una empresa posteriores a un cursor, por recurso."""
+
+    def __init__(self, empresa_id, cursor=None, recursos=None, limite=None):
+        self.empresa_id = empresa_id
+        self.recursos = list(recursos or RECURSOS)
+        self.limite = min(limite or settings.INVENTARIO_SYNC_LOTE, settings.INVENTARIO_SYNC_LOTE)
+        self.corte_anterior, self.posiciones = (
+            decodificar_cursor(cursor) if cursor else (None, {})
+        )
+
+    def cambios(self, contexto):
+        """Respuesta del endpoint: filas cambiadas por recurso y el nuevo cursor."""
+        corte = timezone.now() - settings.INVENTARIO_SYNC_MARGEN
+        respuesta = {}
+        hay_mas = False
+        for nombre in self.recursos:
+            modelo, serializer_class, relaciones = RECURSOS[nombre]
+            filas = list(self._pendientes(modelo, relaciones, nombre, corte)[:self.limite + 1])
+            if len(filas) > self.limite:
+                hay_mas = True
+                filas = filas[:self.limite]
+            if filas:
+                self.posiciones[nombre] = (filas[-1].updated_at, filas[-1].pk)
+            respuesta[nombre] = serializer_class(filas, many=True, context=contexto).data
+
+        posiciones = {
+            nombre: [fecha.isoformat(), pk] for nombre, (fecha, pk) in self.posiciones.items()
+        }
+        respuesta.update({
+            'cursor': codificar_cursor({'corte': corte.isoformat(), 'posiciones': posiciones}),
+            'hay_mas': hay_mas,
+            'resincronizar': self._hubo_bajas(),
+        })
+        return respuesta
+
+    def _pendientes(self, modelo, relaciones, nombre, corte):
+        queryset = modelo.objects.filter(
+            empresa_id=self.empresa_id, updated_at__lte=corte
+        ).select_related(*relaciones).order_by('updated_at', 'id')
+        posicion = self.posiciones.get(nombre)
+        if posicion is not None:
+            fecha, pk = posicion
+            queryset = queryset.filter(Q(updated_at__gt=fecha) | Q(updated_at=fecha, id__gt=pk))
+        return queryset
+
+    def _hubo_bajas(self):
+        if self.corte_anterior is None:
+            return False
+        ultima = Empresa.objects.filter(pk=self.empresa_id).values_list(
+            'ultima_eliminacion', flat=True
+        ).first()
+        return ultima is not None and ultima > self.corte_anterior
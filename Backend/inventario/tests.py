@@ -1,7 +1,23 @@
 """
 Tests para los modelos, serializers y views de inventario.
 """
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import os
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Max, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
@@ -9,7 +25,12 @@ from rest_framework import status
 from inventario.models.category import Category
 from inventario.models.product import Product
 from inventario.models.movement import Movement
-from accounts.models import Empresa, Role, Permission
+from inventario.models.checkpoint import StockCheckpoint
+from inventario.models.rollup import DailyMovementRollup
+from inventario.models.category_stats import CategoryStats
+from inventario.pagination import ConteoVentanaPaginator
+from accounts.authentication import CustomTokenObtainPairSerializer
+from accounts.models import Empresa
 
 
 User = get_user_model()
@@ -21,8 +42,6 @@ class EmpresaModelTest(TestCase):
     def setUp(self):
         self.empresa = Empresa.objects.create(
             nombre='Farmacia Test',
-            slug='farmacia-test',
-            descripcion='Empresa de prueba',
             nicho='farmacia'
         )
     
@@ -43,7 +62,6 @@ class CategoryModelTest(TestCase):
     def setUp(self):
         self.empresa = Empresa.objects.create(
             nombre='Farmacia Test',
-            slug='farmacia-test',
             nicho='farmacia'
         )
         self.categoria = Category.objects.create(
@@ -70,7 +88,6 @@ class ProductModelTest(TestCase):
     def setUp(self):
         self.empresa = Empresa.objects.create(
             nombre='Farmacia Test',
-            slug='farmacia-test',
             nicho='farmacia'
         )
         self.categoria = Category.objects.create(
@@ -111,7 +128,6 @@ class MovementModelTest(TestCase):
     def setUp(self):
         self.empresa = Empresa.objects.create(
             nombre='Farmacia Test',
-            slug='farmacia-test',
             nicho='farmacia'
         )
         self.usuario = User.objects.create_user(
@@ -138,14 +154,14 @@ class MovementModelTest(TestCase):
         """Test que verifica la creación de un movimiento de ENTRADA"""
         movimiento = Movement.objects.create(
             empresa=self.empresa,
-            producto=self.producto,
-            tipo_movimiento='ENTRADA',
-            cantidad=50,
+            product=self.producto,
+            movement_type='ENTRADA',
+            quantity=50,
             referencia='FACT-001',
-            creado_por=self.usuario
+            created_by=self.usuario
         )
-        self.assertEqual(movimiento.tipo_movimiento, 'ENTRADA')
-        self.assertEqual(movimiento.cantidad, 50)
+        self.assertEqual(movimiento.movement_type, 'ENTRADA')
+        self.assertEqual(movimiento.quantity, 50)
     
     def test_movement_auto_update_stock(self):
         """Test que verifica la actualización automática de stock"""
@@ -155,12 +171,2086 @@ class MovementModelTest(TestCase):
         # Crear movimiento de entrada
         Movement.objects.create(
             empresa=self.empresa,
-            producto=self.producto,
-            tipo_movimiento='ENTRADA',
-            cantidad=50,
-            creado_por=self.usuario
+            product=self.producto,
+            movement_type='ENTRADA',
+            quantity=50,
+            created_by=self.usuario
         )
         
         # Refrescar el producto
         self.producto.refresh_from_db()
         self.assertEqual(self.producto.cantidad, inicial + 50)
+    
+    def test_movement_salida_stock_insuficiente(self):
+        """Test que verifica que el UPDATE condicional rechaza la salida"""
+        with self.assertRaises(ValidationError):
+            Movement.objects.create(
+                empresa=self.empresa,
+                product=self.producto,
+                movement_type='SALIDA',
+                quantity=101,
+                created_by=self.usuario
+            )
+        
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.cantidad, 100)
+        self.assertFalse(Movement.objects.exists())
+    
+    def test_movement_update_aplica_diferencia(self):
+        """Test que verifica que editar un movimiento aplica solo la diferencia"""
+        movimiento = Movement.objects.create(
+            empresa=self.empresa,
+            product=self.producto,
+            movement_type='SALIDA',
+            quantity=30,
+            created_by=self.usuario
+        )
+        movimiento.quantity = 10
+        movimiento.save()
+        
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.cantidad, 90)
+
+
+class MovementBulkAPITest(APITestCase):
+    """Tests para la carga masiva de movimientos"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.producto_a = Product.objects.create(
+            empresa=self.empresa, nombre='Paracetamol 500mg', categoria=self.categoria,
+            cantidad=10, costo=5.00, precio_venta=10.00
+        )
+        self.producto_b = Product.objects.create(
+            empresa=self.empresa, nombre='Ibuprofeno 400mg', categoria=self.categoria,
+            cantidad=0, costo=3.00, precio_venta=6.00
+        )
+        self.client.force_authenticate(self.usuario)
+        self.url = '/api/movements/bulk/'
+    
+    def test_bulk_atomico_aplica_delta_neto(self):
+        """Test que verifica que el lote se valida como conjunto"""
+        response = self.client.post(self.url, {
+            'movimientos': [
+                {'producto': self.producto_b.id, 'tipo_movimiento': 'SALIDA', 'cantidad': 5},
+                {'producto': self.producto_b.id, 'tipo_movimiento': 'ENTRADA', 'cantidad': 8},
+                {'producto': self.producto_a.id, 'tipo_movimiento': 'SALIDA', 'cantidad': 4},
+            ]
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['creados'], 3)
+        self.producto_a.refresh_from_db()
+        self.producto_b.refresh_from_db()
+        self.assertEqual(self.producto_a.cantidad, 6)
+        self.assertEqual(self.producto_b.cantidad, 3)
+        self.assertEqual(Movement.objects.filter(created_by=self.usuario).count(), 3)
+    
+    def test_bulk_atomico_no_escribe_si_falla_una_linea(self):
+        """Test que verifica el modo todo-o-nada"""
+        response = self.client.post(self.url, {
+            'modo': 'atomico',
+            'movimientos': [
+                {'producto': self.producto_a.id, 'tipo_movimiento': 'ENTRADA', 'cantidad': 5},
+                {'producto': self.producto_b.id, 'tipo_movimiento': 'SALIDA', 'cantidad': 1},
+            ]
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['errores'][0]['indice'], 1)
+        self.producto_a.refresh_from_db()
+        self.assertEqual(self.producto_a.cantidad, 10)
+        self.assertFalse(Movement.objects.exists())
+    
+    def test_bulk_parcial_reporta_errores_por_linea(self):
+        """Test que verifica el modo best-effort con reporte por línea"""
+        response = self.client.post(self.url, {
+            'modo': 'parcial',
+            'movimientos': [
+                {'producto': self.producto_a.id, 'tipo_movimiento': 'SALIDA', 'cantidad': 7},
+                {'producto': self.producto_a.id, 'tipo_movimiento': 'SALIDA', 'cantidad': 7},
+                {'producto': 999999, 'tipo_movimiento': 'ENTRADA', 'cantidad': 1},
+                {'producto': self.producto_a.id, 'tipo_movimiento': 'OTRO', 'cantidad': 1},
+            ]
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['creados'], 1)
+        self.assertEqual([e['indice'] for e in response.data['errores']], [1, 2, 3])
+        self.producto_a.refresh_from_db()
+        self.assertEqual(self.producto_a.cantidad, 3)
+
+
+class MovementIdempotencyAPITest(APITestCase):
+    """Tests para la cabecera Idempotency-Key en movimientos"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.producto = Product.objects.create(
+            empresa=self.empresa, nombre='Paracetamol 500mg', categoria=self.categoria,
+            cantidad=10, costo=5.00, precio_venta=10.00
+        )
+        self.client.force_authenticate(self.usuario)
+        self.payload = {'producto': self.producto.id, 'tipo_movimiento': 'SALIDA', 'cantidad': 3}
+    
+    def test_reintento_no_duplica_salida(self):
+        """Test que verifica que un reintento devuelve la respuesta original"""
+        primera = self.client.post('/api/movements/', self.payload, format='json',
+                                   HTTP_IDEMPOTENCY_KEY='venta-001')
+        segunda = self.client.post('/api/movements/', self.payload, format='json',
+                                   HTTP_IDEMPOTENCY_KEY='venta-001')
+        
+        self.assertEqual(primera.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(segunda.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertEqual(segunda.data, primera.data)
+        self.assertEqual(Movement.objects.count(), 1)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.cantidad, 7)
+    
+    def test_clave_reutilizada_con_otro_cuerpo(self):
+        """Test que verifica que una clave no puede reutilizarse con otro cuerpo"""
+        self.client.post('/api/movements/', self.payload, format='json',
+                         HTTP_IDEMPOTENCY_KEY='venta-002')
+        response = self.client.post('/api/movements/', dict(self.payload, cantidad=1),
+                                    format='json', HTTP_IDEMPOTENCY_KEY='venta-002')
+        
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Movement.objects.count(), 1)
+    
+    def test_clave_reutilizada_en_otro_endpoint(self):
+        """Test que verifica que una clave no devuelve la respuesta de otro endpoint"""
+        self.client.post('/api/movements/', self.payload, format='json',
+                         HTTP_IDEMPOTENCY_KEY='venta-003')
+        response = self.client.post('/api/movements/bulk/', self.payload, format='json',
+                                    HTTP_IDEMPOTENCY_KEY='venta-003')
+        
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Movement.objects.count(), 1)
+
+
+@override_settings(INVENTARIO_CHECKPOINT_CADA=2)
+class StockAtTest(APITestCase):
+    """Tests para el stock histórico con checkpoints"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.antes = timezone.now()
+        self.producto = Product.objects.create(
+            empresa=self.empresa, nombre='Paracetamol 500mg', categoria=self.categoria,
+            cantidad=100, costo=5.00, precio_venta=10.00
+        )
+        self._mover('SALIDA', 10)
+        self.t1 = timezone.now()
+        self._mover('ENTRADA', 5)
+        self.t2 = timezone.now()
+        self._mover('SALIDA', 20)
+        self.client.force_authenticate(self.usuario)
+    
+    def _mover(self, tipo, cantidad):
+        Movement.objects.create(
+            empresa=self.empresa, product=self.producto, movement_type=tipo,
+            quantity=cantidad, created_by=self.usuario
+        )
+    
+    def test_checkpoints_se_escriben_cada_n_movimientos(self):
+        """Test que verifica el checkpoint de alta y el periódico"""
+        checkpoints = StockCheckpoint.objects.filter(product=self.producto).order_by('fecha')
+        self.assertEqual([c.cantidad for c in checkpoints], [100, 95])
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.movimientos_sin_checkpoint, 1)
+    
+    def test_stock_en_fecha(self):
+        """Test que verifica el stock histórico del producto"""
+        stock = StockCheckpoint.objects.stock_en
+        self.assertEqual(stock(self.producto, self.antes)[0], 0)
+        self.assertEqual(stock(self.producto, self.t1)[0], 90)
+        self.assertEqual(stock(self.producto, self.t2)[0], 95)
+        self.assertEqual(stock(self.producto, timezone.now())[0], 75)
+    
+    def test_stock_en_fecha_sin_checkpoints(self):
+        """Test que verifica el cálculo hacia atrás desde el stock actual"""
+        StockCheckpoint.objects.all().delete()
+        self.producto.refresh_from_db()
+        self.assertEqual(StockCheckpoint.objects.stock_en(self.producto, self.t1)[0], 90)
+    
+    def test_editar_movimiento_conserva_ajustes_manuales(self):
+        """Test que verifica que editar un movimiento desplaza los checkpoints manuales"""
+        producto = Product.objects.create(
+            empresa=self.empresa, nombre='Ibuprofeno 400mg', categoria=self.categoria,
+            cantidad=10, costo=5.00, precio_venta=10.00
+        )
+        entrada = Movement.objects.create(
+            empresa=self.empresa, product=producto, movement_type='ENTRADA', quantity=5,
+            created_by=self.usuario
+        )
+        producto.refresh_from_db()
+        producto.cantidad = 100
+        producto.save()
+        tras_ajuste = timezone.now()
+        Movement.objects.create(
+            empresa=self.empresa, product=producto, movement_type='SALIDA', quantity=1,
+            created_by=self.usuario
+        )
+        
+        entrada.quantity = 6
+        entrada.save()
+        producto.refresh_from_db()
+        self.assertEqual(producto.cantidad, 100)
+        self.assertEqual(StockCheckpoint.objects.stock_en(producto, tras_ajuste)[0], 101)
+        self.assertEqual(StockCheckpoint.objects.stock_en(producto, timezone.now())[0], 100)
+        
+        response = self.client.get(
+            f'/api/products/{producto.id}/stock-at/', {'fecha': tras_ajuste.isoformat()}
+        )
+        self.assertEqual(response.data['cantidad'], 101)
+    
+    def test_producto_sin_checkpoint_con_ajuste_manual(self):
+        """Test que verifica el stock previo a un ajuste manual sin checkpoint anterior"""
+        # Producto anterior a los checkpoints: `bulk_create` no pasa por save()
+        producto, = Product.objects.bulk_create([Product(
+            empresa=self.empresa, nombre='Ibuprofeno 400mg', categoria=self.categoria,
+            cantidad=10, costo=5.00, precio_venta=10.00
+        )])
+        Movement.objects.create(
+            empresa=self.empresa, product=producto, movement_type='SALIDA', quantity=2,
+            created_by=self.usuario
+        )
+        antes_del_ajuste = timezone.now()
+        producto.refresh_from_db()
+        producto.cantidad = 50
+        producto.save()
+        
+        self.assertEqual(StockCheckpoint.objects.stock_en(producto, antes_del_ajuste)[0], 8)
+        anotado = StockCheckpoint.objects.anotar_stock_en(
+            Product.objects.filter(pk=producto.pk), antes_del_ajuste
+        ).get()
+        self.assertEqual(anotado.stock_en_fecha, 8)
+        response = self.client.get('/api/products/stock-at/', {'fecha': antes_del_ajuste.isoformat()})
+        por_id = {fila['producto_id']: fila['cantidad'] for fila in response.data['results']}
+        self.assertEqual(por_id[producto.pk], 8)
+    
+    def test_migracion_crea_checkpoint_inicial(self):
+        """Test que verifica el checkpoint inicial de los productos existentes"""
+        from django.apps import apps
+        from importlib import import_module
+        
+        producto, = Product.objects.bulk_create([Product(
+            empresa=self.empresa, nombre='Ibuprofeno 400mg', categoria=self.categoria,
+            cantidad=10, costo=5.00, precio_venta=10.00
+        )])
+        migracion = import_module('inventario.migrations.0003_stock_checkpoint')
+        migracion.crear_checkpoints_iniciales(apps, None)
+        migracion.crear_checkpoints_iniciales(apps, None)
+        
+        self.assertEqual(
+            list(StockCheckpoint.objects.filter(product=producto).values_list('cantidad', 'ajuste')),
+            [(10, 0)]
+        )
+        self.assertEqual(StockCheckpoint.objects.filter(product=self.producto).count(), 2)
+    
+    def test_stock_at_endpoints(self):
+        """Test que verifica los endpoints de stock histórico"""
+        fecha = self.t1.isoformat()
+        detalle = self.client.get(f'/api/products/{self.producto.id}/stock-at/', {'fecha': fecha})
+        todos = self.client.get('/api/products/stock-at/', {'fecha': fecha})
+        
+        self.assertEqual(detalle.status_code, status.HTTP_200_OK)
+        self.assertEqual(detalle.data['cantidad'], 90)
+        self.assertEqual(todos.status_code, status.HTTP_200_OK)
+        self.assertEqual(todos.data['results'][0]['cantidad'], 90)
+        self.assertEqual(
+            self.client.get('/api/products/stock-at/').status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+class MovementResumenTest(APITestCase):
+    """Tests para el resumen agregado de movimientos"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.otra_categoria = Category.objects.create(empresa=self.empresa, nombre='Accesorios')
+        self.producto = Product.objects.create(
+            empresa=self.empresa, nombre='Paracetamol 500mg', categoria=self.categoria,
+            cantidad=100, costo=5.00, precio_venta=10.00
+        )
+        self.accesorio = Product.objects.create(
+            empresa=self.empresa, nombre='Jeringa', categoria=self.otra_categoria,
+            cantidad=50, costo=1.00, precio_venta=2.50
+        )
+        for producto, tipo, cantidad in [
+            (self.producto, 'ENTRADA', 10),
+            (self.producto, 'SALIDA', 4),
+            (self.producto, 'SALIDA', 6),
+            (self.accesorio, 'SALIDA', 2),
+        ]:
+            Movement.objects.create(
+                empresa=self.empresa, product=producto, movement_type=tipo,
+                quantity=cantidad, created_by=self.usuario
+            )
+        self.client.force_authenticate(self.usuario)
+    
+    def test_resumen_una_consulta(self):
+        """Test que verifica que el resumen se calcula en una sola consulta"""
+        with self.assertNumQueries(1):
+            resumen = Movement.objects.filter(empresa=self.empresa).resumen()
+        
+        self.assertEqual(resumen['ENTRADA']['cantidad_total'], 10)
+        self.assertEqual(resumen['ENTRADA']['valor_total'], 50)
+        self.assertEqual(resumen['SALIDA']['total_movimientos'], 3)
+        self.assertEqual(resumen['SALIDA']['valor_total'], 105)
+    
+    def test_resumen_endpoint_con_filtros(self):
+        """Test que verifica los filtros de categoría del endpoint resumen"""
+        response = self.client.get('/api/movements/resumen/', {'categoria': self.categoria.id})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_movimientos'], 3)
+        self.assertEqual(response.data['salidas']['cantidad_total'], 10)
+        self.assertEqual(response.data['salidas']['valor_total'], 100.0)
+        self.assertEqual(response.data['periodo_ultimos_7_dias'], 3)
+    
+    def test_resumen_fecha_fin_incluye_todo_el_dia(self):
+        """Test que verifica que fecha_fin sin hora cubre el día completo"""
+        hoy = timezone.localdate().isoformat()
+        response = self.client.get('/api/movements/resumen/', {'fecha_inicio': hoy, 'fecha_fin': hoy})
+        self.assertEqual(response.data['total_movimientos'], 4)
+    
+    def test_resumen_rechaza_ids_invalidos(self):
+        """Test que verifica que categoria/producto no numéricos devuelven 400"""
+        for parametro in ('categoria', 'producto'):
+            response = self.client.get('/api/movements/resumen/', {parametro: 'abc'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(parametro, response.data)
+
+
+class DailyMovementRollupTest(APITestCase):
+    """Tests para los acumulados diarios de movimientos"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(
+            nombre='Farmacia Test', nicho='farmacia', zona_horaria='America/Bogota'
+        )
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.producto = Product.objects.create(
+            empresa=self.empresa, nombre='Paracetamol 500mg', categoria=self.categoria,
+            cantidad=100, costo=5.00, precio_venta=10.00
+        )
+        self.client.force_authenticate(self.usuario)
+    
+    def _mover(self, tipo, cantidad):
+        return Movement.objects.create(
+            empresa=self.empresa, product=self.producto, movement_type=tipo,
+            quantity=cantidad, created_by=self.usuario
+        )
+    
+    def _acumulado(self, tipo):
+        return DailyMovementRollup.objects.filter(
+            product=self.producto, movement_type=tipo
+        ).values_list('total_movimientos', 'cantidad_total').get()
+    
+    def test_rollup_se_actualiza_con_cada_movimiento(self):
+        """Test que verifica el acumulado al crear, editar y cargar en lote"""
+        self._mover('SALIDA', 4)
+        movimiento = self._mover('SALIDA', 6)
+        movimiento.quantity = 1
+        movimiento.save()
+        Movement.objects.registrar_lote([
+            (0, {'producto': self.producto.id, 'tipo_movimiento': 'ENTRADA', 'cantidad': 3}),
+        ], empresa=self.empresa)
+        
+        self.assertEqual(self._acumulado('SALIDA'), (2, 5))
+        self.assertEqual(self._acumulado('ENTRADA'), (1, 3))
+    
+    def test_rollup_descuenta_movimientos_eliminados(self):
+        """Test que verifica que eliminar un movimiento lo descuenta del acumulado"""
+        self._mover('ENTRADA', 3)
+        self._mover('SALIDA', 1).delete()
+        
+        self.assertFalse(DailyMovementRollup.objects.filter(movement_type='SALIDA').exists())
+        actual = sorted(DailyMovementRollup.objects.values_list(
+            'fecha', 'movement_type', 'total_movimientos', 'cantidad_total'
+        ))
+        DailyMovementRollup.objects.reconstruir()
+        self.assertEqual(actual, sorted(DailyMovementRollup.objects.values_list(
+            'fecha', 'movement_type', 'total_movimientos', 'cantidad_total'
+        )))
+    
+    def test_reconstruir_usa_zona_horaria_de_la_empresa(self):
+        """Test que verifica que el día se calcula en la zona de la empresa"""
+        movimiento = self._mover('ENTRADA', 2)
+        # 03:00 UTC es todavía el día anterior en Bogotá (UTC-5)
+        Movement.objects.filter(pk=movimiento.pk).update(
+            created_at=datetime(2026, 3, 10, 3, 0, tzinfo=dt_timezone.utc)
+        )
+        DailyMovementRollup.objects.reconstruir()
+        
+        rollup = DailyMovementRollup.objects.get()
+        self.assertEqual(str(rollup.fecha), '2026-03-09')
+        self.assertEqual(rollup.cantidad_total, 2)
+    
+    def test_series_endpoint(self):
+        """Test que verifica la serie temporal por mes"""
+        self._mover('ENTRADA', 10)
+        self._mover('SALIDA', 4)
+        
+        response = self.client.get('/api/movements/series/', {'granularity': 'month'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['serie']), 1)
+        self.assertEqual(response.data['serie'][0]['entradas'], 10)
+        self.assertEqual(response.data['serie'][0]['salidas'], 4)
+        self.assertEqual(
+            self.client.get('/api/movements/series/', {'granularity': 'year'}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        for parametro in ('producto', 'categoria'):
+            self.assertEqual(
+                self.client.get('/api/movements/series/', {parametro: 'abc'}).status_code,
+                status.HTTP_400_BAD_REQUEST
+            )
+    
+    def test_series_inicio_por_defecto_en_zona_de_la_empresa(self):
+        """Test que verifica que la ventana por defecto se cuenta en la zona de la empresa"""
+        from unittest import mock
+        
+        self.empresa.zona_horaria = 'Pacific/Kiritimati'
+        self.empresa.save()
+        # 01:00 UTC del 18: en Bogotá (servidor) aún es el 17, en Kiritimati (UTC+14) ya es el 18
+        ahora = datetime(2026, 10, 18, 1, 0, tzinfo=dt_timezone.utc)
+        with mock.patch('django.utils.timezone.now', return_value=ahora):
+            response = self.client.get('/api/movements/series/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(str(response.data['fecha_inicio']), '2025-10-18')
+
+
+class CategoryStatsTest(APITestCase):
+    """Tests para las estadísticas materializadas por categoría"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.otra = Category.objects.create(empresa=self.empresa, nombre='Insumos')
+        self.producto = Product.objects.create(
+            empresa=self.empresa, nombre='Paracetamol 500mg', categoria=self.categoria,
+            cantidad=10, stock_minimo=5, costo=2.50, precio_venta=4.00
+        )
+        self.client.force_authenticate(self.usuario)
+    
+    def _stats(self, categoria):
+        return CategoryStats.objects.filter(category=categoria).values_list(
+            'total_productos', 'stock_total', 'valor_inventario', 'productos_bajo_stock'
+        ).get()
+    
+    def test_stats_se_mantienen_con_movimientos_y_cambios(self):
+        """Test que verifica las estadísticas tras movimientos, lote y cambio de categoría"""
+        with self.captureOnCommitCallbacks(execute=True):
+            Movement.objects.create(
+                empresa=self.empresa, product=self.producto, movement_type='SALIDA',
+                quantity=6, created_by=self.usuario
+            )
+        self.assertEqual(self._stats(self.categoria), (1, 4, Decimal('10.00'), 1))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Movement.objects.registrar_lote([
+                (0, {'producto': self.producto.id, 'tipo_movimiento': 'ENTRADA', 'cantidad': 6}),
+            ], empresa=self.empresa)
+        self.assertEqual(self._stats(self.categoria), (1, 10, Decimal('25.00'), 0))
+        
+        self.producto.refresh_from_db()
+        self.producto.categoria = self.otra
+        self.producto.save()
+        self.assertEqual(self._stats(self.categoria), (0, 0, Decimal('0.00'), 0))
+        self.assertEqual(self._stats(self.otra), (1, 10, Decimal('25.00'), 0))
+    
+    def test_movimientos_actualizan_stats_tras_el_commit(self):
+        """Test que verifica un UPDATE por categoría, fuera de la transacción del movimiento"""
+        otro = Product.objects.create(
+            empresa=self.empresa, nombre='Ibuprofeno', categoria=self.categoria,
+            cantidad=10, stock_minimo=5, costo=1, precio_venta=2
+        )
+        insumo = Product.objects.create(
+            empresa=self.empresa, nombre='Jeringa', categoria=self.otra,
+            cantidad=10, stock_minimo=5, costo=1, precio_venta=2
+        )
+        with self.captureOnCommitCallbacks(execute=False) as pendientes:
+            with CaptureQueriesContext(connection) as capturadas:
+                Movement.objects.registrar_lote([
+                    (i, {'producto': producto.id, 'tipo_movimiento': 'SALIDA', 'cantidad': 1})
+                    for i, producto in enumerate([self.producto, otro, insumo, self.producto])
+                ], empresa=self.empresa)
+        self.assertFalse([q for q in capturadas.captured_queries if 'categorystats' in q['sql']])
+        self.assertEqual(self._stats(self.categoria)[1], 20)
+        
+        with CaptureQueriesContext(connection) as capturadas:
+            for callback in pendientes:
+                callback()
+        actualizaciones = [q['sql'] for q in capturadas.captured_queries if 'categorystats' in q['sql']]
+        self.assertEqual(len(actualizaciones), 2)
+        self.assertEqual(self._stats(self.categoria)[1:3], (17, Decimal('29.00')))
+        self.assertEqual(self._stats(self.otra)[1], 9)
+    
+    def test_resumen_endpoints(self):
+        """Test que verifica el resumen de una categoría y de todas"""
+        response = self.client.get(f'/api/categories/{self.categoria.id}/resumen/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stock_total'], 10)
+        self.assertEqual(response.data['valor_inventario'], 25.0)
+        
+        # Sin fila de estadísticas se recalcula en lugar de informar ceros
+        CategoryStats.objects.all().delete()
+        response = self.client.get('/api/categories/resumen/')
+        self.assertEqual(response.data['total_categorias'], 2)
+        por_nombre = {c['categoria_nombre']: c for c in response.data['categorias']}
+        self.assertEqual(por_nombre['Insumos']['total_productos'], 0)
+        self.assertEqual(por_nombre['Medicamentos']['total_productos'], 1)
+        self.assertEqual(por_nombre['Medicamentos']['valor_inventario'], 25.0)
+        
+        with self.assertNumQueries(1):
+            self.client.get('/api/categories/resumen/')
+    
+    def test_edicion_de_producto_aplica_deltas(self):
+        """Test que verifica que editar un producto no recalcula la categoría completa"""
+        with CaptureQueriesContext(connection) as capturadas:
+            self.producto.precio_venta = 5
+            self.producto.nombre = 'Paracetamol 1g'
+            self.producto.save()
+        self.assertFalse([q for q in capturadas.captured_queries if 'categorystats' in q['sql']])
+        
+        with CaptureQueriesContext(connection) as capturadas:
+            self.producto.costo = Decimal('3.00')
+            self.producto.stock_minimo = 20
+            self.producto.save()
+            Product.objects.create(
+                empresa=self.empresa, nombre='Ibuprofeno', categoria=self.categoria,
+                cantidad=4, stock_minimo=1, costo=1, precio_venta=2
+            )
+        self.assertFalse([q for q in capturadas.captured_queries if 'SUM(' in q['sql']])
+        self.assertEqual(self._stats(self.categoria), (2, 14, Decimal('34.00'), 1))
+        
+        CategoryStats.objects.recalcular([self.categoria.pk])
+        self.assertEqual(self._stats(self.categoria), (2, 14, Decimal('34.00'), 1))
+
+
+class ExportAPITest(APITestCase):
+    """Tests para las exportaciones en streaming"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.producto = Product.objects.create(
+            empresa=self.empresa, nombre='Paracetamol, 500mg', categoria=self.categoria,
+            cantidad=100, costo=5.00, precio_venta=10.00
+        )
+        for tipo, cantidad in [('ENTRADA', 10), ('SALIDA', 4), ('SALIDA', 1)]:
+            Movement.objects.create(
+                empresa=self.empresa, product=self.producto, movement_type=tipo,
+                quantity=cantidad, created_by=self.usuario
+            )
+        self.client.force_authenticate(self.usuario)
+    
+    def _contenido(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+    
+    def test_exportar_movimientos_csv_con_filtros(self):
+        """Test que verifica el CSV de movimientos con los filtros de auditoria"""
+        response = self.client.get('/api/movements/export/', {'tipo': 'SALIDA'})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        filas = list(csv.reader(io.StringIO(self._contenido(response))))
+        self.assertEqual(filas[0][:3], ['id', 'fecha', 'producto'])
+        self.assertEqual(len(filas), 3)
+        self.assertEqual(filas[1][3], 'Paracetamol, 500mg')
+        self.assertEqual([f[5] for f in filas[1:]], ['4', '1'])
+    
+    def test_exportar_rechaza_filtros_invalidos(self):
+        """Test que verifica el 400 por fechas o ids inválidos antes del streaming"""
+        for parametros in ({'fecha_inicio': 'xx'}, {'fecha_fin': '2026-13-01'}, {'producto_id': 'abc'}):
+            response = self.client.get('/api/movements/export/', parametros)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertFalse(response.streaming)
+        
+        hoy = timezone.localdate().isoformat()
+        response = self.client.get('/api/movements/export/', {'fecha_inicio': hoy, 'fecha_fin': hoy})
+        self.assertEqual(len(self._contenido(response).splitlines()), 1 + Movement.objects.count())
+    
+    def test_exportar_productos_ndjson(self):
+        """Test que verifica el NDJSON de productos"""
+        response = self.client.get('/api/products/export/', {'formato': 'ndjson'})
+        
+        lineas = self._contenido(response).splitlines()
+        self.assertEqual(len(lineas), 1)
+        producto = json.loads(lineas[0])
+        self.assertEqual(producto['cantidad'], 105)
+        self.assertEqual(producto['categoria_nombre'], 'Medicamentos')
+        self.assertEqual(
+            self.client.get('/api/products/export/', {'formato': 'xml'}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+class ProductImportAPITest(APITestCase):
+    """Tests para la importación masiva de productos"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.existente = Product.objects.create(
+            empresa=self.empresa, nombre='Paracetamol 500mg', categoria=self.categoria,
+            cantidad=40, costo=5.00, precio_venta=10.00
+        )
+        self.client.force_authenticate(self.usuario)
+    
+    def _importar(self, contenido, **datos):
+        archivo = SimpleUploadedFile('productos.csv', contenido.encode(), content_type='text/csv')
+        return self.client.post(
+            '/api/products/import/', {'archivo': archivo, **datos}, format='multipart'
+        )
+    
+    def test_importar_crea_actualiza_y_reporta_errores(self):
+        """Test que verifica el upsert por nombre y el reporte por fila"""
+        response = self._importar(
+            'nombre,categoria,cantidad,costo,precio_venta\n'
+            'Paracetamol 500mg,Medicamentos,999,6.00,12.00\n'
+            'Ibuprofeno 400mg,Medicamentos,25,3.00,7.50\n'
+            'Amoxicilina,Antibióticos,10,8.00,15.00\n'
+            'Sin precio,Medicamentos,5,1.00,\n'
+        )
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_filas'], 4)
+        self.assertEqual(response.data['creados'], 1)
+        self.assertEqual(response.data['actualizados'], 1)
+        self.assertEqual([e['fila'] for e in response.data['errores']], [4, 5])
+        self.assertIn('precio_venta', response.data['errores'][1]['errores'])
+        
+        self.existente.refresh_from_db()
+        # La cantidad de un producto existente solo cambia con movimientos
+        self.assertEqual(self.existente.cantidad, 40)
+        self.assertEqual(self.existente.precio_venta, Decimal('12.00'))
+        nuevo = Product.objects.get(nombre='Ibuprofeno 400mg')
+        self.assertEqual(nuevo.cantidad, 25)
+        self.assertTrue(StockCheckpoint.objects.filter(product=nuevo, cantidad=25).exists())
+        self.assertEqual(CategoryStats.objects.get(category=self.categoria).stock_total, 65)
+    
+    @override_settings(INVENTARIO_IMPORT_LOTE=1)
+    def test_importar_reporta_repetidos_y_conserva_celdas_vacias(self):
+        """Test que verifica nombres repetidos como fallidos y celdas vacías sin sobrescribir"""
+        Product.objects.filter(pk=self.existente.pk).update(proveedor='Genfar', stock_minimo=15)
+        response = self._importar(
+            'nombre,categoria,costo,precio_venta,proveedor,stock_minimo\n'
+            'Paracetamol 500mg,Medicamentos,6.00,12.00,,\n'
+            'Ibuprofeno 400mg,Medicamentos,3.00,7.50,MK,5\n'
+            'Ibuprofeno 400mg,Medicamentos,4.00,8.00,MK,5\n'
+        )
+        
+        datos = response.data
+        self.assertEqual(datos['total_filas'], datos['creados'] + datos['actualizados'] + datos['fallidos'])
+        self.assertEqual((datos['creados'], datos['actualizados'], datos['fallidos']), (1, 1, 1))
+        self.assertEqual(datos['errores'][0]['fila'], 4)
+        self.assertIn('nombre', datos['errores'][0]['errores'])
+        self.assertEqual(Product.objects.get(nombre='Ibuprofeno 400mg').costo, Decimal('3.00'))
+        
+        self.existente.refresh_from_db()
+        self.assertEqual(self.existente.costo, Decimal('6.00'))
+        self.assertEqual(self.existente.proveedor, 'Genfar')
+        self.assertEqual(self.existente.stock_minimo, 15)
+    
+    def test_importar_crea_categorias_y_valida_columnas(self):
+        """Test que verifica la creación de categorías y las columnas obligatorias"""
+        response = self._importar(
+            'nombre,categoria,costo,precio_venta\nAmoxicilina,Antibióticos,8.00,15.00\n',
+            crear_categorias='true'
+        )
+        self.assertEqual(response.data['creados'], 1)
+        self.assertTrue(Category.objects.filter(empresa=self.empresa, nombre='Antibióticos').exists())
+        
+        response = self._importar('nombre,costo\nX,1\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CursorPaginationTest(APITestCase):
+    """Tests para la paginación por cursor de los listados"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.producto = Product.objects.create(
+            empresa=self.empresa, nombre='Paracetamol 500mg', categoria=self.categoria,
+            cantidad=100, costo=5.00, precio_venta=10.00
+        )
+        creados, _ = Movement.objects.registrar_lote([
+            (i, {'producto': self.producto.id, 'tipo_movimiento': 'ENTRADA', 'cantidad': 1})
+            for i in range(5)
+        ], empresa=self.empresa)
+        # Misma fecha en todos: el desempate por id debe mantener el orden
+        Movement.objects.update(created_at=timezone.now())
+        self.ids = sorted((m.id for _, m in creados), reverse=True)
+        self.client.force_authenticate(self.usuario)
+    
+    def test_recorre_movimientos_por_cursor(self):
+        """Test que verifica next/previous sin saltos ni repeticiones"""
+        response = self.client.get('/api/movements/', {'page_size': 2})
+        vistos = [m['id'] for m in response.data['results']]
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        while response.data['next']:
+            anterior = response
+            response = self.client.get(response.data['next'])
+            vistos += [m['id'] for m in response.data['results']]
+        self.assertEqual(vistos, self.ids)
+        
+        response = self.client.get(anterior.data['next'])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(
+            [m['id'] for m in response.data['results']],
+            [m['id'] for m in anterior.data['results']]
+        )
+    
+    def test_paginacion_numerada_opcional(self):
+        """Test que verifica ?page= con count y el cursor inválido"""
+        response = self.client.get('/api/movements/', {'page': 2, 'page_size': 2})
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual([m['id'] for m in response.data['results']], self.ids[2:4])
+        self.assertEqual(
+            self.client.get('/api/movements/', {'cursor': 'xx'}).status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+    
+    def test_acciones_de_listado_paginadas_y_en_streaming(self):
+        """Test que verifica por_tipo/auditoria paginados y el modo streaming"""
+        response = self.client.get('/api/movements/por_tipo/', {'tipo': 'ENTRADA', 'page_size': 2})
+        self.assertEqual(response.data['total'], 5)
+        self.assertEqual(len(response.data['movimientos']), 2)
+        self.assertIsNotNone(response.data['next'])
+        
+        response = self.client.get('/api/movements/auditoria/', {'formato': 'ndjson'})
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 5)
+    
+    def test_conteo_en_la_misma_consulta(self):
+        """Test que verifica que count sale de la consulta de la página"""
+        paginador = ConteoVentanaPaginator(Movement.objects.order_by('-id'), 2)
+        with self.assertNumQueries(1):
+            pagina = paginador.page(2)
+            self.assertEqual(paginador.count, 5)
+            self.assertTrue(pagina.has_next())
+
+
+class QueryPlanTest(APITestCase):
+    """Tests de regresión de planes de consulta (EXPLAIN) de los endpoints principales.
+
+    Se siembran dos empresas con suficientes filas para que el planificador
+    tenga alternativas y se ejecuta `EXPLAIN` sobre cada SELECT que emite el
+    endpoint. Falla si alguna tabla de inventario se recorre completa.
+    """
+    TABLAS = ('inventario_movement', 'inventario_product', 'inventario_category')
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        otra = Empresa.objects.create(nombre='Veterinaria Test', nicho='veterinaria')
+        cls.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=cls.empresa
+        )
+        for empresa in (cls.empresa, otra):
+            categorias = Category.objects.bulk_create([
+                Category(empresa=empresa, nombre=f'Categoría {i}') for i in range(10)
+            ])
+            productos = Product.objects.bulk_create([
+                Product(
+                    empresa=empresa, nombre=f'Producto {i}', categoria=categorias[i % 10],
+                    cantidad=i % 50, stock_minimo=10, costo=1, precio_venta=2,
+                    fecha_vencimiento=date(2030, 1, 1) if i % 3 == 0 else None
+                )
+                for i in range(300)
+            ])
+            Movement.objects.bulk_create([
+                Movement(
+                    empresa=empresa, product=productos[i % 300],
+                    movement_type='ENTRADA' if i % 4 else 'SALIDA', quantity=1
+                )
+                for i in range(3000)
+            ])
+        cls.categoria = Category.objects.filter(empresa=cls.empresa).first()
+        cls.producto = Product.objects.filter(empresa=cls.empresa).first()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+    
+    def setUp(self):
+        self.client.force_authenticate(self.usuario)
+    
+    def _planes(self, url, params=None):
+        with CaptureQueriesContext(connection) as capturadas:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        planes = []
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Con tablas pequeñas Postgres prefiere Seq Scan aunque exista el índice
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            for consulta in capturadas.captured_queries:
+                sql = consulta['sql']
+                if not sql.startswith('SELECT') or not any(t in sql for t in self.TABLAS):
+                    continue
+                prefijo = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+                cursor.execute(prefijo + sql)
+                planes.append((sql, '\n'.join(str(fila[-1]) for fila in cursor.fetchall())))
+        return planes
+    
+    def assertSinRecorridoCompleto(self, url, params=None):
+        planes = self._planes(url, params)
+        self.assertTrue(planes)
+        for sql, plan in planes:
+            for linea in plan.splitlines():
+                if connection.vendor == 'postgresql':
+                    recorrido = 'Seq Scan on' in linea and any(t in linea for t in self.TABLAS)
+                else:
+                    recorrido = (
+                        linea.lstrip('-| ').startswith('SCAN ')
+                        and any(t in linea for t in self.TABLAS)
+                        and 'INDEX' not in linea
+                    )
+                self.assertFalse(recorrido, f'Recorrido completo en {url}:\n{plan}\n{sql}')
+    
+    def test_planes_de_movimientos(self):
+        """Test que verifica que los listados de movimientos usan índices"""
+        self.assertSinRecorridoCompleto('/api/movements/')
+        self.assertSinRecorridoCompleto('/api/movements/', {'producto': self.producto.id})
+        self.assertSinRecorridoCompleto('/api/movements/por_tipo/', {'tipo': 'SALIDA'})
+        self.assertSinRecorridoCompleto('/api/movements/auditoria/', {'producto_id': self.producto.id})
+    
+    def test_planes_de_productos(self):
+        """Test que verifica que los listados de productos usan índices"""
+        self.assertSinRecorridoCompleto('/api/products/')
+        self.assertSinRecorridoCompleto('/api/products/bajo_stock/')
+        self.assertSinRecorridoCompleto('/api/products/', {'vence_antes': '2031-01-01'})
+        self.assertSinRecorridoCompleto(f'/api/categories/{self.categoria.id}/productos/')
+    
+    def test_cursor_acota_el_rango_del_indice(self):
+        """Test que verifica que la página siguiente usa el cursor como rango del índice"""
+        casos = (
+            ('/api/movements/', 'inventario_movement', 'created_at', '<='),
+            ('/api/products/', 'inventario_product', 'nombre', '>='),
+        )
+        for url, tabla, columna, cota in casos:
+            siguiente = self.client.get(url, {'page_size': 5}).data['next']
+            planes = [
+                (sql, plan) for sql, plan in self._planes(siguiente)
+                if sql.startswith(f'SELECT "{tabla}".') and 'LIMIT' in sql
+            ]
+            self.assertTrue(planes)
+            for sql, plan in planes:
+                # Cota inicial explícita: no depender de que el planificador factorice el OR
+                self.assertIn(f'"{tabla}"."{columna}" {cota} ', sql)
+                if connection.vendor == 'postgresql':
+                    self.assertRegex(plan, rf'Index Cond: .*{columna}')
+                else:
+                    self.assertRegex(plan, rf'USING (COVERING )?INDEX \S+ \(empresa_id=\? AND {columna}[<>]')
+
+
+class QueryBudgetTest(APITestCase):
+    """Presupuesto de consultas por endpoint, independiente del tamaño de página.
+
+    Cada endpoint se llama con páginas de 2 y de 20 filas: si el número de
+    consultas cambia hay un N+1, y si supera el presupuesto hay una
+    regresión en la carga de relaciones declarada por el viewset.
+    """
+    # Listados y detalles con GET condicional: una consulta más para los validadores
+    PRESUPUESTOS = [
+        ('/api/movements/', 2),
+        ('/api/movements/por_tipo/', 1),
+        ('/api/movements/auditoria/', 1),
+        ('/api/products/', 2),
+        ('/api/products/bajo_stock/', 1),
+        ('/api/categories/', 2),
+        ('/api/categories/resumen/', 1),
+        ('/api/users/', 1),
+    ]
+    
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        cls.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=cls.empresa
+        )
+        for i in range(25):
+            User.objects.create_user(
+                email=f'usuario{i}@example.com', username=f'usuario{i}',
+                password='testpass123', empresa=cls.empresa
+            )
+        categorias = Category.objects.bulk_create([
+            Category(empresa=cls.empresa, nombre=f'Categoría {i}') for i in range(25)
+        ])
+        cls.categoria = categorias[0]
+        productos = Product.objects.bulk_create([
+            Product(
+                empresa=cls.empresa, nombre=f'Producto {i}', categoria=categorias[i % 2],
+                cantidad=1, stock_minimo=5, costo=1, precio_venta=2
+            )
+            for i in range(25)
+        ])
+        Movement.objects.bulk_create([
+            Movement(
+                empresa=cls.empresa, product=productos[i], movement_type='ENTRADA',
+                quantity=1, created_by=cls.usuario
+            )
+            for i in range(25)
+        ])
+        CategoryStats.objects.recalcular([c.id for c in categorias])
+    
+    def setUp(self):
+        self.client.force_authenticate(self.usuario)
+    
+    def assertPresupuesto(self, url, maximo):
+        conteos = []
+        for tamano in (2, 20):
+            with CaptureQueriesContext(connection) as capturadas:
+                response = self.client.get(url, {'page_size': tamano})
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+            conteos.append(len(capturadas))
+        consultas = '\n'.join(q['sql'] for q in capturadas.captured_queries)
+        self.assertEqual(conteos[0], conteos[1], f'{url} depende del tamaño de página:\n{consultas}')
+        self.assertLessEqual(conteos[1], maximo, f'{url} supera su presupuesto:\n{consultas}')
+    
+    def test_presupuestos_de_listados(self):
+        """Test que verifica el presupuesto de consultas de los listados"""
+        for url, maximo in self.PRESUPUESTOS:
+            with self.subTest(url=url):
+                self.assertPresupuesto(url, maximo)
+    
+    def test_presupuestos_de_detalle(self):
+        """Test que verifica el presupuesto de consultas de los detalles"""
+        self.assertPresupuesto(f'/api/categories/{self.categoria.id}/productos/', 2)
+        self.assertPresupuesto(f'/api/categories/{self.categoria.id}/resumen/', 1)
+        self.assertPresupuesto(f'/api/movements/{Movement.objects.first().id}/', 2)
+        self.assertPresupuesto(f'/api/products/{Product.objects.first().id}/', 2)
+    
+    def test_presupuesto_de_carga_masiva(self):
+        """Test que verifica que la carga masiva no hace consultas por línea"""
+        productos = list(Product.objects.filter(empresa=self.empresa).order_by('id'))
+        conteos = []
+        for lineas in (productos[:4], productos[4:12]):
+            cache.clear()
+            with CaptureQueriesContext(connection) as capturadas:
+                with self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.post('/api/movements/bulk/', {
+                        'movimientos': [
+                            {'producto': p.id, 'tipo_movimiento': 'ENTRADA', 'cantidad': 2}
+                            for p in lineas
+                        ]
+                    }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            conteos.append(len(capturadas))
+        consultas = '\n'.join(q['sql'] for q in capturadas.captured_queries)
+        self.assertEqual(conteos[0], conteos[1], f'La carga masiva depende del número de líneas:\n{consultas}')
+        self.assertEqual(
+            DailyMovementRollup.objects.filter(product__in=productos[:12]).count(), 12
+        )
+
+
+class MetricsTest(APITestCase):
+    """Tests para la instrumentación de peticiones y el endpoint de métricas"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.client.force_authenticate(self.usuario)
+    
+    def _lineas(self, texto, prefijo):
+        return [linea for linea in texto.splitlines() if linea.startswith(prefijo)]
+    
+    @override_settings(INVENTARIO_METRICAS_TOKEN='secreto')
+    def test_metricas_por_vista_y_empresa(self):
+        """Test que verifica contadores por vista/acción, histogramas y empresa"""
+        self.client.get('/api/movements/')
+        self.client.get('/api/movements/')
+        
+        self.assertEqual(self.client.get('/api/metrics/').status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer secreto')
+        texto = response.content.decode()
+        
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE inventario_http_request_duration_seconds histogram', texto)
+        prefijo = 'inventario_http_requests_total{vista="MovementViewSet.list",metodo="GET",estado="200"}'
+        self.assertTrue(any(float(l.split()[-1]) >= 2 for l in self._lineas(texto, prefijo)))
+        self.assertTrue(self._lineas(
+            texto, 'inventario_db_queries_per_request_bucket{vista="MovementViewSet.list"'
+        ))
+        self.assertTrue(self._lineas(
+            texto, f'inventario_tenant_requests_total{{empresa="{self.empresa.id}"}}'
+        ))
+    
+    def test_staff_autenticado_por_jwt(self):
+        """Test que verifica que sin token de scrape se exige un staff autenticado por JWT"""
+        self.usuario.is_staff = True
+        self.usuario.save()
+        self.client.force_authenticate(None)
+        self.client.force_login(self.usuario)
+        # La sesión de Django no basta
+        self.assertEqual(self.client.get('/api/metrics/').status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.client.logout()
+        access = self.client.post('/api/auth/token/', {
+            'email': 'test@example.com', 'password': 'testpass123'
+        }, format='json').data['access']
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        self.usuario.is_staff = False
+        self.usuario.save()
+        access = self.client.post('/api/auth/token/', {
+            'email': 'test@example.com', 'password': 'testpass123'
+        }, format='json').data['access']
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_combina_archivos_de_varios_workers(self):
+        """Test que verifica la suma de los volcados de distintos procesos"""
+        import tempfile
+        from utils.metrics import RegistroMetricas, exposicion
+        
+        with tempfile.TemporaryDirectory() as directorio, \
+                override_settings(INVENTARIO_METRICAS_DIR=directorio):
+            # Dos workers vivos simulados (uno con una petición y otro con dos) y uno muerto
+            muerto = f'{directorio}/metricas_999999.json'
+            for pid, peticiones in ((os.getppid(), 1), (1, 2)):
+                worker = RegistroMetricas()
+                for _ in range(peticiones):
+                    worker.registrar_peticion('Prueba.list', 'GET', '200', '1', 0.02, 3, 0.01, 10)
+                with open(f'{directorio}/metricas_{pid}.json', 'w') as archivo:
+                    json.dump(worker.estado(), archivo)
+            
+            with open(muerto, 'w') as archivo:
+                json.dump(worker.estado(), archivo)
+            
+            texto = exposicion()
+            self.assertFalse(os.path.exists(muerto))
+        
+        self.assertIn(
+            'inventario_http_requests_total{vista="Prueba.list",metodo="GET",estado="200"} 3', texto
+        )
+        self.assertIn('inventario_http_request_duration_seconds_count{vista="Prueba.list",metodo="GET"} 3', texto)
+
+
+@override_settings(INVENTARIO_CHECKPOINT_CADA=5)
+class DatosSinteticosTest(TestCase):
+    """Tests para el generador de datos sintéticos y el benchmark de la API"""
+    
+    def setUp(self):
+        call_command(
+            'generar_datos_sinteticos', empresas=2, categorias=3, productos=15,
+            movimientos=200, semilla=7, stdout=io.StringIO()
+        )
+        self.empresas = Empresa.objects.filter(nombre__startswith='Sintética')
+    
+    def test_datos_consistentes(self):
+        """Test que verifica stock, checkpoints, acumulados y estadísticas generados"""
+        self.assertEqual(self.empresas.count(), 2)
+        for producto in Product.objects.filter(empresa__in=self.empresas):
+            delta = sum(m.delta_stock for m in producto.movements.all())
+            self.assertEqual(producto.cantidad, delta)
+            self.assertEqual(
+                StockCheckpoint.objects.stock_en(producto, timezone.now())[0], producto.cantidad
+            )
+        
+        movimientos = Movement.objects.filter(empresa__in=self.empresas)
+        self.assertEqual(
+            DailyMovementRollup.objects.filter(empresa__in=self.empresas).aggregate(
+                total=Sum('total_movimientos')
+            )['total'],
+            movimientos.count()
+        )
+        self.assertEqual(
+            CategoryStats.objects.filter(empresa__in=self.empresas).aggregate(total=Sum('stock_total'))['total'],
+            Product.objects.filter(empresa__in=self.empresas).aggregate(total=Sum('cantidad'))['total']
+        )
+        
+        # Los ids asignados por el generador no chocan con las altas posteriores
+        producto = Product.objects.filter(empresa__in=self.empresas).first()
+        nuevo = Movement.objects.create(
+            product=producto, movement_type='ENTRADA', quantity=1,
+            created_by=User.objects.get(empresa=producto.empresa)
+        )
+        self.assertGreater(nuevo.pk, movimientos.exclude(pk=nuevo.pk).aggregate(m=Max('id'))['m'])
+    
+    def test_benchmark_sin_errores(self):
+        """Test que verifica que el benchmark recorre los escenarios sin errores"""
+        salida = io.StringIO()
+        call_command('benchmark_api', peticiones=3, calentamiento=0, json=True, stdout=salida)
+        resultado = json.loads(salida.getvalue())
+        
+        self.assertEqual(len(resultado['escenarios']), 5)
+        for escenario in resultado['escenarios']:
+            self.assertEqual(escenario['errores'], 0, escenario['escenario'])
+            self.assertLessEqual(escenario['p50_ms'], escenario['p99_ms'])
+
+
+class BenchmarkConcurrenciaTest(TransactionTestCase):
+    """Tests para el benchmark de contención sobre productos calientes
+
+    Sin transacción envolvente: las estadísticas se actualizan tras cada COMMIT.
+    """
+    
+    def test_invariantes_por_estrategia(self):
+        """Test que verifica invariantes, rechazos por stock y limpieza de datos"""
+        salida = io.StringIO()
+        call_command(
+            'benchmark_concurrencia', hilos=1, operaciones=40, productos=2, stock=10,
+            entradas=0.0, semilla=1, json=True, stdout=salida, stderr=io.StringIO()
+        )
+        resultados = json.loads(salida.getvalue())
+        
+        self.assertEqual([fila['estrategia'] for fila in resultados], ['save', 'lote', 'bloqueo_previo'])
+        for fila in resultados:
+            self.assertEqual(fila['violaciones'], [])
+            self.assertEqual(fila['ok'] + fila['rechazadas'], 40)
+            # 20 unidades de stock no alcanzan para 40 salidas de 1 a 3 unidades
+            self.assertGreater(fila['rechazadas'], 0)
+            # Las tablas derivadas también se escriben por cada movimiento aceptado
+            for modelo in (Product, Movement, CategoryStats, DailyMovementRollup):
+                self.assertIn(modelo._meta.db_table, fila['espera_por_tabla_ms'])
+        self.assertFalse(Empresa.objects.filter(nombre__startswith='Benchmark concurrencia').exists())
+    
+    def test_detecta_stock_fuera_del_libro(self):
+        """Test que verifica que un UPDATE por fuera del libro se reporta como violación"""
+        from inventario.management.commands.benchmark_concurrencia import Command
+        
+        empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        categoria = Category.objects.create(empresa=empresa, nombre='Medicamentos')
+        producto = Product.objects.create(
+            empresa=empresa, categoria=categoria, nombre='Paracetamol',
+            cantidad=10, costo=Decimal('1.00'), precio_venta=Decimal('2.00')
+        )
+        self.assertEqual(Command().verificar([producto.pk], categoria, 10, 0), [])
+        
+        Product.objects.filter(pk=producto.pk).update(cantidad=7)
+        violaciones = Command().verificar([producto.pk], categoria, 10, 0)
+        self.assertIn(f'producto {producto.pk}: cantidad 7 != libro 10', violaciones)
+
+
+class ClaimsJWTAuthenticationTest(APITestCase):
+    """Tests para la autenticación JWT basada en claims"""
+    
+    def setUp(self):
+        cache.clear()
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        response = self.client.post('/api/auth/token/', {
+            'email': 'test@example.com', 'password': 'testpass123'
+        }, format='json')
+        self.access = response.data['access']
+        self.refresh = response.data['refresh']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+    
+    def _consultas_de_usuario(self, ruta):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(ruta)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Se excluye la versión de datos del GET condicional (`Empresa.version_datos`)
+        return [
+            q['sql'] for q in consultas
+            if 'FROM "accounts_' in q['sql'] and '"ultimo_0"' not in q['sql']
+        ]
+    
+    def test_claims_en_el_token(self):
+        """Test que verifica los claims del access y del refresh"""
+        from rest_framework_simplejwt.tokens import AccessToken
+        
+        token = AccessToken(self.access)
+        self.assertEqual(token['empresa_id'], self.empresa.id)
+        self.assertFalse(token['is_superuser'])
+        self.assertEqual(token['roles'], [])
+        
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': self.refresh}, format='json')
+        self.assertEqual(AccessToken(response.data['access'])['empresa_id'], self.empresa.id)
+    
+    def test_lecturas_sin_consultas_de_autenticacion(self):
+        """Test que verifica que, con la caché caliente, las lecturas no consultan usuario ni empresa"""
+        self.assertEqual(len(self._consultas_de_usuario('/api/categories/')), 1)
+        self.assertEqual(self._consultas_de_usuario('/api/categories/'), [])
+        self.assertEqual(self._consultas_de_usuario('/api/movements/'), [])
+        
+        response = self.client.get('/api/categories/')
+        self.assertEqual(response.data['count'], 1)
+    
+    def test_escritura_con_usuario_liviano(self):
+        """Test que verifica empresa y creado_por en una escritura autenticada por claims"""
+        categoria = Category.objects.get(empresa=self.empresa)
+        producto = Product.objects.create(
+            empresa=self.empresa, categoria=categoria, nombre='Paracetamol',
+            cantidad=5, costo=Decimal('1.00'), precio_venta=Decimal('2.00')
+        )
+        response = self.client.post('/api/movements/', {
+            'producto': producto.id, 'tipo_movimiento': 'ENTRADA', 'cantidad': 3
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        movimiento = Movement.objects.get(product=producto)
+        self.assertEqual(movimiento.created_by_id, self.usuario.id)
+        self.assertEqual(movimiento.empresa_id, self.empresa.id)
+        
+        response = self.client.get('/api/users/me/')
+        self.assertEqual(response.data['email'], 'test@example.com')
+    
+    def test_revocacion(self):
+        """Test que verifica que desactivar o mover al usuario invalida sus tokens"""
+        self.assertEqual(self.client.get('/api/categories/').status_code, status.HTTP_200_OK)
+        
+        otra = Empresa.objects.create(nombre='Veterinaria Test', nicho='veterinaria')
+        self.usuario.empresa = otra
+        self.usuario.save()
+        self.assertEqual(self.client.get('/api/categories/').status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        self.usuario.empresa = self.empresa
+        self.usuario.save()
+        self.assertEqual(self.client.get('/api/categories/').status_code, status.HTTP_200_OK)
+        
+        self.usuario.is_active = False
+        self.usuario.save()
+        self.assertEqual(self.client.get('/api/categories/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class ConditionalGetTest(APITestCase):
+    """Tests para ETag / Last-Modified en listados y detalles"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.producto = Product.objects.create(
+            empresa=self.empresa, categoria=self.categoria, nombre='Paracetamol',
+            cantidad=10, costo=Decimal('1.00'), precio_venta=Decimal('2.00')
+        )
+        self.client.force_authenticate(self.usuario)
+    
+    def assertNoModificado(self, ruta, **cabeceras):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(ruta, **cabeceras)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED, ruta)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(len(consultas), 1, ruta)
+        return response
+    
+    def test_listado_sin_cambios(self):
+        """Test que verifica el 304 de los listados sin leer las filas"""
+        for ruta in ('/api/products/', '/api/categories/', '/api/movements/'):
+            response = self.client.get(ruta)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIn('no-cache', response['Cache-Control'])
+            etag = response['ETag']
+            
+            no_modificado = self.assertNoModificado(ruta, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(no_modificado['ETag'], etag)
+            self.assertNoModificado(ruta, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            # Otros filtros, otro ETag
+            self.assertNotEqual(self.client.get(ruta, {'page_size': 1})['ETag'], etag)
+    
+    def test_listado_cambia_con_altas_ediciones_y_bajas(self):
+        """Test que verifica que altas, ediciones y bajas invalidan el ETag"""
+        def etag():
+            return self.client.get('/api/products/')['ETag']
+        
+        inicial = etag()
+        otro = Product.objects.create(
+            empresa=self.empresa, categoria=self.categoria, nombre='Ibuprofeno',
+            cantidad=0, costo=Decimal('1.00'), precio_venta=Decimal('2.00')
+        )
+        tras_alta = etag()
+        self.assertNotEqual(tras_alta, inicial)
+        
+        # El listado muestra categoria_nombre: renombrar la categoría también cuenta
+        self.categoria.nombre = 'Analgésicos'
+        self.categoria.save()
+        tras_categoria = etag()
+        self.assertNotEqual(tras_categoria, tras_alta)
+        
+        Movement.objects.create(
+            empresa=self.empresa, product=self.producto, movement_type='SALIDA',
+            quantity=1, created_by=self.usuario
+        )
+        tras_movimiento = etag()
+        self.assertNotEqual(tras_movimiento, tras_categoria)
+        
+        otro.delete()
+        self.assertNotEqual(etag(), tras_movimiento)
+        
+        # Los cambios de otra empresa no invalidan el listado
+        actual = etag()
+        otra = Empresa.objects.create(nombre='Veterinaria Test', nicho='veterinaria')
+        categoria = Category.objects.create(empresa=otra, nombre='Vacunas')
+        Product.objects.create(
+            empresa=otra, categoria=categoria, nombre='Antirrábica',
+            costo=Decimal('1.00'), precio_venta=Decimal('2.00')
+        )
+        self.assertEqual(etag(), actual)
+    
+    def test_detalle(self):
+        """Test que verifica el GET condicional del detalle"""
+        ruta = f'/api/products/{self.producto.id}/'
+        response = self.client.get(ruta)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.assertNoModificado(ruta, HTTP_IF_NONE_MATCH=etag)
+        self.assertNoModificado(ruta, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        
+        # Otro producto no afecta el detalle; un movimiento sobre este sí
+        Product.objects.create(
+            empresa=self.empresa, categoria=self.categoria, nombre='Ibuprofeno',
+            costo=Decimal('1.00'), precio_venta=Decimal('2.00')
+        )
+        self.assertNoModificado(ruta, HTTP_IF_NONE_MATCH=etag)
+        self.client.post('/api/movements/', {
+            'producto': self.producto.id, 'tipo_movimiento': 'ENTRADA', 'cantidad': 5
+        }, format='json')
+        response = self.client.get(ruta, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['cantidad'], 15)
+        self.assertNotEqual(response['ETag'], etag)
+        
+        self.assertEqual(self.client.get('/api/products/999999/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/products/abc/').status_code, status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(INVENTARIO_SYNC_MARGEN=timedelta(0))
+class SyncChangesTest(APITestCase):
+    """Tests para la sincronización incremental (GET /api/sync/changes/)"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.productos = [
+            Product.objects.create(
+                empresa=self.empresa, categoria=self.categoria, nombre=f'Producto {i}',
+                cantidad=10, costo=Decimal('1.00'), precio_venta=Decimal('2.00')
+            )
+            for i in range(3)
+        ]
+        self.client.force_authenticate(self.usuario)
+    
+    def sincronizar(self, cursor=None, **params):
+        if cursor:
+            params['since'] = cursor
+        response = self.client.get('/api/sync/changes/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+    
+    def test_descarga_inicial_y_cambios(self):
+        """Test que verifica que solo se devuelve lo cambiado desde el cursor"""
+        datos = self.sincronizar()
+        self.assertEqual(len(datos['productos']), 3)
+        self.assertEqual(len(datos['categorias']), 1)
+        self.assertFalse(datos['hay_mas'])
+        self.assertFalse(datos['resincronizar'])
+        
+        vacio = self.sincronizar(datos['cursor'])
+        self.assertEqual(vacio['productos'], [])
+        self.assertEqual(vacio['categorias'], [])
+        self.assertEqual(vacio['movimientos'], [])
+        
+        # Una salida cambia el stock del producto y crea el movimiento
+        Movement.objects.create(
+            empresa=self.empresa, product=self.productos[1], movement_type='SALIDA',
+            quantity=4, created_by=self.usuario
+        )
+        self.categoria.is_active = False
+        self.categoria.save()
+        # Los cambios de otra empresa no se sincronizan
+        otra = Empresa.objects.create(nombre='Veterinaria Test', nicho='veterinaria')
+        Category.objects.create(empresa=otra, nombre='Vacunas')
+        
+        cambios = self.sincronizar(vacio['cursor'])
+        self.assertEqual([p['id'] for p in cambios['productos']], [self.productos[1].id])
+        self.assertEqual(cambios['productos'][0]['cantidad'], 6)
+        self.assertEqual(len(cambios['movimientos']), 1)
+        self.assertFalse(cambios['categorias'][0]['is_active'])
+        self.assertEqual(self.sincronizar(cambios['cursor'])['productos'], [])
+    
+    def test_paginado_por_limite(self):
+        """Test que verifica el recorrido por páginas con hay_mas"""
+        vistos = []
+        cursor = None
+        while True:
+            datos = self.sincronizar(cursor, limite=2, recursos='productos')
+            self.assertNotIn('categorias', datos)
+            vistos += [p['id'] for p in datos['productos']]
+            cursor = datos['cursor']
+            if not datos['hay_mas']:
+                break
+        self.assertEqual(vistos, [p.id for p in self.productos])
+    
+    def test_bajas_y_margen(self):
+        """Test que verifica resincronizar tras una baja y el corte por margen"""
+        cursor = self.sincronizar()['cursor']
+        self.productos[0].delete()
+        self.assertTrue(self.sincronizar(cursor)['resincronizar'])
+        
+        with override_settings(INVENTARIO_SYNC_MARGEN=timedelta(minutes=5)):
+            datos = self.sincronizar(recursos='productos')
+        # Filas más recientes que el corte quedan para la siguiente sincronización
+        self.assertEqual(datos['productos'], [])
+    
+    def test_parametros_invalidos(self):
+        """Test que verifica los errores de cursor y recursos"""
+        response = self.client.get('/api/sync/changes/', {'since': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/sync/changes/', {'recursos': 'usuarios'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StockStreamTest(TestCase):
+    """Tests para el stream de cambios de stock (GET /api/stream/stock/)"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.producto = Product.objects.create(
+            empresa=self.empresa, categoria=categoria, nombre='Paracetamol',
+            cantidad=10, stock_minimo=5, costo=Decimal('1.00'), precio_venta=Decimal('2.00')
+        )
+        self.token = str(CustomTokenObtainPairSerializer.get_token(self.usuario).access_token)
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+    
+    def suscribir(self, broker):
+        async def suscribir():
+            return broker.suscribir(self.empresa.id)
+        suscripcion = self.loop.run_until_complete(suscribir())
+        self.addCleanup(broker.cancelar, suscripcion)
+        return suscripcion
+    
+    def recibir(self, suscripcion):
+        return self.loop.run_until_complete(asyncio.wait_for(suscripcion.cola.get(), 2))
+    
+    def test_publica_al_confirmar(self):
+        """Test que verifica los eventos de movimientos y lotes confirmados"""
+        from inventario.stream import broker
+        
+        suscripcion = self.suscribir(broker)
+        with self.captureOnCommitCallbacks(execute=True):
+            Movement.objects.create(
+                empresa=self.empresa, product=self.producto, movement_type='SALIDA',
+                quantity=6, created_by=self.usuario
+            )
+        self.assertEqual(self.recibir(suscripcion), [
+            {'producto': self.producto.id, 'cantidad': 4, 'bajo_stock': True}
+        ])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Movement.objects.registrar_lote([
+                (0, {'producto': self.producto.id, 'tipo_movimiento': 'ENTRADA', 'cantidad': 3}),
+                (1, {'producto': self.producto.id, 'tipo_movimiento': 'ENTRADA', 'cantidad': 3}),
+            ], empresa=self.empresa, usuario=self.usuario)
+        self.assertEqual(self.recibir(suscripcion), [
+            {'producto': self.producto.id, 'cantidad': 10, 'bajo_stock': False}
+        ])
+        
+        # Sin COMMIT no se publica nada
+        with self.captureOnCommitCallbacks(execute=False) as pendientes:
+            Movement.objects.create(
+                empresa=self.empresa, product=self.producto, movement_type='ENTRADA',
+                quantity=1, created_by=self.usuario
+            )
+        self.assertTrue(pendientes)
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.assertTrue(suscripcion.cola.empty())
+    
+    def test_reparto_entre_workers(self):
+        """Test que verifica el reenvío de eventos a otro worker por el directorio compartido"""
+        import tempfile
+        from inventario.stream import BrokerStock
+        
+        with tempfile.TemporaryDirectory() as directorio, \
+                override_settings(INVENTARIO_STREAM_DIR=directorio):
+            # Dos workers simulados: uno con la conexión abierta y otro que publica
+            receptor = BrokerStock()
+            emisor = BrokerStock()
+            suscripcion = self.suscribir(receptor)
+            self.addCleanup(receptor.cerrar)
+            
+            emisor.publicar(self.empresa.id, [{'producto': 1, 'cantidad': 3, 'bajo_stock': True}])
+            emisor.publicar(self.empresa.id + 1, [{'producto': 2, 'cantidad': 3, 'bajo_stock': True}])
+            self.assertEqual(self.recibir(suscripcion), [{'producto': 1, 'cantidad': 3, 'bajo_stock': True}])
+            
+            receptor.cerrar()
+            self.assertEqual(os.listdir(directorio), [])
+    
+    async def test_vista_sse(self):
+        """Test que verifica la conexión SSE con el token en la URL"""
+        from inventario.stream import broker
+        
+        response = await self.async_client.get('/api/stream/stock/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        response = await self.async_client.get('/api/stream/stock/', {'token': self.token})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        
+        eventos = response.streaming_content
+        self.assertTrue((await anext(eventos)).startswith(b'retry:'))
+        broker.publicar(self.empresa.id, [{'producto': self.producto.id, 'cantidad': 7, 'bajo_stock': False}])
+        self.assertEqual(
+            await anext(eventos),
+            f'event: stock\ndata: [{{"producto":{self.producto.id},"cantidad":7,"bajo_stock":false}}]\n\n'.encode()
+        )
+        # El servidor ASGI cancela la lectura cuando el cliente se desconecta
+        lectura = asyncio.ensure_future(anext(eventos))
+        await asyncio.sleep(0)
+        lectura.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await lectura
+        self.assertEqual(broker.total_suscripciones(), 0)
+
+
+class ProductSearchTest(APITestCase):
+    """Tests para la búsqueda indexada de productos (?search=)"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        for nombre, proveedor in [
+            ('Ibuprofeno 400mg', 'Genfar'),
+            ('Acetaminofén jarabe', 'MK'),
+            ('Algodón estéril', 'Pañalín'),
+        ]:
+            self.crear_producto(self.empresa, self.categoria, nombre, proveedor)
+        self.client.force_authenticate(self.usuario)
+    
+    @staticmethod
+    def crear_producto(empresa, categoria, nombre, proveedor=''):
+        return Product.objects.create(
+            empresa=empresa, categoria=categoria, nombre=nombre, proveedor=proveedor,
+            costo=Decimal('1.00'), precio_venta=Decimal('2.00')
+        )
+    
+    def buscar(self, termino, **params):
+        response = self.client.get('/api/products/', {'search': termino, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [p['nombre'] for p in response.data['results']]
+    
+    def test_sin_acentos_y_por_prefijo(self):
+        """Test que verifica que se ignoran acentos y mayúsculas y se busca por prefijo"""
+        self.assertEqual(self.buscar('acetaminofen'), ['Acetaminofén jarabe'])
+        self.assertEqual(self.buscar('ALGODON'), ['Algodón estéril'])
+        self.assertEqual(self.buscar('ibupro'), ['Ibuprofeno 400mg'])
+        self.assertEqual(self.buscar('ibupro 400'), ['Ibuprofeno 400mg'])
+        self.assertEqual(self.buscar('ibupro jarabe'), [])
+    
+    def test_busca_en_proveedor(self):
+        """Test que verifica la búsqueda por proveedor"""
+        self.assertEqual(self.buscar('panalin'), ['Algodón estéril'])
+        self.assertEqual(self.buscar('genfar'), ['Ibuprofeno 400mg'])
+    
+    def test_aislamiento_por_empresa(self):
+        """Test que verifica que la búsqueda no devuelve productos de otra empresa"""
+        otra = Empresa.objects.create(nombre='Otra', nicho='farmacia')
+        self.crear_producto(otra, Category.objects.create(empresa=otra, nombre='Otra'), 'Ibuprofeno 800mg')
+        self.assertEqual(self.buscar('ibuprofeno'), ['Ibuprofeno 400mg'])
+    
+    def test_indice_sigue_cambios(self):
+        """Test que verifica que el índice refleja ediciones y bajas"""
+        producto = Product.objects.get(nombre='Ibuprofeno 400mg')
+        producto.nombre = 'Naproxeno 250mg'
+        producto.save()
+        self.assertEqual(self.buscar('ibuprofeno'), [])
+        self.assertEqual(self.buscar('naproxeno'), ['Naproxeno 250mg'])
+        
+        producto.delete()
+        self.assertEqual(self.buscar('naproxeno'), [])
+    
+    def test_orden_por_relevancia(self):
+        """Test que verifica el orden por relevancia y los términos con comillas"""
+        self.crear_producto(self.empresa, self.categoria, 'Jarabe para la tos', 'Jarabes SA')
+        self.assertEqual(
+            self.buscar('jarabe', ordering='-relevancia'),
+            ['Jarabe para la tos', 'Acetaminofén jarabe']
+        )
+        self.assertEqual(self.buscar('"jarabe'), ['Jarabe para la tos', 'Acetaminofén jarabe'])
+        self.assertEqual(self.buscar('jarabe', ordering='nombre'), ['Acetaminofén jarabe', 'Jarabe para la tos'])
+        response = self.client.get('/api/products/', {'ordering': '-relevancia'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 4)
+    
+    def test_cursor_por_relevancia(self):
+        """Test que verifica que la búsqueda pagina por cursor en orden de relevancia"""
+        for i in range(3):
+            self.crear_producto(self.empresa, self.categoria, f'Jarabe {i}', 'Jarabes SA')
+        esperado = self.buscar('jarabe', page_size=10)
+        self.assertEqual(esperado[-1], 'Acetaminofén jarabe')
+        
+        nombres = []
+        response = self.client.get('/api/products/', {'search': 'jarabe', 'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            nombres += [p['nombre'] for p in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(nombres, esperado)
+        
+        response = self.client.get('/api/products/', {'search': 'jarabe', 'ordering': '-relevancia'})
+        self.assertNotIn('count', response.data)
+        self.assertEqual([p['nombre'] for p in response.data['results']], esperado)
+
+
+class CamposExtraFilterTest(APITestCase):
+    """Tests para los filtros sobre campos_extra (?extra__<clave>=)"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        for nombre, extra in [
+            ('Dolex', {'principio_activo': 'paracetamol', 'concentracion': 500}),
+            ('Advil', {'principio_activo': 'ibuprofeno', 'venta_libre': True}),
+            ('Gasas', {}),
+        ]:
+            Product.objects.create(
+                empresa=self.empresa, categoria=self.categoria, nombre=nombre, campos_extra=extra,
+                costo=Decimal('1.00'), precio_venta=Decimal('2.00')
+            )
+        self.client.force_authenticate(self.usuario)
+    
+    def filtrar(self, params, esperado_status=status.HTTP_200_OK):
+        response = self.client.get('/api/products/', params)
+        self.assertEqual(response.status_code, esperado_status)
+        return [p['nombre'] for p in response.data['results']] if esperado_status == 200 else response.data
+    
+    def test_igualdad_por_clave(self):
+        """Test que verifica el filtro por valor de una clave"""
+        self.assertEqual(self.filtrar({'extra__principio_activo': 'paracetamol'}), ['Dolex'])
+        self.assertEqual(self.filtrar({'extra__concentracion': '500'}), ['Dolex'])
+        self.assertEqual(self.filtrar({'extra__principio_activo': 'otro'}), [])
+        # Claves con `__` u otros caracteres no son filtros de campos_extra
+        self.assertEqual(len(self.filtrar({'extra__a-b': 'x'})), 3)
+    
+    def test_existencia_de_clave(self):
+        """Test que verifica el filtro por existencia de una clave"""
+        self.assertEqual(self.filtrar({'extra__principio_activo__exists': 'true'}), ['Advil', 'Dolex'])
+        self.assertEqual(self.filtrar({'extra__venta_libre__exists': 'false'}), ['Dolex', 'Gasas'])
+    
+    def test_contiene(self):
+        """Test que verifica el filtro por contención de un objeto JSON"""
+        self.assertEqual(
+            self.filtrar({'extra__contains': '{"principio_activo": "ibuprofeno", "venta_libre": true}'}),
+            ['Advil']
+        )
+        self.assertEqual(self.filtrar({'extra__contains': '{"venta_libre": false}'}), [])
+        errores = self.filtrar({'extra__contains': '[1]'}, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('extra__contains', errores)
+    
+    def test_indices_de_claves_declaradas(self):
+        """Test que verifica que las claves declaradas por nicho tienen índice y se usa"""
+        with connection.cursor() as cursor:
+            indices = connection.introspection.get_constraints(cursor, Product._meta.db_table)
+        self.assertIn('producto_extra_principio_activo_idx', indices)
+        self.assertIn('producto_extra_especie_idx', indices)
+        
+        with override_settings(INVENTARIO_CAMPOS_EXTRA_INDEXADOS={'farmacia': ['principio_activo', 'registro']}):
+            salida = io.StringIO()
+            call_command('indexar_campos_extra', stdout=salida)
+            self.assertIn('+ producto_extra_registro_idx', salida.getvalue())
+            self.assertIn('- producto_extra_especie_idx', salida.getvalue())
+            self.assertEqual(Product.objects.sincronizar_indices_extra(aplicar=False), ([], []))
+        Product.objects.sincronizar_indices_extra()
+        
+        Product.objects.bulk_create([
+            Product(
+                empresa=self.empresa, categoria=self.categoria, nombre=f'Producto {i}',
+                campos_extra={'principio_activo': f'sustancia {i}'}, costo=1, precio_venta=2
+            )
+            for i in range(300)
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        with CaptureQueriesContext(connection) as capturadas:
+            self.assertEqual(self.filtrar({'extra__principio_activo': 'paracetamol'}), ['Dolex'])
+        sql = next(q['sql'] for q in capturadas.captured_queries if 'principio_activo' in q['sql'])
+        with connection.cursor() as cursor:
+            cursor.execute(('EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN ') + sql)
+            plan = ' '.join(str(fila[-1]) for fila in cursor.fetchall())
+        self.assertIn('producto_extra_principio_activo_idx', plan)
+
+
+class ProductAutocompleteTest(APITestCase):
+    """Tests para las sugerencias por prefijo (GET /api/products/autocomplete/)"""
+    
+    def setUp(self):
+        from inventario.autocomplete import autocompletado
+        self.autocompletado = autocompletado
+        autocompletado.invalidar()
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.productos = {
+            nombre: self.crear_producto(self.empresa, nombre)
+            for nombre in ['Ibuprofeno 400mg', 'Ibuprofeno 800mg', 'Acetaminofén jarabe', 'Algodón']
+        }
+        self.client.force_authenticate(self.usuario)
+    
+    def crear_producto(self, empresa, nombre, categoria=None):
+        return Product.objects.create(
+            empresa=empresa, categoria=categoria or self.categoria, nombre=nombre,
+            costo=Decimal('1.00'), precio_venta=Decimal('2.00')
+        )
+    
+    def sugerir(self, q, **params):
+        response = self.client.get('/api/products/autocomplete/', {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [p['nombre'] for p in response.data['resultados']]
+    
+    def test_prefijo_de_nombre_y_palabras(self):
+        """Test que verifica las sugerencias por prefijo sin acentos, también por palabra"""
+        self.assertEqual(self.sugerir('ibu'), ['Ibuprofeno 400mg', 'Ibuprofeno 800mg'])
+        self.assertEqual(self.sugerir('IBUPROFENO 8'), ['Ibuprofeno 800mg'])
+        self.assertEqual(self.sugerir('aceta'), ['Acetaminofén jarabe'])
+        self.assertEqual(self.sugerir('jara'), ['Acetaminofén jarabe'])
+        self.assertEqual(self.sugerir('algodon'), ['Algodón'])
+        self.assertEqual(self.sugerir('ibu', limite=1), ['Ibuprofeno 400mg'])
+        self.assertEqual(self.sugerir(''), [])
+        response = self.client.get('/api/products/autocomplete/', {'q': 'ibu', 'limite': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_aislamiento_por_empresa(self):
+        """Test que verifica que cada empresa solo ve sus productos"""
+        otra = Empresa.objects.create(nombre='Otra', nicho='farmacia')
+        self.crear_producto(otra, 'Ibuprofeno gotas', Category.objects.create(empresa=otra, nombre='Otra'))
+        self.assertEqual(self.sugerir('ibuprofeno g'), [])
+    
+    def test_cambios_incrementales(self):
+        """Test que verifica que altas, renombres, desactivaciones y bajas se reflejan"""
+        self.assertEqual(self.sugerir('ibu'), ['Ibuprofeno 400mg', 'Ibuprofeno 800mg'])
+        indice = self.autocompletado.indices[self.empresa.id]
+        
+        self.crear_producto(self.empresa, 'Ibuprofeno 200mg')
+        producto = self.productos['Ibuprofeno 800mg']
+        producto.nombre = 'Naproxeno 250mg'
+        producto.save()
+        self.productos['Ibuprofeno 400mg'].is_active = False
+        self.productos['Ibuprofeno 400mg'].save()
+        self.assertEqual(self.sugerir('ibu'), ['Ibuprofeno 200mg'])
+        self.assertEqual(self.sugerir('napro'), ['Naproxeno 250mg'])
+        self.assertIs(self.autocompletado.indices[self.empresa.id], indice)
+        
+        self.productos['Algodón'].delete()
+        self.assertEqual(self.sugerir('algo'), [])
+        self.assertIs(self.autocompletado.indices[self.empresa.id], indice)
+        self.assertNotIn(self.productos['Algodón'].pk, indice.productos)
+    
+    @override_settings(INVENTARIO_SYNC_MARGEN=timedelta(0))
+    def test_bajas_de_movimientos_no_tocan_el_indice(self):
+        """Test que verifica que borrar un movimiento no invalida el índice"""
+        producto = self.productos['Ibuprofeno 400mg']
+        movimiento = Movement.objects.create(
+            empresa=self.empresa, product=producto, movement_type='ENTRADA',
+            quantity=1, created_by=self.usuario
+        )
+        self.sugerir('ibu')
+        indice = self.autocompletado.indices[self.empresa.id]
+        
+        movimiento.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.sugerir('ibu'), ['Ibuprofeno 400mg', 'Ibuprofeno 800mg'])
+        self.assertIs(self.autocompletado.indices[self.empresa.id], indice)
+    
+    @override_settings(INVENTARIO_SYNC_MARGEN=timedelta(0))
+    def test_una_consulta_con_indice_al_dia(self):
+        """Test que verifica que una sugerencia con el índice al día cuesta una consulta"""
+        self.sugerir('ibu')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.sugerir('ibu'), ['Ibuprofeno 400mg', 'Ibuprofeno 800mg'])
+    
+    def test_expulsion_lru(self):
+        """Test que verifica que se respeta el límite de memoria expulsando la empresa menos usada"""
+        otra = Empresa.objects.create(nombre='Otra', nicho='farmacia')
+        categoria = Category.objects.create(empresa=otra, nombre='Otra')
+        for i in range(4):
+            self.crear_producto(otra, f'Producto {i}', categoria)
+        
+        with override_settings(INVENTARIO_AUTOCOMPLETE_MAX_ENTRADAS=10):
+            self.sugerir('ibu')
+            self.assertEqual(self.autocompletado.buscar(otra.id, 'prod', 10)[0]['nombre'], 'Producto 0')
+            self.assertEqual(list(self.autocompletado.indices), [otra.id])
+            self.assertLessEqual(self.autocompletado.total_entradas(), 10)
+            self.assertEqual(self.sugerir('ibu'), ['Ibuprofeno 400mg', 'Ibuprofeno 800mg'])
+            self.assertEqual(list(self.autocompletado.indices), [self.empresa.id])
+
+
+class MovementScanAPITest(APITestCase):
+    """Tests para el registro de movimientos por código (POST /api/movements/scan/)"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.producto = Product.objects.create(
+            empresa=self.empresa, nombre='Paracetamol 500mg', codigo='7701234567890',
+            categoria=self.categoria, cantidad=10, stock_minimo=9, costo=5.00, precio_venta=10.00
+        )
+        self.client.force_authenticate(self.usuario)
+        self.url = '/api/movements/scan/'
+    
+    def test_codigo_unico_por_empresa(self):
+        """Test que verifica la unicidad del código por empresa y que vacío equivale a sin código"""
+        with self.assertRaises(ValidationError):
+            Product.objects.create(
+                empresa=self.empresa, nombre='Otro', codigo='7701234567890',
+                categoria=self.categoria, costo=1, precio_venta=2
+            )
+        for nombre in ('Sin código 1', 'Sin código 2'):
+            producto = Product.objects.create(
+                empresa=self.empresa, nombre=nombre, codigo=' ',
+                categoria=self.categoria, costo=1, precio_venta=2
+            )
+            self.assertIsNone(producto.codigo)
+        otra = Empresa.objects.create(nombre='Otra', nicho='farmacia')
+        Product.objects.create(
+            empresa=otra, nombre='Paracetamol', codigo='7701234567890',
+            categoria=Category.objects.create(empresa=otra, nombre='Otra'), costo=1, precio_venta=2
+        )
+        response = self.client.post('/api/products/', {
+            'nombre': 'Duplicado', 'codigo': '7701234567890', 'categoria': self.categoria.id,
+            'costo': '1.00', 'precio_venta': '2.00'
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_escaneo_registra_salida(self):
+        """Test que verifica que un escaneo registra la salida y devuelve el stock"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {'codigo': '7701234567890', 'cantidad': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['producto'], self.producto.id)
+        self.assertEqual(response.data['tipo_movimiento'], 'SALIDA')
+        self.assertEqual(response.data['stock'], 8)
+        
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.cantidad, 8)
+        movimiento = Movement.objects.get(pk=response.data['id'])
+        self.assertEqual(movimiento.created_by, self.usuario)
+        self.assertEqual(CategoryStats.objects.get(category=self.categoria).productos_bajo_stock, 1)
+    
+    def test_errores(self):
+        """Test que verifica código desconocido, de otra empresa y stock insuficiente"""
+        otra = Empresa.objects.create(nombre='Otra', nicho='farmacia')
+        Product.objects.create(
+            empresa=otra, nombre='Ajeno', codigo='111',
+            categoria=Category.objects.create(empresa=otra, nombre='Otra'), costo=1, precio_venta=2
+        )
+        for codigo in ('000', '111'):
+            response = self.client.post(self.url, {'codigo': codigo}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        
+        response = self.client.post(self.url, {'codigo': '7701234567890', 'cantidad': 11}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('cantidad', response.data)
+        self.assertEqual(Movement.objects.count(), 0)
+    
+    def test_idempotencia(self):
+        """Test que verifica que un reintento con la misma Idempotency-Key no duplica la salida"""
+        for _ in range(2):
+            response = self.client.post(
+                self.url, {'codigo': '7701234567890'}, format='json', HTTP_IDEMPOTENCY_KEY='caja-1-42'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Movement.objects.count(), 1)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.cantidad, 9)
+
+
+class MovementCheckoutAPITest(APITestCase):
+    """Tests para las ventas de varias líneas (POST /api/movements/checkout/)"""
+    
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre='Farmacia Test', nicho='farmacia')
+        self.usuario = User.objects.create_user(
+            email='test@example.com',
+            username='testuser',
+            password='testpass123',
+            empresa=self.empresa
+        )
+        self.categoria = Category.objects.create(empresa=self.empresa, nombre='Medicamentos')
+        self.productos = [
+            Product.objects.create(
+                empresa=self.empresa, nombre=f'Producto {i}', codigo=f'770{i}',
+                categoria=self.categoria, cantidad=5, costo=1, precio_venta=2
+            )
+            for i in range(3)
+        ]
+        self.client.force_authenticate(self.usuario)
+        self.url = '/api/movements/checkout/'
+    
+    def test_venta_completa(self):
+        """Test que verifica que todas las líneas se registran como SALIDA con la misma referencia"""
+        a, b, c = self.productos
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(self.url, {'lineas': [
+                {'producto': c.id, 'cantidad': 2},
+                {'codigo': '7700'},
+                {'producto': c.id, 'cantidad': 3},
+                {'codigo': '7701', 'cantidad': 4},
+            ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([m['indice'] for m in response.data['movimientos']], [0, 1, 2, 3])
+        self.assertEqual(
+            response.data['stock'],
+            [{'producto': a.id, 'cantidad': 4}, {'producto': b.id, 'cantidad': 1}, {'producto': c.id, 'cantidad': 0}]
+        )
+        
+        referencia = response.data['referencia']
+        self.assertTrue(referencia.startswith('VENTA-'))
+        movimientos = Movement.objects.filter(referencia=referencia)
+        self.assertEqual(movimientos.count(), 4)
+        self.assertEqual(set(movimientos.values_list('movement_type', flat=True)), {'SALIDA'})
+        self.assertEqual(CategoryStats.objects.get(category=self.categoria).stock_total, 5)
+    
+    def test_todo_o_nada(self):
+        """Test que verifica que el stock se valida sobre el total por producto y nada se escribe si falla"""
+        a, b, _ = self.productos
+        response = self.client.post(self.url, {'referencia': 'T-1', 'lineas': [
+            {'producto': a.id, 'cantidad': 1},
+            {'producto': b.id, 'cantidad': 3},
+            {'producto': b.id, 'cantidad': 3},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([e['indice'] for e in response.data['errores']], [1, 2])
+        
+        response = self.client.post(self.url, {'lineas': [
+            {'producto': a.id}, {'codigo': 'no-existe'}, {'producto': a.id, 'codigo': '7700'}, {'cantidad': 0},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([e['indice'] for e in response.data['errores']], [1, 2, 3])
+        
+        self.assertEqual(Movement.objects.count(), 0)
+        self.assertEqual(list(Product.objects.values_list('cantidad', flat=True)), [5, 5, 5])
+    
+    def test_bloqueo_en_orden_de_id(self):
+        """Test que verifica que los productos se bloquean una vez, en orden ascendente de id"""
+        a, b, c = self.productos
+        with CaptureQueriesContext(connection) as capturadas:
+            response = self.client.post(self.url, {'lineas': [
+                {'producto': c.id}, {'producto': a.id}, {'producto': b.id}, {'producto': a.id},
+            ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        lecturas = [
+            q['sql'] for q in capturadas.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "inventario_product"' in q['sql']
+        ]
+        self.assertEqual(len(lecturas), 1)
+        self.assertIn('ORDER BY "inventario_product"."id" ASC', lecturas[0])
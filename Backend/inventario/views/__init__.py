@@ -1,9 +1,11 @@
 from .category import CategoryViewSet
 from .product import ProductViewSet
 from .movement import MovementViewSet
+from .sync import SyncViewSet
 
 __all__ = [
     'CategoryViewSet',
     'ProductViewSet',
     'MovementViewSet',
+    'SyncViewSet',
 ]
@@ -4,13 +4,18 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db import models
 
+from inventario.exports import COLUMNAS_PRODUCTOS
 from inventario.models.category import Category
+from inventario.models.category_stats import CategoryStats
+from inventario.pagination import ProductPagination
 from inventario.serializers import CategorySerializer, ProductSerializer
+from inventario.views.mixins import ConditionalGetMixin, ListadoAccionMixin
+from utils.mixins import RelacionesPorAccionMixin
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, ListadoAccionMixin, RelacionesPorAccionMixin,
+                      viewsets.ModelViewSet):
     """
     ViewSet para gestionar categorías de productos.
     
@@ -21,9 +26,14 @@ class CategoryViewSet(viewsets.ModelViewSet):
     - PUT /api/categories/{id}/ - Actualizar categoría
     - PATCH /api/categories/{id}/ - Actualizar parcialmente
     - DELETE /api/categories/{id}/ - Eliminar categoría
+    - GET /api/categories/resumen/ - Resumen de todas las categorías
     - GET /api/categories/{id}/productos/ - Productos de la categoría
+    - GET /api/categories/{id}/resumen/ - Resumen de la categoría
     - POST /api/categories/{id}/desactivar/ - Desactivar categoría
     - POST /api/categories/{id}/activar/ - Activar categoría
+    
+    Listado y detalle responden 304 a `If-None-Match` / `If-Modified-Since`
+    si nada cambió.
     """
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
@@ -33,63 +43,95 @@ class CategoryViewSet(viewsets.ModelViewSet):
     search_fields = ['nombre', 'descripcion']
     ordering_fields = ['nombre', 'created_at']
     ordering = ['nombre']
+    relaciones_por_accion = {
+        'resumen': ('stats',),
+        'resumen_general': ('stats',),
+    }
+    relaciones_version = ('empresa',)
     
     def get_queryset(self):
         """Filtrar categorías por empresa del usuario autenticado"""
         queryset = super().get_queryset()
         if self.request.user.is_authenticated and not self.request.user.is_superuser:
-            if self.request.user.empresa:
-                queryset = queryset.filter(empresa=self.request.user.empresa)
+            if self.request.user.empresa_id:
+                queryset = queryset.filter(empresa_id=self.request.user.empresa_id)
         return queryset
     
     def perform_create(self, serializer):
         """Asignar la empresa del usuario al crear categoría"""
-        if self.request.user.empresa:
-            serializer.save(empresa=self.request.user.empresa)
+        if self.request.user.empresa_id:
+            serializer.save(empresa_id=self.request.user.empresa_id)
         else:
             serializer.save()
     
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
     def productos(self, request, pk=None):
-        """Obtener todos los productos de esta categoría"""
+        """
+        Obtener los productos de esta categoría (paginado por nombre).
+        Con formato=csv|ndjson devuelve el listado completo en streaming.
+        """
         categoria = self.get_object()
-        productos = categoria.products.all()
-        
-        serializer = ProductSerializer(productos, many=True)
         
-        return Response({
+        return self.respuesta_listado(
+            categoria.products.select_related('categoria', 'empresa'),
+            'productos', ProductSerializer, COLUMNAS_PRODUCTOS,
+            f'categoria_{categoria.id}_productos',
+            clave_total='total_productos',
+            extra={'categoria_id': categoria.id, 'categoria_nombre': categoria.nombre},
+            pagination_class=ProductPagination
+        )
+    
+    @staticmethod
+    def _datos_resumen(categoria, stats):
+        return {
             'categoria_id': categoria.id,
             'categoria_nombre': categoria.nombre,
-            'total_productos': productos.count(),
-            'productos': serializer.data
-        })
-    
+            'total_productos': stats.total_productos,
+            'stock_total': stats.stock_total,
+            'valor_inventario': float(stats.valor_inventario),
+            'productos_bajo_stock': stats.productos_bajo_stock,
+            'campos_extra': categoria.campos_extra,
+            'is_active': categoria.is_active
+        }
+
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
     def resumen(self, request, pk=None):
-        """Obtener resumen de la categoría (cantidad de productos, stock total, etc.)"""
+        """Obtener resumen de la categoría (cantidad de productos, stock total, etc.)
+
+        Lee la fila materializada de `CategoryStats` en lugar de recorrer
+        los productos.
+        """
         categoria = self.get_object()
-        productos = categoria.products.all()
-        
-        stock_total = sum(p.cantidad for p in productos)
-        valor_inventario = sum(
-            float(p.cantidad) * float(p.costo) 
-            for p in productos if p.costo
-        )
-        productos_bajo_stock = productos.filter(
-            cantidad__lt=models.F('stock_minimo')
-        ).count()
-        
+        try:
+            stats = categoria.stats
+        except CategoryStats.DoesNotExist:
+            stats = CategoryStats.objects.para(categoria)
+        return Response(self._datos_resumen(categoria, stats))
+
+    @action(detail=False, methods=['get'], url_path='resumen', permission_classes=[IsAuthenticated])
+    def resumen_general(self, request):
+        """Resumen de todas las categorías de la empresa en una sola consulta
+
+        Las categorías sin fila de estadísticas (anteriores a la tabla o
+        creadas por cargas que no la mantienen) se recalculan juntas.
+        """
+        categorias = list(self.filter_queryset(self.get_queryset()))
+        stats = {}
+        for categoria in categorias:
+            try:
+                stats[categoria.pk] = categoria.stats
+            except CategoryStats.DoesNotExist:
+                pass
+        faltantes = [categoria.pk for categoria in categorias if categoria.pk not in stats]
+        if faltantes:
+            CategoryStats.objects.recalcular(faltantes)
+            stats.update(CategoryStats.objects.in_bulk(faltantes))
+        datos = [self._datos_resumen(categoria, stats[categoria.pk]) for categoria in categorias]
         return Response({
-            'categoria_id': categoria.id,
-            'categoria_nombre': categoria.nombre,
-            'total_productos': productos.count(),
-            'stock_total': stock_total,
-            'valor_inventario': float(valor_inventario),
-            'productos_bajo_stock': productos_bajo_stock,
-            'campos_extra': categoria.campos_extra,
-            'is_active': categoria.is_active
+            'total_categorias': len(datos),
+            'categorias': datos
         })
-    
+
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def desactivar(self, request, pk=None):
         """Desactivar categoría"""
@@ -0,0 +1,199 @@
+import hashlib
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from accounts.models import Empresa
+from inventario.exports import FORMATOS, respuesta_exportacion
+from inventario.models.idempotency import IdempotencyKey
+
+
+class IdempotentCreateMixin:
+    """Soporte de la cabecera `Idempotency-Key` en operaciones de creación.
+
+    La primera petición con una clave se ejecuta normalmente y, si responde
+    con éxito, su respuesta se guarda en la misma transacción que la
+    creación. Los reintentos con la misma clave devuelven la respuesta
+    guardada (con la cabecera `Idempotent-Replayed: true`) sin volver a
+    ejecutar la operación. Reutilizar la clave en otra ruta o con otro
+    cuerpo devuelve 422.
+    """
+    idempotency_header = 'HTTP_IDEMPOTENCY_KEY'
+
+    def create(self, request, *args, **kwargs):
+        parent = super()
+        return self.respuesta_idempotente(
+            request,
+            lambda: parent.create(request, *args, **kwargs)
+        )
+
+    def respuesta_idempotente(self, request, ejecutar):
+        """Ejecuta `ejecutar()` una sola vez por clave de idempotencia."""
+        clave = request.META.get(self.idempotency_header, '').strip()
+        if not clave or not request.user.is_authenticated:
+            return ejecutar()
+        if len(clave) > 255:
+            return Response(
+                {'error': 'Idempotency-Key no puede superar 255 caracteres'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        huella = hashlib.sha256(request.body).hexdigest()
+        ruta = request.path[:255]
+        registro = IdempotencyKey.objects.buscar(request.user, clave)
+        if registro is not None:
+            return self._repetir_respuesta(registro, ruta, huella)
+
+        try:
+            with transaction.atomic():
+                response = ejecutar()
+                if status.is_success(response.status_code):
+                    IdempotencyKey.objects.create(
+                        empresa_id=getattr(request.user, 'empresa_id', None),
+                        usuario_id=request.user.pk,
+                        clave=clave,
+                        ruta=ruta,
+                        huella=huella,
+                        status_code=response.status_code,
+                        respuesta=response.data,
+                        expires_at=timezone.now() + settings.INVENTARIO_IDEMPOTENCIA_TTL,
+                    )
+        except IntegrityError:
+            # Otra petición con la misma clave se confirmó primero
+            registro = IdempotencyKey.objects.buscar(request.user, clave)
+            if registro is None:
+                raise
+            return self._repetir_respuesta(registro, ruta, huella)
+        return response
+
+    def _repetir_respuesta(self, registro, ruta, huella):
+        if registro.ruta != ruta:
+            return Response(
+                {'error': 'La Idempotency-Key ya se usó en otro endpoint'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        if registro.huella != huella:
+            return Response(
+                {'error': 'La Idempotency-Key ya se usó con otro cuerpo de petición'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        return Response(
+            registro.respuesta,
+            status=registro.status_code,
+            headers={'Idempotent-Replayed': 'true'}
+        )
+
+
+class ListadoAccionMixin:
+    """Respuestas acotadas para acciones personalizadas que devuelven listados.
+
+    Por defecto se devuelve una página con la paginación del viewset y el
+    total calculado en la misma consulta que la página. Con
+    `?formato=csv|ndjson` se envía el listado completo en streaming.
+    """
+
+    def respuesta_listado(self, queryset, clave, serializer_class, columnas, nombre,
+                          clave_total='total', extra=None, pagination_class=None):
+        formato = self.request.query_params.get('formato')
+        if formato is not None:
+            if formato not in FORMATOS:
+                return Response(
+                    {'formato': 'Valores permitidos: csv, ndjson'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return respuesta_exportacion(queryset, columnas, formato, nombre)
+
+        paginador = (pagination_class or self.pagination_class)()
+        pagina = paginador.paginate_queryset(queryset, self.request, view=self, contar=True)
+        return Response({
+            **(extra or {}),
+            clave_total: paginador.get_total(),
+            'next': paginador.get_next_link(),
+            'previous': paginador.get_previous_link(),
+            clave: serializer_class(pagina, many=True, context=self.get_serializer_context()).data,
+        })
+
+
+class ConditionalGetMixin:
+    """GET condicional (`ETag` / `Last-Modified`) en listado y detalle.
+
+    - Listado: los validadores salen de `Empresa.version_datos`, una
+      consulta sobre índices que no lee las filas; cambian con cualquier
+      alta, edición o baja del modelo o de las relaciones serializadas.
+    - Detalle: `updated_at` de la fila y de sus relaciones serializadas.
+
+    Con `If-None-Match` o `If-Modified-Since` vigentes se responde 304 sin
+    consultar la página ni serializar. `relaciones_version` declara las
+    relaciones que el serializador lee (`categoria.nombre`, etc.).
+    """
+    relaciones_version = ()
+
+    def list(self, request, *args, **kwargs):
+        parent = super()
+        return self.respuesta_condicional(
+            request,
+            self.validadores_listado(),
+            lambda: parent.list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        parent = super()
+        return self.respuesta_condicional(
+            request,
+            self.validadores_detalle(kwargs[self.lookup_url_kwarg or self.lookup_field]),
+            lambda: parent.retrieve(request, *args, **kwargs)
+        )
+
+    def validadores_listado(self):
+        usuario = self.request.user
+        if usuario.is_superuser or not usuario.empresa_id:
+            # Sin filtro por empresa no hay versión que cubra el listado
+            return None
+        modelo = self.get_queryset().model
+        modelos = [modelo] + [
+            modelo._meta.get_field(relacion).related_model
+            for relacion in self.relaciones_version
+            if relacion != 'empresa'
+        ]
+        return Empresa.version_datos(usuario.empresa_id, modelos)
+
+    def validadores_detalle(self, valor):
+        campos = ['updated_at'] + [f'{relacion}__updated_at' for relacion in self.relaciones_version]
+        try:
+            return self.filter_queryset(self.get_queryset()).filter(
+                **{self.lookup_field: valor}
+            ).values_list(*campos).first()
+        except (TypeError, ValueError, DjangoValidationError):
+            # Identificador mal formado: el detalle normal responde 404
+            return None
+
+    def respuesta_condicional(self, request, marcas, ejecutar):
+        """Responde 304 si el cliente tiene la versión de `marcas`; si no, `ejecutar()`."""
+        if marcas is None:
+            return ejecutar()
+        huella = '|'.join([
+            request.get_full_path(),
+            request.accepted_media_type or '',
+            *(marca.isoformat() if marca else '' for marca in marcas),
+        ])
+        etag = quote_etag(hashlib.sha256(huella.encode()).hexdigest()[:32])
+        fechas = [marca for marca in marcas if marca is not None]
+        ultima = int(max(fechas).timestamp()) if fechas else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=ultima)
+        if response is None:
+            response = ejecutar()
+            if response.status_code != 200:
+                return response
+        response['ETag'] = etag
+        if ultima is not None:
+            response['Last-Modified'] = http_date(ultima)
+        # El cliente puede guardar la respuesta, pero debe revalidarla siempre
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
@@ -1,17 +1,41 @@
-from rest_framework import viewsets, status
+from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.filters import SearchFilter, OrderingFilter
-from django.db.models import Q, Count, Sum
-from datetime import datetime, timedelta
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+import uuid
+from datetime import timedelta
 
+from accounts.models import Empresa
+from inventario.exports import COLUMNAS_MOVIMIENTOS, FORMATOS, respuesta_exportacion
+from inventario.filters import MovementFilter, parse_entero, parse_fecha
+from inventario.pagination import MovementPagination
+from inventario.views.mixins import (
+    ConditionalGetMixin,
+    IdempotentCreateMixin,
+    ListadoAccionMixin,
+)
+from utils.mixins import RelacionesPorAccionMixin
 from inventario.models.movement import Movement
-from inventario.serializers import MovementSerializer, MovementCreateSerializer
+from inventario.models.product import Product
+from inventario.models.rollup import DailyMovementRollup
+from inventario.serializers import (
+    MovementSerializer,
+    MovementCreateSerializer,
+    MovementLineSerializer,
+    MovementScanSerializer,
+    MovementBulkSerializer,
+    CheckoutLineSerializer,
+    MovementCheckoutSerializer,
+)
 
 
-class MovementViewSet(viewsets.ModelViewSet):
+class MovementViewSet(IdempotentCreateMixin, ConditionalGetMixin, ListadoAccionMixin,
+                      RelacionesPorAccionMixin, viewsets.ModelViewSet):
     """
     ViewSet para gestionar movimientos de inventario (ENTRADA/SALIDA).
     
@@ -25,23 +49,46 @@ class MovementViewSet(viewsets.ModelViewSet):
     - GET /api/movements/por-tipo/ - Movimientos por tipo (ENTRADA/SALIDA)
     - GET /api/movements/resumen/ - Resumen de movimientos
     - GET /api/movements/auditoria/ - Historial completo con filtros
+    - GET /api/movements/export/?formato=csv|ndjson - Exportación en streaming
     - POST /api/movements/{id}/revertir/ - Revertir un movimiento
+    - POST /api/movements/bulk/ - Registrar un lote de movimientos
+    - POST /api/movements/scan/ - Registrar un movimiento por código de barras/SKU
+    - POST /api/movements/checkout/ - Registrar todas las salidas de una venta
+    - GET /api/movements/series/ - Serie temporal de entradas y salidas
+    
+    Las creaciones aceptan la cabecera `Idempotency-Key` para reintentos seguros.
+    El listado se pagina por cursor sobre `(created_at, id)`; `?page=N`
+    activa la paginación numerada. Listado y detalle responden 304 a
+    `If-None-Match` / `If-Modified-Since` si nada cambió.
     """
     queryset = Movement.objects.all()
     serializer_class = MovementSerializer
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['empresa', 'producto', 'tipo_movimiento']
-    search_fields = ['producto__nombre', 'referencia', 'motivo', 'notas']
-    ordering_fields = ['created_at', 'cantidad']
+    filterset_class = MovementFilter
+    pagination_class = MovementPagination
+    search_fields = ['product__nombre', 'referencia', 'motivo', 'notes']
+    ordering_fields = ['created_at', 'quantity']
     ordering = ['-created_at']
+    # MovementSerializer lee producto, empresa y creado_por de cada fila
+    relaciones_por_accion = {
+        'default': ('product', 'empresa', 'created_by'),
+        'revertir': ('product', 'empresa'),
+        'resumen': (),
+        'series': (),
+        'exportar': (),
+        'bulk': (),
+        'scan': (),
+        'checkout': (),
+    }
+    relaciones_version = ('product', 'empresa', 'created_by')
     
     def get_queryset(self):
         """Filtrar movimientos por empresa del usuario autenticado"""
         queryset = super().get_queryset()
         if self.request.user.is_authenticated and not self.request.user.is_superuser:
-            if self.request.user.empresa:
-                queryset = queryset.filter(empresa=self.request.user.empresa)
+            if self.request.user.empresa_id:
+                queryset = queryset.filter(empresa_id=self.request.user.empresa_id)
         return queryset
     
     def get_serializer_class(self):
@@ -53,101 +100,220 @@ class MovementViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def por_tipo(self, request):
         """
-        Obtener movimientos filtrados por tipo.
-        Query params: tipo=ENTRADA|SALIDA
+        Obtener movimientos filtrados por tipo (paginado).
+        Query params: tipo=ENTRADA|SALIDA, formato=csv|ndjson para el listado completo
         """
         tipo_movimiento = request.query_params.get('tipo')
         queryset = self.get_queryset()
         
         if tipo_movimiento:
-            queryset = queryset.filter(tipo_movimiento=tipo_movimiento)
+            queryset = queryset.filter(movement_type=tipo_movimiento)
         
-        serializer = MovementSerializer(queryset, many=True)
-        return Response({
-            'tipo': tipo_movimiento or 'todos',
-            'total': queryset.count(),
-            'movimientos': serializer.data
-        })
+        return self.respuesta_listado(
+            queryset, 'movimientos', MovementSerializer, COLUMNAS_MOVIMIENTOS, 'movimientos',
+            extra={'tipo': tipo_movimiento or 'todos'}
+        )
     
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def resumen(self, request):
-        """Resumen estadístico de movimientos por tipo"""
+        """
+        Resumen estadístico de movimientos por tipo (una consulta agrupada).
+        Query params opcionales: fecha_inicio, fecha_fin, categoria, producto
+        """
         queryset = self.get_queryset()
         
-        # Estadísticas por tipo
-        entradas = queryset.filter(tipo_movimiento='ENTRADA')
-        salidas = queryset.filter(tipo_movimiento='SALIDA')
+        fecha_inicio = request.query_params.get('fecha_inicio')
+        fecha_fin = request.query_params.get('fecha_fin')
+        categoria = request.query_params.get('categoria')
+        producto = request.query_params.get('producto')
+        
+        if fecha_inicio:
+            inicio = parse_fecha(fecha_inicio)
+            if inicio is None:
+                raise serializers.ValidationError({'fecha_inicio': 'Fecha inválida'})
+            queryset = queryset.filter(created_at__gte=inicio)
+        if fecha_fin:
+            fin = parse_fecha(fecha_fin, fin_de_dia=True)
+            if fin is None:
+                raise serializers.ValidationError({'fecha_fin': 'Fecha inválida'})
+            queryset = queryset.filter(created_at__lte=fin)
+        if categoria:
+            categoria_id = parse_entero(categoria)
+            if categoria_id is None:
+                raise serializers.ValidationError({'categoria': 'Debe ser un id entero'})
+            queryset = queryset.filter(product__categoria_id=categoria_id)
+        if producto:
+            producto_id = parse_entero(producto)
+            if producto_id is None:
+                raise serializers.ValidationError({'producto': 'Debe ser un id entero'})
+            queryset = queryset.filter(product_id=producto_id)
+        
+        por_tipo = queryset.resumen()
+        vacio = {'total_movimientos': 0, 'cantidad_total': 0, 'valor_total': 0, 'ultimos_7_dias': 0}
+        entradas = por_tipo.get(Movement.TIPO_ENTRADA, vacio)
+        salidas = por_tipo.get(Movement.TIPO_SALIDA, vacio)
         
         resumen = {
             'entradas': {
-                'total_movimientos': entradas.count(),
-                'cantidad_total': entradas.aggregate(Sum('cantidad'))['cantidad__sum'] or 0,
-                'valor_total': float(sum(
-                    float(m.cantidad) * float(m.producto.costo)
-                    for m in entradas if m.producto.costo
-                ))
+                'total_movimientos': entradas['total_movimientos'],
+                'cantidad_total': entradas['cantidad_total'] or 0,
+                'valor_total': float(entradas['valor_total'] or 0)
             },
             'salidas': {
-                'total_movimientos': salidas.count(),
-                'cantidad_total': salidas.aggregate(Sum('cantidad'))['cantidad__sum'] or 0,
-                'valor_total': float(sum(
-                    float(m.cantidad) * float(m.producto.precio_venta)
-                    for m in salidas if m.producto.precio_venta
-                ))
+                'total_movimientos': salidas['total_movimientos'],
+                'cantidad_total': salidas['cantidad_total'] or 0,
+                'valor_total': float(salidas['valor_total'] or 0)
             },
-            'total_movimientos': queryset.count(),
-            'periodo_ultimos_7_dias': queryset.filter(
-                created_at__gte=datetime.now() - timedelta(days=7)
-            ).count()
+            'total_movimientos': entradas['total_movimientos'] + salidas['total_movimientos'],
+            'periodo_ultimos_7_dias': entradas['ultimos_7_dias'] + salidas['ultimos_7_dias'],
+            'filtros_aplicados': {
+                'fecha_inicio': fecha_inicio,
+                'fecha_fin': fecha_fin,
+                'categoria': categoria,
+                'producto': producto
+            }
         }
         
         return Response(resumen)
     
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
-    def auditoria(self, request):
-        """Historial completo de movimientos con filtros avanzados"""
-        queryset = self.get_queryset()
+    def series(self, request):
+        """
+        Serie temporal de entradas y salidas desde los acumulados diarios.
+        Query params: granularity=day|week|month, fecha_inicio, fecha_fin
+        (YYYY-MM-DD, por defecto los últimos 12 meses contados en la zona
+        horaria de la empresa, la misma de los acumulados), producto, categoria
+        """
+        granularidad = request.query_params.get('granularity', 'day')
+        if granularidad not in DailyMovementRollup.objects.GRANULARIDADES:
+            raise serializers.ValidationError({'granularity': 'Valores permitidos: day, week, month'})
         
-        # Aplicar filtros opcionales
-        producto_id = request.query_params.get('producto_id')
-        tipo = request.query_params.get('tipo')
-        usuario_id = request.query_params.get('usuario_id')
-        fecha_inicio = request.query_params.get('fecha_inicio')
-        fecha_fin = request.query_params.get('fecha_fin')
+        try:
+            fecha_inicio = parse_date(request.query_params.get('fecha_inicio', ''))
+            fecha_fin = parse_date(request.query_params.get('fecha_fin', ''))
+        except ValueError:
+            raise serializers.ValidationError({'fecha': 'Fecha inválida'})
+        if fecha_inicio is None:
+            zona = Empresa.zona_de(request.user.empresa_id)
+            fecha_inicio = timezone.localdate(timezone=zona) - timedelta(days=365)
         
-        if producto_id:
-            queryset = queryset.filter(producto_id=producto_id)
-        if tipo:
-            queryset = queryset.filter(tipo_movimiento=tipo)
-        if usuario_id:
-            queryset = queryset.filter(creado_por_id=usuario_id)
-        if fecha_inicio:
-            queryset = queryset.filter(created_at__gte=fecha_inicio)
+        queryset = DailyMovementRollup.objects.filter(fecha__gte=fecha_inicio)
         if fecha_fin:
-            queryset = queryset.filter(created_at__lte=fecha_fin)
+            queryset = queryset.filter(fecha__lte=fecha_fin)
+        if self.request.user.is_authenticated and not self.request.user.is_superuser:
+            if self.request.user.empresa_id:
+                queryset = queryset.filter(empresa_id=self.request.user.empresa_id)
+        producto = request.query_params.get('producto')
+        categoria = request.query_params.get('categoria')
+        if producto:
+            producto_id = parse_entero(producto)
+            if producto_id is None:
+                raise serializers.ValidationError({'producto': 'Debe ser un id entero'})
+            queryset = queryset.filter(product_id=producto_id)
+        if categoria:
+            categoria_id = parse_entero(categoria)
+            if categoria_id is None:
+                raise serializers.ValidationError({'categoria': 'Debe ser un id entero'})
+            queryset = queryset.filter(product__categoria_id=categoria_id)
         
-        serializer = MovementSerializer(queryset, many=True)
         return Response({
-            'total': queryset.count(),
-            'filtros_aplicados': {
-                'producto_id': producto_id,
-                'tipo': tipo,
-                'usuario_id': usuario_id,
-                'fecha_inicio': fecha_inicio,
-                'fecha_fin': fecha_fin
-            },
-            'movimientos': serializer.data
+            'granularity': granularidad,
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin,
+            'serie': list(DailyMovementRollup.objects.serie(queryset, granularidad))
         })
     
+    def _filtrar_auditoria(self, queryset):
+        """Aplica los filtros de `auditoria` y devuelve `(queryset, filtros_aplicados)`"""
+        params = self.request.query_params
+        producto_id = params.get('producto_id')
+        tipo = params.get('tipo')
+        usuario_id = params.get('usuario_id')
+        fecha_inicio = params.get('fecha_inicio')
+        fecha_fin = params.get('fecha_fin')
+        
+        # Se valida todo antes de que `export` empiece a enviar la respuesta
+        for nombre, valor in (('producto_id', producto_id), ('usuario_id', usuario_id)):
+            if valor and parse_entero(valor) is None:
+                raise serializers.ValidationError({nombre: 'Debe ser un id entero'})
+        inicio = parse_fecha(fecha_inicio)
+        if fecha_inicio and inicio is None:
+            raise serializers.ValidationError({'fecha_inicio': 'Fecha inválida'})
+        fin = parse_fecha(fecha_fin, fin_de_dia=True)
+        if fecha_fin and fin is None:
+            raise serializers.ValidationError({'fecha_fin': 'Fecha inválida'})
+        
+        if producto_id:
+            queryset = queryset.filter(product_id=parse_entero(producto_id))
+        if tipo:
+            queryset = queryset.filter(movement_type=tipo)
+        if usuario_id:
+            queryset = queryset.filter(created_by_id=parse_entero(usuario_id))
+        if inicio:
+            queryset = queryset.filter(created_at__gte=inicio)
+        if fin:
+            queryset = queryset.filter(created_at__lte=fin)
+        
+        return queryset, {
+            'producto_id': producto_id,
+            'tipo': tipo,
+            'usuario_id': usuario_id,
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin
+        }
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def auditoria(self, request):
+        """
+        Historial de movimientos con filtros avanzados (paginado).
+        Con formato=csv|ndjson devuelve el historial completo en streaming.
+        """
+        queryset, filtros = self._filtrar_auditoria(self.get_queryset())
+        
+        return self.respuesta_listado(
+            queryset, 'movimientos', MovementSerializer, COLUMNAS_MOVIMIENTOS, 'auditoria',
+            extra={'filtros_aplicados': filtros}
+        )
+    
+    @action(detail=False, methods=['get'], url_path='export',
+            permission_classes=[IsAuthenticated])
+    def exportar(self, request):
+        """
+        Exportar movimientos en streaming.
+        Query params: formato=csv|ndjson (por defecto csv) y los filtros de auditoria
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS:
+            raise serializers.ValidationError({'formato': 'Valores permitidos: csv, ndjson'})
+        
+        queryset, _ = self._filtrar_auditoria(self.get_queryset())
+        return respuesta_exportacion(
+            queryset.order_by('id'),
+            COLUMNAS_MOVIMIENTOS,
+            formato,
+            'movimientos'
+        )
+    
     def perform_create(self, serializer):
         """Crear movimiento y asignar usuario que lo creó"""
-        if self.request.user.empresa:
-            serializer.save(
-                empresa=self.request.user.empresa,
-                creado_por=self.request.user
-            )
-        else:
-            serializer.save(creado_por=self.request.user)
+        try:
+            if self.request.user.empresa_id:
+                serializer.save(
+                    empresa_id=self.request.user.empresa_id,
+                    created_by_id=self.request.user.pk
+                )
+            else:
+                serializer.save(created_by_id=self.request.user.pk)
+        except DjangoValidationError as exc:
+            # Stock insuficiente detectado por el UPDATE condicional de Movement.save()
+            raise serializers.ValidationError({'cantidad': exc.messages})
+    
+    def perform_update(self, serializer):
+        """Actualizar movimiento reportando errores de stock como 400"""
+        try:
+            serializer.save()
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({'cantidad': exc.messages})
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def revertir(self, request, pk=None):
@@ -155,25 +321,222 @@ class MovementViewSet(viewsets.ModelViewSet):
         movimiento = self.get_object()
         
         # Determinar tipo opuesto
-        tipo_opuesto = 'SALIDA' if movimiento.tipo_movimiento == 'ENTRADA' else 'ENTRADA'
+        if movimiento.movement_type == Movement.TIPO_ENTRADA:
+            tipo_opuesto = Movement.TIPO_SALIDA
+        else:
+            tipo_opuesto = Movement.TIPO_ENTRADA
         
         # Crear movimiento de reversión
-        movimiento_reversado = Movement.objects.create(
-            empresa=movimiento.empresa,
-            producto=movimiento.producto,
-            tipo_movimiento=tipo_opuesto,
-            cantidad=movimiento.cantidad,
-            referencia=f"REVERSA-{movimiento.id}",
-            motivo='Reversión de movimiento',
-            notas=f'Reversión del movimiento {movimiento.id} creado el {movimiento.created_at}',
-            creado_por=request.user
-        )
+        try:
+            movimiento_reversado = Movement.objects.create(
+                empresa=movimiento.empresa,
+                product=movimiento.product,
+                movement_type=tipo_opuesto,
+                quantity=movimiento.quantity,
+                referencia=f"REVERSA-{movimiento.id}",
+                motivo='Reversión de movimiento',
+                notes=f'Reversión del movimiento {movimiento.id} creado el {movimiento.created_at}',
+                created_by_id=request.user.pk
+            )
+        except DjangoValidationError as exc:
+            return Response(
+                {'error': ' '.join(exc.messages)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response({
             'message': 'Movimiento revertido exitosamente',
             'movimiento_original_id': movimiento.id,
             'movimiento_reversado_id': movimiento_reversado.id,
             'tipo_reversado': tipo_opuesto,
-            'cantidad': movimiento.cantidad,
-            'producto': movimiento.producto.nombre
+            'cantidad': movimiento.quantity,
+            'producto': movimiento.product.nombre
+        }, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def bulk(self, request):
+        """
+        Registrar un lote de movimientos en una sola transacción.
+        Body: {"modo": "atomico"|"parcial", "movimientos": [{...}, ...]}
+        """
+        return self.respuesta_idempotente(request, lambda: self._registrar_lote(request))
+    
+    def _registrar_lote(self, request):
+        entrada = MovementBulkSerializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        atomico = entrada.validated_data['modo'] == MovementBulkSerializer.MODO_ATOMICO
+        
+        # Validación por línea sin consultas; stock y productos se validan en bloque
+        lineas = []
+        errores = {}
+        for indice, datos in enumerate(entrada.validated_data['movimientos']):
+            linea = MovementLineSerializer(data=datos)
+            if linea.is_valid():
+                lineas.append((indice, linea.validated_data))
+            else:
+                errores[indice] = linea.errors
+        
+        creados = []
+        if not (atomico and errores):
+            creados, errores_lote = Movement.objects.registrar_lote(
+                lineas,
+                empresa=request.user.empresa_id,
+                usuario=request.user,
+                atomico=atomico
+            )
+            errores.update(errores_lote)
+        
+        respuesta = {
+            'modo': entrada.validated_data['modo'],
+            'total_lineas': len(entrada.validated_data['movimientos']),
+            'creados': len(creados),
+            'fallidos': len(errores),
+            'movimientos': [
+                {'indice': indice, 'id': movimiento.id}
+                for indice, movimiento in creados
+            ],
+            'errores': [
+                {'indice': indice, 'errores': errores[indice]}
+                for indice in sorted(errores)
+            ]
+        }
+        if atomico and errores:
+            return Response(respuesta, status=status.HTTP_400_BAD_REQUEST)
+        return Response(respuesta, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def scan(self, request):
+        """
+        Registrar un movimiento a partir del código leído por un escáner.
+        Body: {"codigo": "...", "tipo_movimiento": "SALIDA", "cantidad": 1, ...}
+        Resuelve el código por el índice único `(empresa, codigo)` y registra
+        el movimiento en la misma petición; devuelve el stock resultante.
+        """
+        return self.respuesta_idempotente(request, lambda: self._registrar_escaneo(request))
+    
+    def _registrar_escaneo(self, request):
+        if not request.user.empresa_id:
+            return Response(
+                {'error': 'El usuario debe pertenecer a una empresa para registrar movimientos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        entrada = MovementScanSerializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        datos = dict(entrada.validated_data)
+        codigo = datos.pop('codigo')
+        
+        producto = Product.objects.filter(
+            empresa_id=request.user.empresa_id, codigo=codigo
+        ).values_list('id', 'nombre').first()
+        if producto is None:
+            return Response(
+                {'codigo': f'No hay un producto con el código {codigo}'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        producto_id, nombre = producto
+        
+        creados, errores = Movement.objects.registrar_lote(
+            [(0, {'producto': producto_id, **datos})],
+            empresa=request.user.empresa_id,
+            usuario=request.user,
+            # Con una sola línea es equivalente y reporta el stock disponible sin mencionar el lote
+            atomico=False
+        )
+        if errores:
+            return Response(errores[0], status=status.HTTP_400_BAD_REQUEST)
+        
+        movimiento = creados[0][1]
+        return Response({
+            'id': movimiento.id,
+            'producto': producto_id,
+            'producto_nombre': nombre,
+            'codigo': codigo,
+            'tipo_movimiento': movimiento.movement_type,
+            'cantidad': movimiento.quantity,
+            'stock': movimiento.product.cantidad
+        }, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    def checkout(self, request):
+        """
+        Registrar las salidas de una venta en una sola transacción.
+        Body: {"referencia": "...", "lineas": [{"producto": id | "codigo": "...", "cantidad": n}, ...]}
+        Todas las líneas se aplican o ninguna: los productos se bloquean una
+        vez en orden ascendente de id y el stock se valida sobre el total
+        por producto (ver `Movement.objects.registrar_lote`).
+        """
+        return self.respuesta_idempotente(request, lambda: self._registrar_venta(request))
+    
+    def _registrar_venta(self, request):
+        if not request.user.empresa_id:
+            return Response(
+                {'error': 'El usuario debe pertenecer a una empresa para registrar ventas'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        entrada = MovementCheckoutSerializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        venta = entrada.validated_data
+        referencia = venta['referencia'] or f'VENTA-{uuid.uuid4().hex[:12].upper()}'
+        
+        validas = []
+        errores = {}
+        for indice, datos in enumerate(venta['lineas']):
+            linea = CheckoutLineSerializer(data=datos)
+            if linea.is_valid():
+                validas.append((indice, linea.validated_data))
+            else:
+                errores[indice] = linea.errors
+        
+        # Los códigos de todas las líneas se resuelven con una consulta
+        codigos = {datos['codigo'] for _, datos in validas if 'codigo' in datos}
+        por_codigo = dict(Product.objects.filter(
+            empresa_id=request.user.empresa_id, codigo__in=codigos
+        ).values_list('codigo', 'id')) if codigos else {}
+        
+        lineas = []
+        for indice, datos in validas:
+            producto = datos.get('producto') or por_codigo.get(datos['codigo'])
+            if producto is None:
+                errores[indice] = {'codigo': f"No hay un producto con el código {datos['codigo']}"}
+                continue
+            lineas.append((indice, {
+                'producto': producto,
+                'tipo_movimiento': Movement.TIPO_SALIDA,
+                'cantidad': datos['cantidad'],
+                'referencia': referencia,
+                'motivo': venta['motivo'],
+                'notas': venta['notas'],
+            }))
+        
+        creados = []
+        if not errores:
+            creados, errores = Movement.objects.registrar_lote(
+                lineas,
+                empresa=request.user.empresa_id,
+                usuario=request.user
+            )
+        
+        if errores:
+            return Response({
+                'referencia': referencia,
+                'total_lineas': len(venta['lineas']),
+                'errores': [
+                    {'indice': indice, 'errores': errores[indice]}
+                    for indice in sorted(errores)
+                ]
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        stock = {movimiento.product_id: movimiento.product.cantidad for _, movimiento in creados}
+        return Response({
+            'referencia': referencia,
+            'total_lineas': len(venta['lineas']),
+            'movimientos': [
+                {'indice': indice, 'id': movimiento.id, 'producto': movimiento.product_id,
+                 'cantidad': movimiento.quantity}
+                for indice, movimiento in sorted(creados, key=lambda item: item[0])
+            ],
+            'stock': [
+                {'producto': producto, 'cantidad': cantidad}
+                for producto, cantidad in sorted(stock.items())
+            ]
         }, status=status.HTTP_201_CREATED)
@@ -1,16 +1,33 @@
-from rest_framework import viewsets, status
+from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import FormParser, MultiPartParser
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import models
 
+from inventario.autocomplete import autocompletado
+from inventario.exports import COLUMNAS_PRODUCTOS, FORMATOS, respuesta_exportacion
+from inventario.filters import ProductFilter, parse_fecha
+from inventario.imports import ImportacionProductos
+from inventario.pagination import ProductPagination
+from inventario.search import ProductSearchFilter
+from inventario.models.checkpoint import StockCheckpoint
 from inventario.models.product import Product
-from inventario.serializers import ProductSerializer, ProductDetailSerializer
+from inventario.views.mixins import ConditionalGetMixin, ListadoAccionMixin
+from utils.mixins import RelacionesPorAccionMixin
+from inventario.serializers import (
+    ProductSerializer,
+    ProductDetailSerializer,
+    ProductImportSerializer,
+)
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(ConditionalGetMixin, ListadoAccionMixin, RelacionesPorAccionMixin,
+                     viewsets.ModelViewSet):
     """
     ViewSet para gestionar productos del inventario.
     
@@ -24,22 +41,43 @@ class ProductViewSet(viewsets.ModelViewSet):
     - GET /api/products/{id}/bajo-stock/ - Productos con stock bajo
     - POST /api/products/{id}/desactivar/ - Desactivar producto
     - POST /api/products/{id}/activar/ - Activar producto
+    - GET /api/products/{id}/stock-at/?fecha= - Stock del producto en una fecha
+    - GET /api/products/stock-at/?fecha= - Stock de todos los productos en una fecha
+    - GET /api/products/export/?formato=csv|ndjson - Exportación en streaming
+    - GET /api/products/autocomplete/?q= - Sugerencias por prefijo del nombre
+    - POST /api/products/import/ - Importación masiva desde CSV (multipart, campo `archivo`)
+    
+    El listado se pagina por cursor sobre `(nombre, id)`; `?page=N` activa
+    la paginación numerada. `?search=` usa índices de texto completo y
+    trigramas (ver `inventario.search`) y ordena por relevancia, con cursor
+    sobre `(relevancia, id)`. Listado y detalle responden 304 a
+    `If-None-Match` / `If-Modified-Since` si nada cambió.
     """
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['empresa', 'categoria', 'is_active']
+    pagination_class = ProductPagination
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, OrderingFilter]
+    filterset_class = ProductFilter
     search_fields = ['nombre', 'proveedor']
-    ordering_fields = ['nombre', 'precio_venta', 'cantidad', 'created_at']
+    ordering_fields = ['nombre', 'precio_venta', 'cantidad', 'created_at', 'relevancia']
     ordering = ['nombre']
+    # ProductSerializer lee categoria.nombre y empresa.nombre de cada fila
+    relaciones_por_accion = {
+        'default': ('categoria', 'empresa'),
+        'stock_en_fecha_todos': (),
+        'exportar': (),
+        'importar': (),
+        'autocompletar': (),
+    }
+    relaciones_version = ('categoria', 'empresa')
     
     def get_queryset(self):
         """Filtrar productos por empresa del usuario autenticado"""
         queryset = super().get_queryset()
         if self.request.user.is_authenticated and not self.request.user.is_superuser:
-            if self.request.user.empresa:
-                queryset = queryset.filter(empresa=self.request.user.empresa)
+            if self.request.user.empresa_id:
+                queryset = queryset.filter(empresa_id=self.request.user.empresa_id)
         return queryset
     
     def get_serializer_class(self):
@@ -50,22 +88,65 @@ class ProductViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         """Asignar la empresa del usuario al crear producto"""
-        if self.request.user.empresa:
-            serializer.save(empresa=self.request.user.empresa)
-        else:
+        try:
+            if self.request.user.empresa_id:
+                serializer.save(empresa_id=self.request.user.empresa_id)
+            else:
+                serializer.save()
+        except DjangoValidationError as exc:
+            # Validaciones de Product.save() (p. ej. código repetido en la empresa)
+            raise serializers.ValidationError(
+                exc.message_dict if hasattr(exc, 'error_dict') else exc.messages
+            )
+    
+    def perform_update(self, serializer):
+        """Actualizar producto reportando las validaciones del modelo como 400"""
+        try:
             serializer.save()
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(
+                exc.message_dict if hasattr(exc, 'error_dict') else exc.messages
+            )
+    
+    @action(detail=False, methods=['get'], url_path='autocomplete',
+            permission_classes=[IsAuthenticated])
+    def autocompletar(self, request):
+        """
+        Productos activos cuyo nombre, o alguna de sus palabras, empieza por `q`.
+        Query params: q, limite (por defecto y como máximo INVENTARIO_AUTOCOMPLETE_LIMITE)
+        Se sirve desde un índice en memoria por empresa (ver `inventario.autocomplete`).
+        """
+        if not request.user.empresa_id:
+            return Response(
+                {'error': 'El usuario debe pertenecer a una empresa para buscar productos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        maximo = settings.INVENTARIO_AUTOCOMPLETE_LIMITE
+        try:
+            limite = min(int(request.query_params.get('limite', maximo)), maximo)
+        except ValueError:
+            limite = 0
+        if limite < 1:
+            return Response(
+                {'limite': f'Debe ser un entero entre 1 y {maximo}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({'resultados': autocompletado.buscar(
+            request.user.empresa_id, request.query_params.get('q', ''), limite
+        )})
     
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def bajo_stock(self, request):
-        """Obtener productos con stock bajo (menor que stock_minimo)"""
-        queryset = self.get_queryset()
-        products = queryset.filter(cantidad__lt=models.F('stock_minimo')).distinct()
+        """
+        Obtener productos con stock bajo (menor que stock_minimo), paginado.
+        Con formato=csv|ndjson devuelve el listado completo en streaming.
+        """
+        products = self.get_queryset().filter(cantidad__lt=models.F('stock_minimo'))
         
-        serializer = self.get_serializer_class()(products, many=True)
-        return Response({
-            'count': products.count(),
-            'resultados': serializer.data
-        })
+        return self.respuesta_listado(
+            products, 'resultados', self.get_serializer_class(), COLUMNAS_PRODUCTOS,
+            'productos_bajo_stock', clave_total='count'
+        )
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def desactivar(self, request, pk=None):
@@ -90,3 +171,100 @@ class ProductViewSet(viewsets.ModelViewSet):
             'producto_id': product.id,
             'nombre': product.nombre
         })
+
+    
+    @action(detail=True, methods=['get'], url_path='stock-at',
+            permission_classes=[IsAuthenticated])
+    def stock_en_fecha(self, request, pk=None):
+        """
+        Stock del producto en una fecha.
+        Query params: fecha=YYYY-MM-DD|fecha-hora ISO
+        """
+        fecha = parse_fecha(request.query_params.get('fecha'), fin_de_dia=True)
+        if fecha is None:
+            return Response(
+                {'error': 'Debes indicar una fecha válida (YYYY-MM-DD o ISO 8601)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        product = self.get_object()
+        cantidad, checkpoint, reproducidos = StockCheckpoint.objects.stock_en(product, fecha)
+        return Response({
+            'producto_id': product.id,
+            'nombre': product.nombre,
+            'fecha': fecha,
+            'cantidad': cantidad,
+            'checkpoint_fecha': checkpoint.fecha if checkpoint else None,
+            'movimientos_reproducidos': reproducidos
+        })
+    
+    @action(detail=False, methods=['get'], url_path='stock-at',
+            permission_classes=[IsAuthenticated])
+    def stock_en_fecha_todos(self, request):
+        """
+        Stock de todos los productos de la empresa en una fecha.
+        Query params: fecha=YYYY-MM-DD|fecha-hora ISO (acepta los filtros del listado)
+        """
+        fecha = parse_fecha(request.query_params.get('fecha'), fin_de_dia=True)
+        if fecha is None:
+            return Response(
+                {'error': 'Debes indicar una fecha válida (YYYY-MM-DD o ISO 8601)'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        queryset = StockCheckpoint.objects.anotar_stock_en(
+            self.filter_queryset(self.get_queryset()), fecha
+        ).values('id', 'nombre', 'stock_en_fecha')
+        pagina = self.paginate_queryset(queryset)
+        resultados = [
+            {'producto_id': p['id'], 'nombre': p['nombre'], 'cantidad': p['stock_en_fecha']}
+            for p in (pagina if pagina is not None else queryset)
+        ]
+        if pagina is not None:
+            return self.get_paginated_response(resultados)
+        return Response({'fecha': fecha, 'resultados': resultados})
+    
+    @action(detail=False, methods=['get'], url_path='export',
+            permission_classes=[IsAuthenticated])
+    def exportar(self, request):
+        """
+        Exportar productos en streaming.
+        Query params: formato=csv|ndjson (por defecto csv) y los filtros del listado
+        """
+        formato = request.query_params.get('formato', 'csv')
+        if formato not in FORMATOS:
+            return Response(
+                {'formato': 'Valores permitidos: csv, ndjson'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return respuesta_exportacion(
+            self.filter_queryset(self.get_queryset()),
+            COLUMNAS_PRODUCTOS,
+            formato,
+            'productos'
+        )
+    
+    @action(detail=False, methods=['post'], url_path='import',
+            parser_classes=[MultiPartParser, FormParser],
+            permission_classes=[IsAuthenticated])
+    def importar(self, request):
+        """
+        Importar productos desde un CSV.
+        Form data: archivo (CSV con cabecera), crear_categorias=true|false
+        Columnas: nombre, categoria (nombre), costo, precio_venta y opcionales
+        del producto. Devuelve un reporte con los errores por fila.
+        """
+        if not request.user.empresa_id:
+            return Response(
+                {'error': 'El usuario debe pertenecer a una empresa para importar productos'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        entrada = ProductImportSerializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        
+        importacion = ImportacionProductos(
+            request.user.empresa,
+            crear_categorias=entrada.validated_data['crear_categorias']
+        )
+        return Response(importacion.importar(entrada.validated_data['archivo']))
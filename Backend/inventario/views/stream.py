@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+
+from accounts.backends import ClaimsJWTAuthentication
+from inventario.stream import broker
+
+
+def _usuario(request):
+    """Usuario del JWT de la cabecera `Authorization` o de `?token=`.
+
+    `EventSource` no permite cabeceras propias, por eso se acepta el token
+    en la URL.
+    """
+    autenticacion = ClaimsJWTAuthentication()
+    try:
+        resultado = autenticacion.authenticate(request)
+        if resultado is not None:
+            return resultado[0]
+        token = request.GET.get('token')
+        if not token:
+            return None
+        return autenticacion.get_user(autenticacion.get_validated_token(token.encode()))
+    except AuthenticationFailed:
+        return None
+
+
+async def _eventos(empresa_id):
+    # La suscripción se crea al empezar a enviar, en el event loop que consume la respuesta
+    suscripcion = broker.suscribir(empresa_id)
+    try:
+        yield f'retry: {settings.INVENTARIO_STREAM_REINTENTO_MS}\n\n'
+        while True:
+            try:
+                eventos = await asyncio.wait_for(
+                    suscripcion.cola.get(), timeout=settings.INVENTARIO_STREAM_PING
+                )
+            except asyncio.TimeoutError:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ': ping\n\n'
+                continue
+            if suscripcion.desbordada:
+                # Se perdieron eventos: el panel debe recargar el stock completo
+                suscripcion.desbordada = False
+                while not suscripcion.cola.empty():
+                    suscripcion.cola.get_nowait()
+                yield 'event: resync\ndata: {}\n\n'
+                continue
+            yield f'event: stock\ndata: {json.dumps(eventos, separators=(",", ":"))}\n\n'
+    finally:
+        broker.cancelar(suscripcion)
+
+
+async def vista_stream_stock(request):
+    """`GET /api/stream/stock/`: cambios de stock de la empresa en Server-Sent Events.
+
+    Cada evento `stock` trae la lista `[{"producto", "cantidad", "bajo_stock"}]`
+    de un movimiento o lote confirmado; `resync` indica que el cliente no
+    consumió a tiempo y debe recargar. Requiere servir la app por ASGI
+    (`config.asgi`).
+    """
+    usuario = await sync_to_async(_usuario)(request)
+    if usuario is None:
+        return JsonResponse({'detail': 'Credenciales de autenticación inválidas'}, status=401)
+    if not usuario.empresa_id:
+        return JsonResponse(
+            {'error': 'El usuario debe pertenecer a una empresa para recibir el stock'}, status=400
+        )
+
+    response = StreamingHttpResponse(
+        _eventos(usuario.empresa_id), content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Sin búfer en nginx: cada evento se envía en cuanto se genera
+    response['X-Accel-Buffering'] = 'no'
+    return response
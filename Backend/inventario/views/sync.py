@@ -0,0 +1,53 @@
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+
+from inventario.sync import RECURSOS, SincronizacionCambios
+
+
+class SyncViewSet(viewsets.ViewSet):
+    """
+    ViewSet de sincronización incremental para la app offline.
+    
+    Endpoints disponibles:
+    - GET /api/sync/changes/?since=<cursor> - Categorías, productos y movimientos
+      creados, editados o desactivados desde el cursor
+    """
+    permission_classes = [IsAuthenticated]
+    
+    @action(detail=False, methods=['get'], url_path='changes')
+    def cambios(self, request):
+        """
+        Cambios de la empresa posteriores al cursor.
+        Query params: since (cursor de la respuesta anterior; sin él, descarga
+        completa), recursos=categorias,productos,movimientos, limite (filas
+        por recurso). Con `hay_mas` hay que volver a llamar con el nuevo
+        cursor; con `resincronizar` hay que descartar los datos locales.
+        """
+        if not request.user.empresa_id:
+            return Response(
+                {'error': 'El usuario debe pertenecer a una empresa para sincronizar'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        recursos = request.query_params.get('recursos')
+        if recursos:
+            recursos = [nombre.strip() for nombre in recursos.split(',') if nombre.strip()]
+            invalidos = set(recursos) - set(RECURSOS)
+            if invalidos:
+                return Response(
+                    {'recursos': f"Valores permitidos: {', '.join(RECURSOS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        try:
+            limite = int(request.query_params.get('limite', 0))
+        except ValueError:
+            limite = 0
+        
+        sincronizacion = SincronizacionCambios(
+            request.user.empresa_id,
+            cursor=request.query_params.get('since'),
+            recursos=recursos,
+            limite=limite if limite > 0 else None,
+        )
+        return Response(sincronizacion.cambios({'request': request, 'view': self}))
@@ -0,0 +1,255 @@
+"""
+Métricas de peticiones agregadas en proceso y expuestas en formato Prometheus.
+
+Cada worker acumula contadores e histogramas en memoria bajo un lock. Si
+`INVENTARIO_METRICAS_DIR` está definido, el worker vuelca su estado a
+`<dir>/metricas_<pid>.json` como mucho cada `INVENTARIO_METRICAS_VOLCADO`
+segundos, y el endpoint de scrape combina los archivos de todos los
+workers; así el resultado no depende de qué worker atienda el scrape. Los
+archivos de procesos que ya no existen se borran al combinarlos (como
+`mark_process_dead` de prometheus_client), para que un PID reutilizado no
+herede contadores ajenos ni el directorio crezca con cada reinicio.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+# nombre: (tipo, ayuda, buckets)
+METRICAS = {
+    'inventario_http_requests_total': (
+        'counter', 'Peticiones atendidas por vista, método y estado', None),
+    'inventario_http_request_duration_seconds': (
+        'histogram', 'Latencia de las peticiones por vista', BUCKETS_LATENCIA),
+    'inventario_http_response_bytes_total': (
+        'counter', 'Bytes de respuesta por vista (sin respuestas en streaming)', None),
+    'inventario_db_queries_per_request': (
+        'histogram', 'Consultas SQL por petición y vista', BUCKETS_CONSULTAS),
+    'inventario_db_query_duration_seconds_total': (
+        'counter', 'Tiempo en consultas SQL por vista', None),
+    'inventario_tenant_requests_total': (
+        'counter', 'Peticiones por empresa', None),
+    'inventario_tenant_request_duration_seconds_total': (
+        'counter', 'Tiempo de respuesta acumulado por empresa', None),
+    'inventario_tenant_db_queries_total': (
+        'counter', 'Consultas SQL por empresa', None),
+}
+
+
+class RegistroMetricas:
+    """Contadores e histogramas de un proceso, con volcado opcional a disco."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        self.pid = os.getpid()
+        self.contadores = defaultdict(float)
+        self.histogramas = {}
+        self.ultimo_volcado = 0.0
+
+    def _observar(self, nombre, etiquetas, valor):
+        buckets = METRICAS[nombre][2]
+        clave = (nombre, etiquetas)
+        histograma = self.histogramas.get(clave)
+        if histograma is None:
+            histograma = self.histogramas[clave] = [[0] * len(buckets), 0.0, 0]
+        for i, limite in enumerate(buckets):
+            if valor <= limite:
+                histograma[0][i] += 1
+                break
+        histograma[1] += valor
+        histograma[2] += 1
+
+    def registrar_peticion(self, vista, metodo, estado, empresa, duracion, consultas,
+                           tiempo_sql, tamano):
+        """Registra una petición atendida; lo llama `MetricasMiddleware`."""
+        por_vista = (('vista', vista), ('metodo', metodo))
+        por_empresa = (('empresa', empresa),)
+        with self._lock:
+            if os.getpid() != self.pid:
+                # Proceso hijo tras un fork: no heredar los datos del padre
+                self._reiniciar()
+            self.contadores[('inventario_http_requests_total', por_vista + (('estado', estado),))] += 1
+            self._observar('inventario_http_request_duration_seconds', por_vista, duracion)
+            if tamano is not None:
+                self.contadores[('inventario_http_response_bytes_total', por_vista)] += tamano
+            self._observar('inventario_db_queries_per_request', por_vista, consultas)
+            self.contadores[('inventario_db_query_duration_seconds_total', por_vista)] += tiempo_sql
+            self.contadores[('inventario_tenant_requests_total', por_empresa)] += 1
+            self.contadores[('inventario_tenant_request_duration_seconds_total', por_empresa)] += duracion
+            self.contadores[('inventario_tenant_db_queries_total', por_empresa)] += consultas
+            volcar = self._toca_volcar()
+        if volcar:
+            self.volcar()
+
+    def _toca_volcar(self):
+        directorio = getattr(settings, 'INVENTARIO_METRICAS_DIR', None)
+        if not directorio:
+            return False
+        ahora = time.monotonic()
+        if ahora - self.ultimo_volcado < settings.INVENTARIO_METRICAS_VOLCADO:
+            return False
+        self.ultimo_volcado = ahora
+        return True
+
+    def estado(self):
+        """Copia serializable a JSON del estado del proceso."""
+        with self._lock:
+            return {
+                'contadores': [
+                    [nombre, list(etiquetas), valor]
+                    for (nombre, etiquetas), valor in self.contadores.items()
+                ],
+                'histogramas': [
+                    [nombre, list(etiquetas), buckets[:], suma, cuenta]
+                    for (nombre, etiquetas), (buckets, suma, cuenta) in self.histogramas.items()
+                ],
+            }
+
+    def volcar(self):
+        """Escribe el estado del proceso en su archivo (reemplazo atómico)."""
+        directorio = settings.INVENTARIO_METRICAS_DIR
+        os.makedirs(directorio, exist_ok=True)
+        destino = os.path.join(directorio, f'metricas_{os.getpid()}.json')
+        temporal = f'{destino}.tmp'
+        with open(temporal, 'w') as archivo:
+            json.dump(self.estado(), archivo)
+        os.replace(temporal, destino)
+
+
+registro = RegistroMetricas()
+
+
+def _combinar(estados):
+    contadores = defaultdict(float)
+    histogramas = {}
+    for estado in estados:
+        for nombre, etiquetas, valor in estado['contadores']:
+            contadores[(nombre, tuple(map(tuple, etiquetas)))] += valor
+        for nombre, etiquetas, buckets, suma, cuenta in estado['histogramas']:
+            clave = (nombre, tuple(map(tuple, etiquetas)))
+            if clave not in histogramas:
+                histogramas[clave] = [[0] * len(buckets), 0.0, 0]
+            acumulado = histogramas[clave]
+            acumulado[0] = [a + b for a, b in zip(acumulado[0], buckets)]
+            acumulado[1] += suma
+            acumulado[2] += cuenta
+    return contadores, histogramas
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Existe, pero es de otro usuario
+        return True
+    return True
+
+
+def _estados():
+    """Estado de todos los workers (o solo el de este proceso sin directorio)."""
+    directorio = getattr(settings, 'INVENTARIO_METRICAS_DIR', None)
+    if not directorio:
+        return [registro.estado()]
+    registro.volcar()
+    estados = []
+    for ruta in glob.glob(os.path.join(directorio, 'metricas_*.json')):
+        pid = os.path.basename(ruta)[len('metricas_'):-len('.json')]
+        if pid.isdigit() and not _proceso_vivo(int(pid)):
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(ruta) as archivo:
+                estados.append(json.load(archivo))
+        except (OSError, ValueError):
+            # Archivo borrado o a medio reemplazar: se omite en este scrape
+            continue
+    return estados
+
+
+def _etiquetas(pares, extra=()):
+    def escapar(valor):
+        return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    pares = list(pares) + list(extra)
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{clave}="{escapar(valor)}"' for clave, valor in pares) + '}'
+
+
+def _numero(valor):
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+def exposicion():
+    """Texto en formato de exposición de Prometheus (0.0.4)."""
+    contadores, histogramas = _combinar(_estados())
+    lineas = []
+    for nombre, (tipo, ayuda, buckets) in METRICAS.items():
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+        if tipo == 'counter':
+            for (metrica, etiquetas), valor in sorted(contadores.items()):
+                if metrica == nombre:
+                    lineas.append(f'{nombre}{_etiquetas(etiquetas)} {_numero(valor)}')
+            continue
+        for (metrica, etiquetas), (conteos, suma, cuenta) in sorted(histogramas.items()):
+            if metrica != nombre:
+                continue
+            acumulado = 0
+            for limite, conteo in zip(buckets, conteos):
+                acumulado += conteo
+                lineas.append(
+                    f'{nombre}_bucket{_etiquetas(etiquetas, [("le", _numero(limite))])} {acumulado}'
+                )
+            lineas.append(f'{nombre}_bucket{_etiquetas(etiquetas, [("le", "+Inf")])} {cuenta}')
+            lineas.append(f'{nombre}_sum{_etiquetas(etiquetas)} {_numero(suma)}')
+            lineas.append(f'{nombre}_count{_etiquetas(etiquetas)} {cuenta}')
+    return '\n'.join(lineas) + '\n'
+
+
+def _usuario_api(request):
+    """Usuario de los autenticadores de la API (JWT), o `None`."""
+    for clase in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            autenticado = clase().authenticate(Request(request))
+        except AuthenticationFailed:
+            return None
+        if autenticado is not None:
+            return autenticado[0]
+    return None
+
+
+def vista_metricas(request):
+    """`GET /api/metrics/` para el scrape de Prometheus.
+
+    Requiere `Authorization: Bearer <INVENTARIO_METRICAS_TOKEN>` si el token
+    está configurado; si no, solo lo pueden leer usuarios staff autenticados
+    como en el resto de la API (JWT), no por la sesión de Django.
+    """
+    token = getattr(settings, 'INVENTARIO_METRICAS_TOKEN', '')
+    if token:
+        permitido = request.META.get('HTTP_AUTHORIZATION', '') == f'Bearer {token}'
+    else:
+        usuario = _usuario_api(request)
+        permitido = usuario is not None and usuario.is_staff
+    if not permitido:
+        return HttpResponseForbidden('Acceso restringido')
+    return HttpResponse(exposicion(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,73 @@
+import time
+
+from django.db import connection
+
+from utils.metrics import registro
+
+
+class _ContadorSQL:
+    """`execute_wrapper` que cuenta las consultas y el tiempo en la base de datos."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempo += time.perf_counter() - inicio
+            self.consultas += 1
+
+
+class MetricasMiddleware:
+    """Registra latencia, consultas SQL, tamaño de respuesta y empresa por vista.
+
+    La vista se identifica como `<ViewSet>.<acción>` a partir de la ruta
+    resuelta. Los datos se exponen en `GET /api/metrics/`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        contador = _ContadorSQL()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(contador):
+            response = self.get_response(request)
+        duracion = time.perf_counter() - inicio
+
+        tamano = None if response.streaming else len(response.content)
+        registro.registrar_peticion(
+            vista=self.nombre_vista(request),
+            metodo=request.method,
+            estado=str(response.status_code),
+            empresa=self.empresa(request),
+            duracion=duracion,
+            consultas=contador.consultas,
+            tiempo_sql=contador.tiempo,
+            tamano=tamano,
+        )
+        return response
+
+    @staticmethod
+    def nombre_vista(request):
+        coincidencia = getattr(request, 'resolver_match', None)
+        if coincidencia is None:
+            return 'sin_ruta'
+        vista = coincidencia.func
+        clase = getattr(vista, 'cls', None) or getattr(vista, 'view_class', None)
+        if clase is None:
+            return coincidencia.view_name or getattr(vista, '__name__', 'desconocida')
+        # Los ViewSets de DRF guardan el mapeo método -> acción en la función de la ruta
+        acciones = getattr(vista, 'actions', None) or {}
+        accion = acciones.get(request.method.lower())
+        return f'{clase.__name__}.{accion}' if accion else clase.__name__
+
+    @staticmethod
+    def empresa(request):
+        # DRF copia en la petición de Django el usuario autenticado por JWT
+        usuario = getattr(request, 'user', None)
+        empresa_id = getattr(usuario, 'empresa_id', None) if usuario is not None else None
+        return str(empresa_id) if empresa_id is not None else 'ninguna'
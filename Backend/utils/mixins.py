@@ -20,6 +20,33 @@ class TenantFilterMixin:
         return queryset.none()
 
 
+class RelacionesPorAccionMixin:
+    """Declara por acción las relaciones que carga el queryset del viewset.
+
+    `relaciones_por_accion` mapea el nombre de la acción a los campos de
+    `select_related`; `prefetch_por_accion` hace lo mismo con
+    `prefetch_related`. La clave `'default'` se usa para las acciones no
+    declaradas. Las acciones que leen con `values()` declaran `()`.
+    """
+    relaciones_por_accion = {}
+    prefetch_por_accion = {}
+
+    @staticmethod
+    def _para_accion(declaracion, accion):
+        return declaracion.get(accion, declaracion.get('default', ()))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        accion = getattr(self, 'action', None)
+        relaciones = self._para_accion(self.relaciones_por_accion, accion)
+        if relaciones:
+            queryset = queryset.select_related(*relaciones)
+        prefetch = self._para_accion(self.prefetch_por_accion, accion)
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
+
+
 class IsTenantUser(BasePermission):
     """Permiso que verifica que el usuario pertenece a la organización"""
     
@@ -26,8 +26,9 @@ export default function DashboardPage() {
     const loadStats = async () => {
       try {
         const [productsData, movementsData, usersData] = await Promise.all([
-          apiClient.getProducts({ limit: 1 }),
-          apiClient.getMovements({ limit: 1 }),
+          // `page` activa la paginación numerada, la única que devuelve `count`
+          apiClient.getProducts({ page: 1, page_size: 1 }),
+          apiClient.getMovements({ page: 1, page_size: 1 }),
           apiClient.getUsers({ limit: 1 }),
         ])
 